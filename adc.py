@@ -1,8 +1,9 @@
 import asyncio
+from array import array
 from micropython import const
 from machine import Pin, I2C, ADC
-from lcd_1602 import LcdApi
-from buttons import Button, HoldButton
+from lcd_1602 import LcdApi, LcdRender, put_uint
+from buttons import Button, HoldButton, ButtonBank
 import json
 
 
@@ -13,11 +14,82 @@ class Adc:
     def __init__(self, pin):
         self.adc = ADC(Pin(pin))
 
+    def get_u16(self):
+        """ return raw 16-bit input """
+        return self.adc.read_u16()
+
     def get_pc(self):
         """ return input setting in range 0 - 99 """
         return self.adc.read_u16() // self.pc_factor
 
 
+class AdcSampler:
+    """ oversampled and filtered input from several Adc objects
+        - one task serves all inputs
+        - each read: burst of n_samples into a preallocated array
+        - filter: integer 'mean' or 'median' of the burst
+        - hysteresis: output changes when filtered value moves > hyst_u16
+        - change_ev is set when any output changes
+    """
+
+    def __init__(self, adcs, n_samples=8, filter_='mean', hyst_u16=400,
+                 interval_ms=50):
+        self.adcs = tuple(adcs)
+        self.n_samples = n_samples
+        self.median = filter_ == 'median'
+        self.hyst_u16 = hyst_u16
+        self.interval_ms = interval_ms
+        self._burst = array('H', bytearray(2 * n_samples))
+        self.values = array('H', bytearray(2 * len(self.adcs)))
+        self.pcs = bytearray(len(self.adcs))
+        self._primed = False
+        self.change_ev = asyncio.Event()
+
+    def _read_burst(self, adc):
+        """ return filtered value of n_samples reads """
+        burst = self._burst
+        n = self.n_samples
+        for i in range(n):
+            burst[i] = adc.get_u16()
+        if self.median:
+            # insertion sort in place: no allocation
+            for i in range(1, n):
+                v = burst[i]
+                j = i - 1
+                while j >= 0 and burst[j] > v:
+                    burst[j + 1] = burst[j]
+                    j -= 1
+                burst[j + 1] = v
+            return burst[n // 2]
+        total = 0
+        for i in range(n):
+            total += burst[i]
+        return total // n
+
+    def sample(self):
+        """ read all inputs; return True if any output changed """
+        changed = False
+        for i, adc in enumerate(self.adcs):
+            v = self._read_burst(adc)
+            if not self._primed or abs(v - self.values[i]) > self.hyst_u16:
+                self.values[i] = v
+                pc = v // Adc.pc_factor
+                if pc != self.pcs[i]:
+                    self.pcs[i] = pc
+                    changed = True
+        if not self._primed:
+            self._primed = True
+            changed = True
+        return changed
+
+    async def run(self):
+        """ coro: sample inputs every interval_ms """
+        while True:
+            if self.sample():
+                self.change_ev.set()
+            await asyncio.sleep_ms(self.interval_ms)
+
+
 async def main():
 
     async def keep_alive():
@@ -27,26 +99,27 @@ async def main():
             await asyncio.sleep(1)
             t += 1
 
-    async def process_btn_event(btn):
+    async def process_btn_events(bank_):
         """ coro: passes button events to the system """
         while True:
-            # wait until press_ev is set
-            await btn.press_ev.wait()
-            lcd.write_line(0, f'{btn.name}{btn.state}')
-            btn.clear_state()
-
-    async def process_adc(adc_a, adc_b):
-        """ coro: poll adc inputs """
-        fwd_prev = -1
-        rev_prev = -1        
+            # wait until any button event is set
+            await bank_.press_ev.wait()
+            bank_.press_ev.clear()
+            for btn in bank_.events():
+                lcd.write_line(0, f'{btn.name}{btn.state}')
+                btn.clear_state()
+
+    adc_line = bytearray(b'F:  0%  R:  0%')
+
+    async def process_adc(sampler_):
+        """ coro: display adc inputs when changed """
         while True:
-            fwd_pc = adc_a.get_pc()
-            rev_pc = adc_b.get_pc()
-            if fwd_pc != fwd_prev or rev_pc != rev_prev:
-                lcd.write_line(1, f'F: {fwd_pc:02d}%  R: {rev_pc:02d}%')
-                fwd_prev = fwd_pc
-                rev_prev = rev_pc
-            await asyncio.sleep_ms(200)
+            await sampler_.change_ev.wait()
+            sampler_.change_ev.clear()
+            # fill fixed fields in place: no allocation per update
+            put_uint(adc_line, 2, sampler_.pcs[0], 3, 0x20)
+            put_uint(adc_line, 10, sampler_.pcs[1], 3, 0x20)
+            lcd.write_line(1, adc_line)
 
     buttons = (Button(6, 'A'),
                HoldButton(7, 'B'),
@@ -54,27 +127,28 @@ async def main():
                HoldButton(9, 'D')
                )
 
-    # create tasks to test each button
-    for b in buttons:
-        asyncio.create_task(b.poll_state())  # buttons self-poll
-        asyncio.create_task(process_btn_event(b))  # respond to event
+    # single task scans all buttons
+    bank = ButtonBank(buttons)
+    asyncio.create_task(bank.poll_state())
+    asyncio.create_task(process_btn_events(bank))  # respond to events
 
     params = {
         'i2c_pins': {'sda': 0, 'scl': 1},
         'cols_rows': {'cols': 16, 'rows': 2},
         }
 
-    lcd = LcdApi(params['i2c_pins'])
+    lcd = LcdRender(LcdApi(params['i2c_pins']))
+    asyncio.create_task(lcd.render())
     if lcd.lcd_mode:
         lcd.write_line(0, f'ADC Test')
-        lcd.write_line(1, f'I2C addr: {lcd.I2C_ADDR}')
+        lcd.write_line(1, f'I2C addr: {lcd.lcd_api.I2C_ADDR}')
     else:
         print('LCD Display not found')
     await asyncio.sleep_ms(1000)
 
-    adc_in_a = Adc(26)
-    adc_in_b = Adc(27)
-    asyncio.create_task(process_adc(adc_in_a, adc_in_b))
+    sampler = AdcSampler((Adc(26), Adc(27)), filter_='median')
+    asyncio.create_task(sampler.run())
+    asyncio.create_task(process_adc(sampler))
 
     print(f'System initialised \n{params}')
 
@@ -4,9 +4,14 @@
     class Button implements a click button
     class HoldButton extends Button to include a hold event
     - button methods are coroutines and include self-polling methods
+    - irq=True: pin-change interrupts replace polling
+    class ButtonBank scans any number of buttons from a single task
+    class EventQueue keeps every button event, timestamped, in a fixed ring
 """
 
 import asyncio
+import sys
+from array import array
 from machine import Pin, Signal
 from micropython import const
 from time import ticks_ms, ticks_diff
@@ -19,32 +24,86 @@ class Button:
     CLICK = const('1')
 
     POLL_INTERVAL = const(20)  # ms
+    DEBOUNCE_MS = const(20)  # irq mode
 
-    def __init__(self, pin, name=''):
+    def __init__(self, pin, name='', irq=False):
+        self.pin_id = pin
+        self._pin = Pin(pin, Pin.IN, Pin.PULL_UP)
         # Signal wraps pull-up logic with invert
-        self._hw_in = Signal(
-            pin, Pin.IN, Pin.PULL_UP, invert=True)
+        self._hw_in = Signal(self._pin, invert=True)
         if name:
             self.name = name
         else:
             self.name = str(pin)        
         self.press_ev = asyncio.Event()  # starts cleared
         self.state = self.WAIT
+        self.queue = None  # set by EventQueue.add()
+        self.q_id = 0
+        if irq:
+            self._irq_flag = asyncio.ThreadSafeFlag()
+            self._t_edge = ticks_ms()
+            self._pin.irq(handler=self.edge_isr,
+                          trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING)
+        else:
+            self._irq_flag = None
+
+    def edge_isr(self, _):
+        """ pin-change interrupt handler
+            - edges within DEBOUNCE_MS of the last accepted edge are ignored
+            - safe in a hard isr: may be run by the owner of a shared pin,
+              e.g. estop.EStop.share()
+        """
+        time_stamp = ticks_ms()
+        if ticks_diff(time_stamp, self._t_edge) > self.DEBOUNCE_MS:
+            self._t_edge = time_stamp
+            self._irq_flag.set()
+
+    def _event(self, state, time_stamp):
+        """ set state and press_ev; queue the event if queued """
+        self.state = state
+        self.press_ev.set()
+        if self.queue is not None:
+            self.queue.put(self.q_id, state, time_stamp)
+
+    def set_state(self, pin_state, time_stamp):
+        """ respond to debounced pin change
+            - called by poll_state(), or by a ButtonBank scan
+        """
+        if not pin_state:
+            self._event(self.CLICK, time_stamp)
 
     async def poll_state(self):
         """ poll self for click event
             - event is set on button release
             - event handler must call clear_state
+            - in irq mode: wait for edge then read the settled pin;
+              after a change, read once more to catch a dropped edge
         """
         prev_pin_state = self._hw_in.value()
+        t_read = None
         while True:
+            if self._irq_flag:
+                await self._irq_flag.wait()
+                await asyncio.sleep_ms(self.DEBOUNCE_MS)
+                # re-check: edge not seen by the isr
+                time_stamp = ticks_ms() if self._t_edge == t_read \
+                    else self._t_edge
+                t_read = self._t_edge
+            else:
+                await asyncio.sleep_ms(self.POLL_INTERVAL)
+                time_stamp = ticks_ms()
             pin_state = self._hw_in.value()
             if pin_state != prev_pin_state:
-                if not pin_state:
-                    self.state = self.CLICK
-                    self.press_ev.set()
+                self.set_state(pin_state, time_stamp)
                 prev_pin_state = pin_state
-            await asyncio.sleep_ms(self.POLL_INTERVAL)
+                if self._irq_flag:
+                    # an edge inside the debounce window is dropped:
+                    # read again so a short tap is not left pressed
+                    self._irq_flag.set()
+
+    def is_pressed(self):
+        """ return current (undebounced) pin state """
+        return self._hw_in.value()
 
     def clear_state(self):
         """ set state to WAIT """
@@ -58,30 +117,22 @@ class HoldButton(Button):
     HOLD = const('2')
     T_HOLD = const(750)  # ms - adjust as required
 
-    def __init__(self, pin, name=''):
-        super().__init__(pin, name)
+    def __init__(self, pin, name='', irq=False):
+        super().__init__(pin, name, irq)
+        self._on_time = None
 
-    async def poll_state(self):
-        """ poll self for click or hold events
+    def set_state(self, pin_state, time_stamp):
+        """ respond to debounced pin change: click or hold
             - button state must be cleared by event handler
             - elapsed time measured in ms
         """
-        on_time = None
-        prev_pin_state = self._hw_in.value()
-        while True:
-            pin_state = self._hw_in.value()
-            if pin_state != prev_pin_state:
-                time_stamp = ticks_ms()
-                if pin_state:
-                    on_time = time_stamp
-                else:
-                    if ticks_diff(time_stamp, on_time) < self.T_HOLD:
-                        self.state = self.CLICK
-                    else:
-                        self.state = self.HOLD
-                    self.press_ev.set()
-                prev_pin_state = pin_state
-            await asyncio.sleep_ms(self.POLL_INTERVAL)
+        if pin_state:
+            self._on_time = time_stamp
+        elif self._on_time is not None:
+            if ticks_diff(time_stamp, self._on_time) < self.T_HOLD:
+                self._event(self.CLICK, time_stamp)
+            else:
+                self._event(self.HOLD, time_stamp)
 
     def __str__(self):
         return f'{self.name} {self.state}'
@@ -90,6 +141,149 @@ class HoldButton(Button):
         return f'{self.name} {self.state}'
 
 
+class ButtonBank:
+    """ scan a bank of buttons from a single task
+        - all pins read in one pass per scan
+        - RP2040: a single read of the SIO GPIO_IN register
+        - counter debounce: change accepted after DEBOUNCE_N equal scans
+        - buttons keep their press_ev and state; do not run their poll_state
+        - bank press_ev is set on any button event
+    """
+
+    SIO_GPIO_IN = const(0xd0000004)
+    SCAN_INTERVAL = const(5)  # ms
+    DEBOUNCE_N = const(4)  # scans
+
+    def __init__(self, buttons):
+        self.buttons = tuple(buttons)
+        self._masks = tuple(1 << b.pin_id for b in self.buttons)
+        self.press_ev = asyncio.Event()
+        if sys.platform == 'rp2':
+            from machine import mem32
+            self._mem32 = mem32
+        else:
+            self._mem32 = None
+
+    def _read(self):
+        """ return raw GPIO input word; bit set: pin high (released) """
+        if self._mem32:
+            return self._mem32[self.SIO_GPIO_IN]
+        word = 0
+        for btn, mask in zip(self.buttons, self._masks):
+            if not btn.is_pressed():
+                word |= mask
+        return word
+
+    async def poll_state(self):
+        """ poll all buttons; set button events on debounced change """
+        n = len(self.buttons)
+        stable = bytearray(b.is_pressed() for b in self.buttons)
+        count = bytearray(n)
+        while True:
+            await asyncio.sleep_ms(self.SCAN_INTERVAL)
+            word = self._read()
+            for i in range(n):
+                pin_state = 0 if word & self._masks[i] else 1
+                if pin_state == stable[i]:
+                    count[i] = 0
+                    continue
+                count[i] += 1
+                if count[i] >= self.DEBOUNCE_N:
+                    count[i] = 0
+                    stable[i] = pin_state
+                    btn = self.buttons[i]
+                    btn.set_state(pin_state, ticks_ms())
+                    if btn.press_ev.is_set():
+                        self.press_ev.set()
+
+    def events(self):
+        """ yield buttons with an event pending """
+        for btn in self.buttons:
+            if btn.state != btn.WAIT:
+                yield btn
+
+
+class EventQueue:
+    """ bounded queue of (time_stamp, button, state) button events
+        - preallocated ring: no allocation per event
+        - one queue may be shared by any number of buttons
+        - when full, the newest event is dropped and counted
+        - ev is set while events are queued
+        - latency: ms from button event to get(), per event
+    """
+
+    def __init__(self, buttons=(), size=16):
+        self.size = size
+        self._t = array('I', bytes(4 * size))
+        self._ids = bytearray(size)
+        self._states = bytearray(size)
+        self._head = 0  # next to get
+        self._n = 0
+        self.buttons = []
+        self.ev = asyncio.Event()
+        self.dropped = 0
+        self.n_events = 0
+        self.latency_sum = 0
+        self.latency_max = 0
+        for btn in buttons:
+            self.add(btn)
+
+    def add(self, btn):
+        """ queue events of btn """
+        btn.queue = self
+        btn.q_id = len(self.buttons)
+        self.buttons.append(btn)
+
+    def __len__(self):
+        return self._n
+
+    def put(self, q_id, state, time_stamp):
+        """ add event; called by the button """
+        if self._n == self.size:
+            self.dropped += 1
+            return
+        i = (self._head + self._n) % self.size
+        self._t[i] = time_stamp
+        self._ids[i] = q_id
+        self._states[i] = ord(state)
+        self._n += 1
+        self.ev.set()
+
+    def get(self):
+        """ return oldest (time_stamp, button, state), or None """
+        if not self._n:
+            return None
+        i = self._head
+        time_stamp = self._t[i]
+        self._head = (i + 1) % self.size
+        self._n -= 1
+        if not self._n:
+            self.ev.clear()
+        latency = ticks_diff(ticks_ms(), time_stamp)
+        self.n_events += 1
+        self.latency_sum += latency
+        if latency > self.latency_max:
+            self.latency_max = latency
+        return time_stamp, self.buttons[self._ids[i]], chr(self._states[i])
+
+    def drain(self):
+        """ yield all queued events, oldest first """
+        while self._n:
+            yield self.get()
+
+    async def wait(self):
+        """ coro: wait for at least one queued event """
+        await self.ev.wait()
+
+    def clear(self):
+        """ discard queued events """
+        self._n = 0
+        self.ev.clear()
+
+    def mean_latency(self):
+        return self.latency_sum // self.n_events if self.n_events else 0
+
+
 async def main():
     """ coro: test Button and HoldButton classes """
 
@@ -107,21 +301,24 @@ async def main():
             await asyncio.sleep(1)
             t += 1
 
-    async def process_event(btn):
-        """ coro: passes button events to the system """
+    async def process_events(queue_):
+        """ coro: passes all queued button events to the system """
         while True:
-            # wait until press_ev is set
-            await btn.press_ev.wait()
-            print(btn.name, btn.state)
-            btn.clear_state()
+            await queue_.wait()
+            for time_stamp, btn, state in queue_.drain():
+                print(time_stamp, btn.name, state)
+                btn.clear_state()
 
+    queue = EventQueue(buttons.values())
     # create tasks to test each button
     for b in buttons:
         asyncio.create_task(buttons[b].poll_state())  # buttons self-poll
-        asyncio.create_task(process_event(buttons[b]))  # respond to event
+    asyncio.create_task(process_events(queue))  # respond to events
     print('System initialised')
 
     await keep_alive()  # run scheduler until keep_alive() times out
+    print(f'events: {queue.n_events} dropped: {queue.dropped}',
+          f'latency ms: mean {queue.mean_latency()} max {queue.latency_max}')
 
 
 if __name__ == '__main__':
@@ -1,5 +1,154 @@
 # calibrate.py
+""" calibrate motor start (breakaway) duty and running speeds
+    - find_breakaway(): sweep duty upward until motion is detected
+    - motion is detected by a run-button click, or by a feedback
+      Adc reading above a threshold
+    - calibrate(): breakaway per channel and direction, then
+      button fine-tuning of F and R speeds; results set in a ConfigStore
+      for motor_p.json: its run() task writes them to flash
+    - an e-stop trip aborts calibration: nothing is saved
+"""
 
-async def calibrate(buttons_, a_speed, b_speed, hold_):
-    """ set (and save) the motor speed arguments """
-    
\ No newline at end of file
+import asyncio
+from micropython import const
+from config import pc_u16
+
+SWEEP_STEP = const(256)  # u16 duty per sweep step
+SWEEP_MS = const(100)  # ms per sweep step
+SPEED_STEP = const(1)  # % per button click
+
+
+class CalAbort(Exception):
+    """ calibration ended by an e-stop trip """
+
+
+def check_estop(estop):
+    """ raise CalAbort if estop has tripped """
+    if estop and estop.tripped:
+        raise CalAbort()
+
+
+def click_detector(btn):
+    """ return detector: motion reported by clicking btn """
+    btn.clear_state()
+
+    def detect():
+        return btn.state != btn.WAIT
+
+    return detect
+
+
+def adc_detector(adc, threshold_u16):
+    """ return detector: motion reported by feedback above threshold """
+
+    def detect():
+        return adc.get_u16() > threshold_u16
+
+    return detect
+
+
+async def find_breakaway(channel, direction, detect, step=SWEEP_STEP, step_ms=SWEEP_MS,
+                        estop=None):
+    """ coro: return highest duty at which the motor did not move
+        - returns None if no motion was detected up to full duty
+        - raises CalAbort if estop trips
+    """
+    channel.set_state(direction)
+    dc_u16 = 0
+    found = None
+    try:
+        while dc_u16 <= 0xffff:
+            channel.set_dc_u16(dc_u16)
+            await asyncio.sleep_ms(step_ms)
+            check_estop(estop)
+            if detect():
+                found = max(0, dc_u16 - step)
+                break
+            dc_u16 += step
+    finally:
+        channel.stop()
+    return found
+
+
+async def next_event(buttons_, estop=None):
+    """ coro: return first button with a pending event
+        - raises CalAbort if estop trips
+    """
+    while True:
+        check_estop(estop)
+        for btn in buttons_:
+            if btn.state != btn.WAIT:
+                return btn
+        await asyncio.sleep_ms(20)
+
+
+async def tune_speed(controller, ch_id, direction, pc, buttons_, lcd, estop=None):
+    """ coro: adjust running speed by button; return final percentage
+        - run click: faster; kill click: slower; run hold: accept
+        - a kill hold is not used: on a shared pin it is the e-stop
+    """
+    run_btn, kill_btn = buttons_.run_btn, buttons_.kill_btn
+    channel = controller.chan_a if ch_id == 'A' else controller.chan_b
+    while True:
+        lcd.write_line(1, f'{ch_id} {direction}: {pc:3d}%')
+        btn = await next_event((run_btn, kill_btn), estop)
+        state = btn.state
+        btn.clear_state()
+        if btn is run_btn and state == run_btn.HOLD:
+            return pc
+        if btn is run_btn:
+            pc = min(100, pc + SPEED_STEP)
+        else:
+            pc = max(0, pc - SPEED_STEP)
+        controller.set_speed(ch_id, direction, pc_u16(pc))
+        channel.set_dc_u16(pc_u16(pc))
+
+
+async def calibrate(controller, buttons_, lcd, store, detectors=None, estop=None):
+    """ coro: set (and save) breakaway duty and motor speeds
+        - buttons_: InputButtons; store: config.ConfigStore for motor_p.json,
+          with its run() task started: set() only, no flash write here
+        - detectors: optional motion detector by channel id;
+          default: click run button when the motor moves
+        - estop: EStop armed during calibration; a trip aborts
+        - return True if set, False if aborted
+    """
+    channels = (('A', controller.chan_a), ('B', controller.chan_b))
+    start_u16 = {'A': {}, 'B': {}}
+    results = {}
+    try:
+        for ch_id, channel in channels:
+            for direction in ('F', 'R'):
+                lcd.write_line(0, f'Cal start {ch_id} {direction}')
+                lcd.write_line(1, 'Click on motion')
+                if detectors:
+                    detect = detectors[ch_id]
+                else:
+                    detect = click_detector(buttons_.run_btn)
+                found = await find_breakaway(channel, direction, detect, estop=estop)
+                buttons_.run_btn.clear_state()
+                if found is None:
+                    found = controller.get_start(ch_id, direction)
+                start_u16[ch_id][direction] = found
+                results[f'{ch_id.lower()}_start.{direction}'] = found
+                await asyncio.sleep_ms(1_000)
+        controller.start_u16 = start_u16
+        controller.build_ramps()
+
+        for direction in ('F', 'R'):
+            await controller.start_a_b(direction)
+            for ch_id, _ in channels:
+                lcd.write_line(0, f'Cal speed {ch_id} {direction}')
+                key = f'{ch_id.lower()}_speed.{direction}'
+                results[key] = await tune_speed(controller, ch_id, direction,
+                                                store.get(key), buttons_, lcd, estop)
+            check_estop(estop)
+            await controller.stop_a_b(direction)
+    except CalAbort:
+        controller.halt_a_b()
+        lcd.write_line(0, 'Cal aborted')
+        return False
+    for key, value in results.items():
+        store.set(key, value)
+    lcd.write_line(0, 'Cal saved')
+    return True
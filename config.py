@@ -1,8 +1,38 @@
 # config.py
-""" write/read parameters from a JSON file """
+""" write/read parameters from a JSON file
+    - read_cached(): parameters from a binary cache of the JSON files
+    - ConfigStore: write-behind changes through an append-only journal
+"""
 
+import asyncio
 import json
 import os
+import struct
+from micropython import const
+
+try:
+    from binascii import crc32
+except ImportError:
+    def crc32(data, crc=0):
+        """ CRC-32 (IEEE), bitwise """
+        crc ^= 0xffffffff
+        for b in data:
+            crc ^= b
+            for _ in range(8):
+                crc = (crc >> 1) ^ (0xedb88320 & -(crc & 1))
+        return crc ^ 0xffffffff
+
+CACHE_FILE = 'cf_cache.bin'
+CACHE_MAGIC = b'FTCF'
+CACHE_VERSION = const(7)
+CACHE_SOURCES = ('io_p.json', 'l298n_p.json', 'motor_p.json')
+# magic, version, CRC-32 of body
+HEADER_FORMAT = '<4sHI'
+# body: (size, mtime) of each source; boot-critical values at fixed
+# offsets: L298N pins, pulse_f, speeds as u16 (a_F, a_R, b_F, b_R);
+# then the other parameters as JSON text, for the C json parser
+SIG_FORMAT = '<6I'
+FIXED_FORMAT = '<6BI4H'
 
 
 def write_cf(filename, data):
@@ -23,6 +53,215 @@ def read_cf(filename, default=None):
         return default
 
 
+def _set_path(data, path, value):
+    """ set data[k0][k1]... from dotted path 'k0.k1' """
+    keys = path.split('.')
+    for key in keys[:-1]:
+        data = data.setdefault(key, {})
+    data[keys[-1]] = value
+
+
+def _get_path(data, path):
+    for key in path.split('.'):
+        data = data[key]
+    return data
+
+
+def _replay(data, journal):
+    """ apply journal deltas to data; return (number applied, lines skipped)
+        - a line that does not decode, e.g. torn by power loss, is
+          skipped: later appends may follow it on the same line
+    """
+    n = 0
+    n_bad = 0
+    try:
+        with open(journal, 'r') as f:
+            for line in f:
+                try:
+                    path, value = json.loads(line)
+                except ValueError:
+                    n_bad += 1
+                    continue
+                _set_path(data, path, value)
+                n += 1
+    except OSError:
+        pass
+    return n, n_bad
+
+
+def read_journaled(filename, default=None):
+    """ return json file as dict with ConfigStore journal applied """
+    data = read_cf(filename, default)
+    if data is not None:
+        _replay(data, filename + ConfigStore.JOURNAL_EXT)
+    return data
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except OSError:
+        pass
+
+
+class ConfigStore:
+    """ write-behind store for a JSON config file
+        - set() changes values in RAM and returns at once
+        - run() task commits DEBOUNCE_MS after the last change
+        - a commit appends one line per changed value to a journal
+        - after COMPACT_N deltas the journal is compacted into the file:
+          temp file then rename, so the file is always complete
+        - keys are dotted paths, e.g. 'a_speed.F'
+        - a journal with a torn line is compacted when the store opens
+    """
+
+    JOURNAL_EXT = '.jnl'
+    TEMP_EXT = '.tmp'
+    DEBOUNCE_MS = const(2_000)
+    COMPACT_N = const(32)
+
+    def __init__(self, filename, default=None):
+        self.filename = filename
+        self.journal = filename + self.JOURNAL_EXT
+        self.data = read_cf(filename, default)
+        self._n_deltas, n_bad = _replay(self.data, self.journal)
+        self._dirty = {}
+        self._change_ev = asyncio.Event()
+        if n_bad:
+            # torn journal: new appends must start on a clean line
+            self.compact()
+
+    def get(self, path):
+        return _get_path(self.data, path)
+
+    def set(self, path, value):
+        """ change value in RAM; committed later by run() """
+        try:
+            if _get_path(self.data, path) == value:
+                return
+        except KeyError:
+            pass
+        _set_path(self.data, path, value)
+        self._dirty[path] = value
+        self._change_ev.set()
+
+    def commit(self):
+        """ append pending changes to the journal; compact when due """
+        if not self._dirty:
+            return
+        # cached parameters go stale: removed first, so a power loss
+        # after the append cannot leave a cache that hides the journal
+        _remove(CACHE_FILE)
+        with open(self.journal, 'a') as f:
+            for path, value in self._dirty.items():
+                f.write(json.dumps([path, value]) + '\n')
+        self._n_deltas += len(self._dirty)
+        self._dirty.clear()
+        if self._n_deltas >= self.COMPACT_N:
+            self.compact()
+
+    def compact(self):
+        """ rewrite the file from RAM and discard the journal """
+        temp = self.filename + self.TEMP_EXT
+        write_cf(temp, self.data)
+        os.rename(temp, self.filename)
+        _remove(self.journal)
+        self._n_deltas = 0
+
+    async def run(self):
+        """ coro: commit changes once they stop for DEBOUNCE_MS """
+        while True:
+            await self._change_ev.wait()
+            while self._change_ev.is_set():
+                self._change_ev.clear()
+                await asyncio.sleep_ms(self.DEBOUNCE_MS)
+            self.commit()
+
+
+def _source_sig():
+    """ return (size, mtime) of each cache source file """
+    sig = []
+    for filename in CACHE_SOURCES:
+        st = os.stat(filename)
+        sig.append(st[6])
+        sig.append(int(st[8]))
+    return sig
+
+
+def _write_cache(cache_file, sig, io_p, l298n_p, motor_p):
+    """ pack parameters into cache_file
+        - boot-critical values in FIXED_FORMAT; the rest as JSON text
+    """
+    pins = l298n_p['pins']
+    l298n_rest = {k: v for k, v in l298n_p.items() if k not in ('pins', 'pulse_f')}
+    motor_rest = {k: v for k, v in motor_p.items() if k not in ('a_u16', 'b_u16')}
+    body = bytearray(struct.pack(SIG_FORMAT, *sig))
+    body += struct.pack(
+        FIXED_FORMAT,
+        pins['enA'], pins['in1'], pins['in2'], pins['in3'], pins['in4'], pins['enB'],
+        l298n_p['pulse_f'],
+        motor_p['a_u16']['F'], motor_p['a_u16']['R'],
+        motor_p['b_u16']['F'], motor_p['b_u16']['R'])
+    body += json.dumps([io_p, l298n_rest, motor_rest]).encode()
+    with open(cache_file, 'wb') as f:
+        f.write(struct.pack(HEADER_FORMAT, CACHE_MAGIC, CACHE_VERSION, crc32(body)))
+        f.write(body)
+
+
+def _read_cache(cache_file, sig):
+    """ return parameter dicts from cache_file, or None if stale or invalid """
+    try:
+        with open(cache_file, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    h_size = struct.calcsize(HEADER_FORMAT)
+    s_size = struct.calcsize(SIG_FORMAT)
+    f_size = struct.calcsize(FIXED_FORMAT)
+    if len(data) < h_size + s_size + f_size:
+        return None
+    magic, version, crc = struct.unpack_from(HEADER_FORMAT, data)
+    body = memoryview(data)[h_size:]
+    if magic != CACHE_MAGIC or version != CACHE_VERSION or crc != crc32(body):
+        return None
+    if list(struct.unpack_from(SIG_FORMAT, data, h_size)) != sig:
+        return None
+    v = struct.unpack_from(FIXED_FORMAT, data, h_size + s_size)
+    try:
+        io_p, l298n_p, motor_p = json.loads(data[h_size + s_size + f_size:])
+    except ValueError:
+        return None
+    l298n_p['pins'] = {'enA': v[0], 'in1': v[1], 'in2': v[2],
+                       'in3': v[3], 'in4': v[4], 'enB': v[5]}
+    l298n_p['pulse_f'] = v[6]
+    motor_p['a_u16'] = {'F': v[7], 'R': v[8]}
+    motor_p['b_u16'] = {'F': v[9], 'R': v[10]}
+    return io_p, l298n_p, motor_p
+
+
+def read_cached(cache_file=CACHE_FILE):
+    """ return (io_p, l298n_p, motor_p) parameter dicts
+        - from cache_file if the JSON sources are unchanged
+        - otherwise parse the JSON files and rebuild the cache
+        - motor_p speeds converted to u16: 'a_u16' and 'b_u16'
+    """
+    sig = _source_sig()
+    params = _read_cache(cache_file, sig)
+    if params:
+        return params
+    io_p, l298n_p, motor_p = (read_journaled(f) for f in CACHE_SOURCES)
+    for ch in ('a', 'b'):
+        motor_p[ch + '_u16'] = {d: pc_u16(pc) for d, pc in motor_p[ch + '_speed'].items()}
+    try:
+        _write_cache(cache_file, sig, io_p, l298n_p, motor_p)
+        print(f'Config cache written: {cache_file}')
+    except Exception as e:
+        # boot from the JSON files; retried on the next boot
+        print(f'Config cache not written: {e}')
+        _remove(cache_file)
+    return io_p, l298n_p, motor_p
+
+
 def pc_u16(percentage):
     """ convert positive percentage to 16-bit equivalent """
     if 0 < percentage <= 100:
@@ -0,0 +1,109 @@
+# dc_recorder.py
+""" record L298nChannel duty-cycle changes for ramp analysis
+    - (tick_ms, channel, state, dc_u16) samples in a ring buffer
+    - arrays preallocated: no allocation per sample
+"""
+
+from array import array
+from time import ticks_ms, ticks_diff
+import struct
+
+
+class DutyRecorder:
+    """ ring buffer of duty-cycle samples
+        - attach() sets the recorder on L298nChannel objects
+        - oldest samples are overwritten when the buffer is full
+    """
+
+    REC_FORMAT = '<IBBH'  # tick_ms, channel, state, dc_u16
+
+    def __init__(self, size=512):
+        self.size = size
+        self.ticks = array('I', (0 for _ in range(size)))
+        self.chans = bytearray(size)
+        self.states = bytearray(size)
+        self.dcs = array('H', (0 for _ in range(size)))
+        self.index = 0
+        self.count = 0
+
+    def attach(self, *channels):
+        """ record duty-cycle changes of channels """
+        for channel in channels:
+            channel.recorder = self
+
+    @staticmethod
+    def detach(*channels):
+        """ stop recording channels """
+        for channel in channels:
+            channel.recorder = None
+
+    def clear(self):
+        """ discard all samples """
+        self.index = 0
+        self.count = 0
+
+    def record(self, ch_id, state, dc_u16):
+        """ add sample; state is an L298nChannel state character """
+        i = self.index
+        self.ticks[i] = ticks_ms()
+        self.chans[i] = ch_id
+        self.states[i] = ord(state)
+        self.dcs[i] = dc_u16
+        i += 1
+        self.index = 0 if i == self.size else i
+        if self.count < self.size:
+            self.count += 1
+
+    def samples(self):
+        """ yield samples, oldest first """
+        i = (self.index - self.count) % self.size
+        for _ in range(self.count):
+            yield self.ticks[i], self.chans[i], chr(self.states[i]), self.dcs[i]
+            i += 1
+            if i == self.size:
+                i = 0
+
+    def timing_stats(self, ch_id, step_ms, gap_ms=None):
+        """ return step timing of channel against scheduled step_ms
+            - intervals longer than gap_ms (default 4 steps) separate ramps
+            - jitter: mean absolute error of step intervals
+        """
+        if gap_ms is None:
+            gap_ms = 4 * step_ms
+        n = 0
+        total = 0
+        abs_err = 0
+        min_ms = None
+        max_ms = None
+        prev = None
+        for tick, ch, _, _ in self.samples():
+            if ch != ch_id:
+                continue
+            if prev is not None:
+                dt = ticks_diff(tick, prev)
+                if dt <= gap_ms:
+                    n += 1
+                    total += dt
+                    abs_err += abs(dt - step_ms)
+                    min_ms = dt if min_ms is None else min(min_ms, dt)
+                    max_ms = dt if max_ms is None else max(max_ms, dt)
+            prev = tick
+        if not n:
+            return {'n': 0}
+        return {'n': n, 'mean': total / n, 'min': min_ms, 'max': max_ms,
+                'jitter': abs_err / n}
+
+    def dump_csv(self, filename):
+        """ write samples as CSV """
+        with open(filename, 'w') as f:
+            f.write('tick_ms,channel,state,dc_u16\n')
+            for tick, ch, state, dc in self.samples():
+                f.write(f'{tick},{ch},{state},{dc}\n')
+
+    def dump_bin(self, filename):
+        """ write samples as packed REC_FORMAT records """
+        buf = bytearray(struct.calcsize(self.REC_FORMAT))
+        with open(filename, 'wb') as f:
+            for tick, ch, state, dc in self.samples():
+                struct.pack_into(self.REC_FORMAT, buf, 0, tick, ch, ord(state), dc)
+                f.write(buf)
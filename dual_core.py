@@ -0,0 +1,211 @@
+# dual_core.py
+""" run the ramp engine on the second RP2040 core
+    - core 0: asyncio loop: sequences, LCD, buttons, serial
+    - core 1: _thread loop that steps duty cycles at fixed deadlines
+    - cores exchange data through Mailbox objects: no locks
+    - under CPython the cores are threads; run in real time only
+"""
+
+import _thread
+import asyncio
+from array import array
+from micropython import const
+from time import sleep_ms, ticks_ms, ticks_diff, ticks_add
+from motor_ctrl import MotorCtrl
+
+
+class Mailbox:
+    """ single-writer, single-reader slots shared between cores
+        - seqlock: seq is odd while the writer is storing values
+        - the reader copies the newest values; older posts may be
+          overwritten before they are read: latest wins
+        - word stores only; Cortex-M0+ does not reorder them
+    """
+
+    def __init__(self, n_slots=1):
+        self._seq = array('I', (0,))
+        self._slots = [None] * n_slots
+
+    def post(self, *values):
+        """ store values for the reader; writer side only """
+        self._seq[0] += 1
+        for i in range(len(values)):
+            self._slots[i] = values[i]
+        self._seq[0] += 1
+
+    def seq(self):
+        return self._seq[0]
+
+    def take(self, last, out):
+        """ copy values newer than seq last into out; return their seq
+            - returns last if nothing new has been posted
+        """
+        while True:
+            seq = self._seq[0]
+            if seq == last:
+                return last
+            if seq & 1:
+                continue  # write in progress
+            for i in range(len(out)):
+                out[i] = self._slots[i]
+            if self._seq[0] == seq:
+                return seq
+
+
+class DualCoreCtrl(MotorCtrl):
+    """ MotorCtrl with ramp moves stepped on core 1
+        - while core 1 runs it is the only writer of the channels; the
+          e-stop isr may still lock them: see L298nChannel.set_dc_u16()
+        - run_moves() posts moves and polls for completion
+        - a new post replaces the moves in progress within IDLE_MS
+        - cancelling run_moves() leaves channels at their current duty
+        - halt_a_b() returns once core 1 has stopped the channels
+        - regulators run on core 0 and only between ramps: run_moves()
+          stops them first
+        - skew recorded in self.group, on core 1
+    """
+
+    IDLE_MS = const(1)  # core 1 mailbox poll
+    POLL_MS = const(5)  # core 0 completion poll
+    HALT_MS = const(50)  # longest wait for core 1 to stop the channels
+
+    def __init__(self, *args, **kwargs):
+        self.cmd = Mailbox(2)  # moves (None: halt), step_ms
+        self.done = Mailbox(1)  # seq of completed cmd
+        self._done_out = [0]
+        self._done_seq = 0
+        self.on_core1 = False  # core 1 loop running
+        self.running = True
+        kwargs['timer_ramp'] = False
+        super().__init__(*args, **kwargs)
+        self.on_core1 = True
+        _thread.start_new_thread(self._engine, ())
+
+    def _engine(self):
+        """ core 1: step posted moves at step_ms deadlines """
+        cmd = [(), 0]
+        last = 0
+        moves = ()
+        index = []
+        step_ms = 0
+        t_next = 0
+        advance = self.group.advance  # bound once
+        try:
+            while self.running:
+                seq = self.cmd.take(last, cmd)
+                if seq != last:
+                    last = seq
+                    if cmd[0] is None:
+                        self.chan_a.stop()
+                        self.chan_b.stop()
+                        moves = ()
+                    else:
+                        moves, step_ms = cmd
+                        index = [m[2] for m in moves]
+                        t_next = ticks_ms()
+                    if not moves:
+                        self.done.post(last)
+                if moves and ticks_diff(ticks_ms(), t_next) >= 0:
+                    if advance(moves, index):
+                        t_next = ticks_add(t_next, step_ms)
+                    else:
+                        moves = ()
+                        self.done.post(last)
+                sleep_ms(self.IDLE_MS)
+        finally:
+            self.on_core1 = False
+
+    def _is_done(self, seq):
+        """ return True if core 1 has completed cmd seq, or a later cmd """
+        self._done_seq = self.done.take(self._done_seq, self._done_out)
+        return self._done_out[0] >= seq
+
+    async def _wait_done(self, seq):
+        """ coro: wait until core 1 has completed cmd seq """
+        while not self._is_done(seq):
+            await asyncio.sleep_ms(self.POLL_MS)
+
+    async def run_moves(self, moves, period_ms):
+        """ coro: run moves on core 1 """
+        for reg in self.regulators.values():
+            reg.stop()
+        self.cmd.post(tuple(moves), period_ms // self.n_steps)
+        try:
+            await self._wait_done(self.cmd.seq())
+        except asyncio.CancelledError:
+            self.cmd.post((), 0)  # stop stepping; hold duty
+            raise
+
+    def halt_a_b(self):
+        """ stop both motors; return once core 1 has stopped them
+            - core 1 not running, or no answer in HALT_MS: stopped here
+        """
+        if self.on_core1:
+            for reg in self.regulators.values():
+                reg.stop()
+            self.cmd.post(None, 0)
+            seq = self.cmd.seq()
+            t0 = ticks_ms()
+            while ticks_diff(ticks_ms(), t0) < self.HALT_MS:
+                if self._is_done(seq):
+                    return
+        super().halt_a_b()
+
+    def shutdown(self):
+        """ end the core 1 loop; channels hold their duty cycle """
+        self.running = False
+        while self.on_core1:
+            sleep_ms(self.IDLE_MS)
+
+
+async def main():
+    """ test Mailbox consistency and a ramp on core 1 """
+    from hb_l298n import L298N
+    from config import read_cf, pc_u16
+
+    box = Mailbox(2)
+    n_posts = 20_000
+    finished = [False]  # set by the writer thread
+
+    def writer():
+        for i in range(1, n_posts + 1):
+            box.post(i, 3 * i)
+        finished[0] = True
+
+    out = [0, 0]
+    last = 0
+    n_taken = 0
+    n_torn = 0
+    _thread.start_new_thread(writer, ())
+    while not finished[0] or box.seq() != last:
+        last = box.take(last, out)
+        if out[1] != 3 * out[0]:
+            n_torn += 1
+        n_taken += 1
+        if n_taken % 100 == 0:
+            await asyncio.sleep_ms(0)
+    print(f'Mailbox: posts {n_posts} last {out[0]} torn {n_torn}')
+
+    l298n_p = read_cf('l298n_p.json')
+    motor_p = read_cf('motor_p.json')
+    board = L298N(l298n_p['pins'], l298n_p['pulse_f'])
+    a_speeds = {d: pc_u16(pc) for d, pc in motor_p['a_speed'].items()}
+    b_speeds = {d: pc_u16(pc) for d, pc in motor_p['b_speed'].items()}
+    controller = DualCoreCtrl(board, a_speeds, b_speeds)
+    t0 = ticks_ms()
+    await controller.start_a_b('F')
+    print(f'Core 1 ramp up: {ticks_diff(ticks_ms(), t0)} ms dc {controller.chan_a.dc_u16}')
+    await asyncio.sleep_ms(500)
+    await controller.stop_a_b('F')
+    print(f'Core 1 ramp down: dc {controller.chan_a.dc_u16}')
+    controller.halt_a_b()
+    await asyncio.sleep_ms(10)
+    controller.shutdown()
+
+
+if __name__ == '__main__':
+    try:
+        asyncio.run(main())
+    finally:
+        asyncio.new_event_loop()  # clear retained state
+        print('execution complete')
@@ -0,0 +1,144 @@
+# estop.py
+""" emergency stop from interrupt context, backed by a watchdog
+    - press edge starts a one-shot timer of hold_ms
+    - release before hold_ms cancels it: a click is not a stop
+    - timer expiry with the button still held locks every channel at
+      0 duty, without waiting for release or for the scheduler
+    - latency: us from hold threshold to outputs cut; max reported
+    - on a pin shared with a HoldButton, hold_ms is its hold: the
+      trip is the hold itself, and the hold event follows on release
+    - a GPIO has one irq handler: share() forwards each edge to the
+      button's handler from the e-stop isr
+    - reset() clears a trip without a reboot
+    - Liveness: the control loops feed the WDT, not a task of its own
+"""
+
+import asyncio
+from array import array
+from machine import Pin, Timer
+from micropython import const
+from time import ticks_us, ticks_diff
+
+T_HOLD = const(750)  # ms: shared kill pin; as HoldButton.T_HOLD
+T_HOLD_OWN_PIN = const(50)  # ms: dedicated e-stop pin
+
+
+class EStop:
+    """ cut motor outputs when pin is held low for hold_ms
+        - channels: L298nChannel objects; locked until reset()
+        - trip_ev: ThreadSafeFlag set on trip, for the asyncio side
+    """
+
+    def __init__(self, pin, channels, hold_ms=T_HOLD):
+        self.channels = tuple(channels)
+        self.hold_us = hold_ms * 1_000
+        self.tripped = False
+        self.trip_ev = asyncio.ThreadSafeFlag()
+        self.n_trips = 0
+        self.latency_us = 0  # last trip
+        self.latency_max_us = 0
+        self._t_press = 0
+        self._hold_ms = hold_ms
+        self._timer = Timer()
+        self._trip_cb = self._trip  # bound once: no allocation in the isr
+        self._shared = None  # edge handler of a button on the same pin
+        self._pin = Pin(pin, Pin.IN, Pin.PULL_UP)
+        self._arm()
+
+    def _arm(self):
+        self._pin.irq(handler=self._edge_isr,
+                      trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING, hard=True)
+
+    def _edge_isr(self, pin):
+        """ press: (re)start hold timer; release: cancel it """
+        if pin.value():
+            self._timer.deinit()
+        else:
+            self._t_press = ticks_us()
+            self._timer.init(mode=Timer.ONE_SHOT, period=self._hold_ms,
+                             callback=self._trip_cb, hard=True)
+        if self._shared:
+            self._shared(pin)
+
+    def share(self, handler):
+        """ run handler on each edge of the e-stop pin
+            - handler: irq handler of a button on the same pin, e.g.
+              Button.edge_isr; it must be safe in a hard isr
+            - re-arms the e-stop: an irq() set for the button since has
+              replaced the e-stop handler
+        """
+        self._shared = handler
+        self._arm()
+
+    def _trip(self, _):
+        """ timer callback: cut outputs if the button is still held """
+        if self._pin.value():
+            return
+        for channel in self.channels:
+            channel.lock()
+        latency = ticks_diff(ticks_us(), self._t_press) - self.hold_us
+        self.latency_us = latency
+        if latency > self.latency_max_us:
+            self.latency_max_us = latency
+        self.n_trips += 1
+        self.tripped = True
+        self.trip_ev.set()
+
+    def reset(self):
+        """ release the channel lock after a trip """
+        for channel in self.channels:
+            channel.unlock()
+        self.tripped = False
+
+
+class Liveness:
+    """ feed a WDT only while the control loops make progress
+        - add(): a slot for a loop; the loop calls beat(slot) while it
+          has work in hand, and idle(slot) before it waits for input
+        - run(): every period_ms, feed the WDT if each busy slot has
+          beaten since the last feed
+        - a stuck loop, or a blocking coroutine that starves run(),
+          stops the feed: the board resets and the motor outputs start off
+        - a busy loop must beat at least every WDT timeout less period_ms
+    """
+
+    def __init__(self, wdt, period_ms, n_slots=2):
+        self.wdt = wdt
+        self.period_ms = period_ms
+        self._beats = array('H', bytes(2 * n_slots))
+        self._fed = array('H', bytes(2 * n_slots))
+        self._busy = bytearray(n_slots)
+        self._n = 0
+        self.n_missed = 0  # checks without a feed
+
+    def add(self):
+        """ return a new slot; starts idle """
+        slot = self._n
+        self._n += 1
+        return slot
+
+    def beat(self, slot):
+        """ loop slot has made progress """
+        self._beats[slot] = (self._beats[slot] + 1) & 0xffff
+        self._busy[slot] = 1
+
+    def idle(self, slot):
+        """ loop slot is waiting for input: not checked """
+        self._busy[slot] = 0
+
+    def check(self):
+        """ return True if every busy slot has beaten since the last feed """
+        for k in range(self._n):
+            if self._busy[k] and self._beats[k] == self._fed[k]:
+                self.n_missed += 1
+                return False
+        for k in range(self._n):
+            self._fed[k] = self._beats[k]
+        return True
+
+    async def run(self):
+        """ coro: feed the WDT while check() passes """
+        while True:
+            if self.check():
+                self.wdt.feed()
+            await asyncio.sleep_ms(self.period_ms)
@@ -0,0 +1,82 @@
+# gc_monitor.py
+""" allocation and garbage-collection statistics per control cycle
+    - tick() once per cycle, e.g. per ramp step
+    - alloc: heap bytes allocated between ticks, by any task
+    - a fall in gc.mem_alloc() between ticks means a collection ran:
+      the cycle time is counted as a gc cycle
+    - collect(): timed gc.collect() for safe points, e.g. motors stopped
+"""
+
+import gc
+from time import ticks_us, ticks_diff
+
+
+class GcMonitor:
+    """ per-cycle allocation and gc-pause statistics """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._t = None
+        self._alloc = 0
+        self.n_cycles = 0
+        self.alloc_sum = 0
+        self.alloc_max = 0
+        self.cycle_max_us = 0  # cycles without a collection
+        self.n_gc = 0
+        self.gc_cycle_max_us = 0  # cycles with a collection
+        self.n_collect = 0
+        self.collect_max_us = 0
+
+    def start(self):
+        """ begin a run of cycles; the gap since the last tick is skipped """
+        self._t = ticks_us()
+        self._alloc = gc.mem_alloc()
+
+    def tick(self):
+        """ record the cycle ended now """
+        alloc = gc.mem_alloc()
+        t = ticks_us()
+        if self._t is None:
+            self._t = t
+            self._alloc = alloc
+            return
+        dt = ticks_diff(t, self._t)
+        da = alloc - self._alloc
+        self._t = t
+        self._alloc = alloc
+        self.n_cycles += 1
+        if da < 0:
+            self.n_gc += 1
+            if dt > self.gc_cycle_max_us:
+                self.gc_cycle_max_us = dt
+            return
+        self.alloc_sum += da
+        if da > self.alloc_max:
+            self.alloc_max = da
+        if dt > self.cycle_max_us:
+            self.cycle_max_us = dt
+
+    def collect(self):
+        """ run and time a collection; return pause in us """
+        t = ticks_us()
+        gc.collect()
+        pause = ticks_diff(ticks_us(), t)
+        self.n_collect += 1
+        if pause > self.collect_max_us:
+            self.collect_max_us = pause
+        if self._t is not None:
+            self.start()
+        return pause
+
+    def stats(self):
+        """ return dict of statistics """
+        n = self.n_cycles - self.n_gc
+        return {'cycles': self.n_cycles,
+                'alloc_mean': self.alloc_sum // n if n else 0,
+                'alloc_max': self.alloc_max,
+                'cycle_max_us': self.cycle_max_us,
+                'gc_cycles': self.n_gc,
+                'gc_cycle_max_us': self.gc_cycle_max_us,
+                'collect_max_us': self.collect_max_us}
@@ -4,7 +4,7 @@
     - David Jones, Famous Trains Derby
 """
 
-from machine import Pin, PWM
+from machine import Pin, PWM, disable_irq, enable_irq
 
 
 class L298nChannel:
@@ -13,15 +13,24 @@ class L298nChannel:
         - states: 'S': stopped, 'F': forward, 'R': reverse, 'H': halt
         - f_ and duty cycle: no range checking
         - RP2040 processor: PWM "slice" channels share a common frequency
+        - optional recorder logs each duty-cycle change
+        - lock(): duty cycle held at 0 until unlock(); safe in an isr
+        - set_dc_u16() cannot undo a lock(): irqs are masked from the
+          locked check to the write, and locked is checked again after
+          the write for a lock() from the other core
     """
 
     # pins (IN1, IN2) or (IN3, IN4)
     STATES = {'S': (1, 1), 'F': (1, 0), 'R': (0, 1), 'H': (0, 0)}
 
-    def __init__(self, en_pin_, h_pins_, f_):
+    def __init__(self, en_pin_, h_pins_, f_, ch_id=0):
+        self.ch_id = ch_id
+        self.recorder = None
         self.enable = PWM(Pin(en_pin_), freq=f_, duty_u16=0)
         self.sw_0 = Pin(h_pins_[0], Pin.OUT)
         self.sw_1 = Pin(h_pins_[1], Pin.OUT)
+        self.locked = False
+        self.state = 'S'
         self.set_state('S')
         self.dc_u16 = 0
 
@@ -31,19 +40,37 @@ class L298nChannel:
 
     def set_dc_u16(self, dc_u16):
         """ set duty cycle by 16-bit unsigned integer """
+        irq_state = disable_irq()
+        if self.locked:
+            dc_u16 = 0
         self.enable.duty_u16(dc_u16)
+        if dc_u16 and self.locked:
+            dc_u16 = 0
+            self.enable.duty_u16(0)
         self.dc_u16 = dc_u16
+        enable_irq(irq_state)
+        if self.recorder:
+            self.recorder.record(self.ch_id, self.state, dc_u16)
 
     def set_state(self, state):
         """ set H-bridge switch states """
         self.sw_0.value(self.STATES[state][0])
         self.sw_1.value(self.STATES[state][1])
+        self.state = state
 
     def stop(self):
         """ set state to 'S'; halt the motor """
         self.set_dc_u16(0)
         self.set_state('S')
 
+    def lock(self):
+        """ stop and hold duty cycle at 0 """
+        self.locked = True
+        self.stop()
+
+    def unlock(self):
+        self.locked = False
+
 
 class L298N:
     """ control a generic L298N H-bridge board
@@ -58,9 +85,9 @@ class L298N:
     def __init__(self, pins_, f):
 
         # channel A: PWM input to ENA; bridge-switching inputs to IN1 and IN2
-        self.channel_a = L298nChannel(pins_['enA'], (pins_['in1'], pins_['in2']), f)
+        self.channel_a = L298nChannel(pins_['enA'], (pins_['in1'], pins_['in2']), f, 0)
         # channel B: PWM input to ENB; bridge-switching inputs to IN3 and IN4
-        self.channel_b = L298nChannel(pins_['enB'], (pins_['in3'], pins_['in4']), f)
+        self.channel_b = L298nChannel(pins_['enB'], (pins_['in3'], pins_['in4']), f, 1)
 
     def stop(self):
         """ set all control inputs off (0) """
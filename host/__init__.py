@@ -0,0 +1,98 @@
+# host package
+""" run the controller modules under CPython
+    - install() registers stand-ins for machine and micropython and adds
+      the MicroPython extensions to time, asyncio and help()
+    - simulated hardware state and event log: host.hw.hw
+    - command-line runner: python -m host.run <module>
+"""
+
+import asyncio
+import builtins
+import gc
+import sys
+import time
+import tracemalloc
+from host.hw import hw
+from host.lcd1602 import Lcd1602
+
+
+class ThreadSafeFlag:
+    """ asyncio.ThreadSafeFlag: set() may be called from irq or thread
+        - the flag stays set until a wait() returns, as on MicroPython,
+          also when set() comes before the first wait()
+    """
+
+    def __init__(self):
+        self._ev = asyncio.Event()
+        self._loop = None  # loop of the last wait()
+
+    def set(self):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                # another thread: wake the waiter from its own loop
+                try:
+                    loop.call_soon_threadsafe(self._ev.set)
+                    return
+                except RuntimeError:  # loop closed meanwhile
+                    pass
+        self._ev.set()
+
+    def clear(self):
+        self._ev.clear()
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # first wait, or a new loop: keep the set state
+            ev = asyncio.Event()
+            if self._ev.is_set():
+                ev.set()
+            self._ev = ev
+            self._loop = loop
+        await self._ev.wait()
+        self._ev.clear()
+
+
+def _sleep_ms(ms):
+    return asyncio.sleep(ms / 1_000)
+
+
+def _help(obj=None):
+    """ MicroPython-style help(): object type and attributes """
+    if obj is None:
+        print('MicroPython host stand-in')
+        return
+    print(f'object {obj} is of type {type(obj).__name__}')
+    for name in dir(obj):
+        if not name.startswith('__'):
+            print(f'  {name} -- {getattr(obj, name)!r}')
+
+
+def _mem_alloc():
+    """ gc.mem_alloc(): traced heap bytes; 0 unless tracemalloc is tracing """
+    return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+
+
+def install(lcd=True):
+    """ make machine and micropython importable; optionally attach LCD """
+    from host import machine, micropython
+    sys.modules['machine'] = machine
+    sys.modules['micropython'] = micropython
+    time.sleep_ms = lambda ms: hw.clock.sleep_ms(ms)
+    time.sleep_us = lambda us: hw.clock.sleep_ms(us / 1_000)
+    time.ticks_ms = lambda: hw.clock.ticks_ms()
+    time.ticks_us = lambda: hw.clock.ticks_us()
+    time.ticks_diff = lambda t1, t2: t1 - t2
+    time.ticks_add = lambda t, delta: t + delta
+    asyncio.sleep_ms = _sleep_ms
+    asyncio.ThreadSafeFlag = ThreadSafeFlag
+    builtins.help = _help
+    gc.mem_alloc = _mem_alloc
+    gc.mem_free = lambda: 0
+    if lcd and Lcd1602.ADDRESS not in hw.i2c_devices:
+        hw.attach_i2c(Lcd1602.ADDRESS, Lcd1602())
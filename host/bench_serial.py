@@ -0,0 +1,60 @@
+# bench_serial.py
+""" exercise serial_ctrl over the host serial link in real time
+    - python -m host.bench_serial
+    - commands are sent while ramps run; reports command latency
+      and ramp step timing from a DutyRecorder
+"""
+
+import asyncio
+import struct
+import host
+
+host.install()
+
+from host.serial_link import SerialLink, SerialClient
+from hb_l298n import L298N
+from motor_ctrl import MotorCtrl
+from dc_recorder import DutyRecorder
+import serial_ctrl as sc
+
+PINS = {'enA': 10, 'in1': 11, 'in2': 12, 'in3': 13, 'in4': 14, 'enB': 15}
+
+
+async def bench():
+    board = L298N(PINS, 15_000)
+    controller = MotorCtrl(board, {'F': 45_000, 'R': 40_000}, {'F': 45_000, 'R': 40_000})
+    recorder = DutyRecorder()
+    recorder.attach(board.channel_a, board.channel_b)
+    link = SerialLink()
+    server = sc.SerialCtrl(controller, *link.device_streams())
+    asyncio.create_task(server.run())
+    client = SerialClient(*link.host_streams())
+
+    await client.command(sc.CMD_TELEMETRY, struct.pack('<H', 100))
+    await client.command(sc.CMD_RUN, b'F')
+    for _ in range(20):  # poll state during the ramp
+        await client.get_state()
+        await asyncio.sleep_ms(50)
+    print(f'state after start: {await client.get_state()}')
+    await client.command(sc.CMD_SET_SPEED, b'AF' + struct.pack('<H', 50_000))
+    await asyncio.sleep_ms(500)
+    await client.command(sc.CMD_STOP, b'F')
+    await asyncio.sleep_ms(1_200)
+    await client.command(sc.CMD_TELEMETRY, struct.pack('<H', 0))
+    print(f'state after stop: {await client.get_state()}')
+    status, _ = await client.command(0x7f)
+    print(f'unknown command status: {status}')
+
+    lat = client.latency_us
+    print(f'commands: {len(lat)}; latency us: min {min(lat)} '
+          f'mean {sum(lat) // len(lat)} max {max(lat)}')
+    print(f'telemetry frames: {len(client.telemetry)}; '
+          f'link bytes: {link.to_device.n_bytes} in, {link.to_host.n_bytes} out')
+    step_ms = 1_000 // controller.n_steps
+    for ch_id in (0, 1):
+        print(f'channel {ch_id} step timing: {recorder.timing_stats(ch_id, step_ms)}')
+    client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(bench())
@@ -0,0 +1,68 @@
+# bench_speed.py
+""" compare open-loop and PI speed control against host.motor_model
+    - python -m host.bench_speed
+    - step to the no-load duty for SETPOINT, then hold for RUN_MS
+    - settle: last time speed is outside SETTLE_PC of setpoint
+"""
+
+import asyncio
+import host
+
+host.install()
+
+from host import vtime
+from host.hw import hw
+from host.motor_model import MotorModel
+from hb_l298n import L298nChannel
+from adc import Adc
+from speed_ctrl import SpeedReg
+
+SETPOINT = 30_000  # feedback u16
+KP_Q = 256  # 1.0
+KI_Q = 64  # 0.25 per tick
+RUN_MS = 3_000
+SAMPLE_MS = 5
+SETTLE_PC = 2
+LOADS = (0.0, 0.2, 0.4)
+
+
+async def trial(load, closed):
+    """ coro: return (settle_ms, final error %) for one run """
+    hw.reset()
+    channel = L298nChannel(10, (11, 12), 15_000)
+    model = MotorModel(10, load=load)
+    hw.set_adc(26, model.read)
+    channel.set_state('F')
+    channel.set_dc_u16(int(SETPOINT / model.gain) + model.stiction_u16)
+    reg = None
+    if closed:
+        reg = SpeedReg(channel, Adc(26), KP_Q, KI_Q)
+        reg.start(SETPOINT)
+    band = SETPOINT * SETTLE_PC / 100
+    settle_ms = 0
+    tail = []
+    for t_ms in range(0, RUN_MS, SAMPLE_MS):
+        speed = model.read()
+        if abs(speed - SETPOINT) > band:
+            settle_ms = t_ms + SAMPLE_MS
+        if t_ms >= RUN_MS - 500:
+            tail.append(speed)
+        await asyncio.sleep_ms(SAMPLE_MS)
+    if reg:
+        reg.stop()
+    error_pc = 100 * (sum(tail) / len(tail) - SETPOINT) / SETPOINT
+    return settle_ms, error_pc
+
+
+async def bench():
+    print(f'setpoint {SETPOINT}; kp_q {KP_Q} ki_q {KI_Q}; settle band {SETTLE_PC}%')
+    for load in LOADS:
+        for closed in (False, True):
+            settle_ms, error_pc = await trial(load, closed)
+            mode = 'PI  ' if closed else 'open'
+            settled = f'{settle_ms} ms' if settle_ms < RUN_MS else 'not settled'
+            print(f'load {load:.1f} {mode}: settle {settled}; final error {error_pc:+.1f}%')
+
+
+if __name__ == '__main__':
+    vtime.run(bench())
@@ -0,0 +1,35 @@
+# cycles.py
+""" per-cycle timing statistics from the host.hw event log """
+
+
+def pwm_cycles(log, pin_id):
+    """ return (start_us, end_us) for each period of non-zero duty on pin_id """
+    cycles = []
+    start = None
+    for t_us, kind, target, value in log:
+        if kind != 'pwm' or target != pin_id:
+            continue
+        if value and start is None:
+            start = t_us
+        elif not value and start is not None:
+            cycles.append((start, t_us))
+            start = None
+    return cycles
+
+
+def summary(values):
+    """ return dict of n, min, mean and max """
+    if not values:
+        return {'n': 0}
+    return {'n': len(values), 'min': min(values),
+            'mean': round(sum(values) / len(values), 1), 'max': max(values)}
+
+
+def cycle_report(log, pin_ids):
+    """ print run-time and start-to-start period of each PWM pin, in ms """
+    for pin_id in pin_ids:
+        cycles = pwm_cycles(log, pin_id)
+        run_ms = [(end - start) / 1_000 for start, end in cycles]
+        period_ms = [(b[0] - a[0]) / 1_000 for a, b in zip(cycles, cycles[1:])]
+        print(f'PWM pin {pin_id}: run ms {summary(run_ms)}')
+        print(f'PWM pin {pin_id}: period ms {summary(period_ms)}')
@@ -0,0 +1,68 @@
+# decode_log.py
+""" convert run_log files to CSV
+    - python -m host.decode_log run_0.bin run_1.bin > run.csv
+    - files are ordered by their EV_OPEN generation
+    - boot: count of EV_BOOT records, from 0
+"""
+
+import argparse
+import csv
+import os
+import struct
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_records(filename, record_format, record_size):
+    """ return list of record tuples in filename
+        - all-zero records are padding, e.g. after the header, and skipped
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    n = len(data) // record_size
+    blank = bytes(record_size)
+    return [struct.unpack_from(record_format, data, i * record_size) for i in range(n)
+            if data[i * record_size:(i + 1) * record_size] != blank]
+
+
+def main(argv=None):
+    import host
+    host.install(lcd=False)
+    sys.path.insert(0, REPO_DIR)
+    import run_log
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*', default=list(run_log.FILES))
+    parser.add_argument('--out', help='CSV file; default stdout')
+    args = parser.parse_args(argv)
+
+    logs = []
+    for filename in args.files:
+        if not os.path.exists(filename):
+            continue
+        records = read_records(filename, run_log.RECORD_FORMAT, run_log.RECORD_SIZE)
+        if records and records[0][1] == run_log.EV_OPEN:
+            logs.append((records[0][6], records))
+    logs.sort(key=lambda g: g[0])
+
+    out = open(args.out, 'w', newline='') if args.out else sys.stdout
+    writer = csv.writer(out)
+    writer.writerow(('boot', 'tick_ms', 'event', 'direction', 'a_u16', 'b_u16',
+                     'cycle', 'value'))
+    boot = 0
+    n_boots = 0
+    for _, records in logs:
+        for tick, event, direction, a_u16, b_u16, cycle, value in records:
+            if event == run_log.EV_BOOT:
+                boot = n_boots
+                n_boots += 1
+            writer.writerow((boot, tick, run_log.EVENTS.get(event, event),
+                             chr(direction) if direction else '', a_u16, b_u16,
+                             cycle, value))
+    if args.out:
+        out.close()
+
+
+if __name__ == '__main__':
+    main()
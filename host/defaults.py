@@ -0,0 +1,25 @@
+# defaults.py
+""" configuration files written to the simulation working directory """
+
+IO_P = {
+    'i2c_pins': {'sda': 0, 'scl': 1},
+    'buttons': {'run': 6, 'kill': 7},
+    'block': 10,
+}
+
+L298N_P = {
+    'pins': {'enA': 10, 'in1': 11, 'in2': 12, 'in3': 13, 'in4': 14, 'enB': 15},
+    'pulse_f': 15_000,
+}
+
+MOTOR_P = {
+    'a_speed': {'F': 70, 'R': 60},
+    'b_speed': {'F': 70, 'R': 60},
+    'hold': 5_000,
+}
+
+FILES = {
+    'io_p.json': IO_P,
+    'l298n_p.json': L298N_P,
+    'motor_p.json': MOTOR_P,
+}
@@ -0,0 +1,111 @@
+# hw.py
+""" shared state of the simulated Pico
+    - clock, pin levels, attached I2C devices and ADC sources
+    - event log of every pin write, PWM change and I2C transaction
+"""
+
+import time
+
+
+class Clock:
+    """ monotonic ms/us clock; replaced by a virtual clock for simulation """
+
+    def __init__(self):
+        self._t0 = time.monotonic_ns()
+
+    def ticks_us(self):
+        return (time.monotonic_ns() - self._t0) // 1_000
+
+    def ticks_ms(self):
+        return self.ticks_us() // 1_000
+
+    def sleep_ms(self, ms):
+        """ blocking sleep """
+        time.sleep(ms / 1_000)
+
+
+class PinState:
+    """ level and interrupt handlers of one GPIO """
+
+    def __init__(self, pin_id):
+        self.pin_id = pin_id
+        self.level = 0
+        self.driven = False  # level set externally by HW.drive()
+        self.mode = None
+        self.irq = None  # (handler, trigger, pin object)
+
+
+class HW:
+    """ simulated hardware registry and event log
+        - log entries: (t_us, kind, target, value)
+        - kinds: 'pin', 'pwm', 'freq', 'i2c', 'adc', 'wdt'
+    """
+
+    def __init__(self):
+        self.clock = Clock()
+        self.pins = {}
+        self.i2c_devices = {}
+        self.adc_sources = {}
+        self.pwm_duty = {}
+        self.log = []
+        self.logging = True
+
+    def reset(self):
+        """ clear pins, devices and log; keep the clock """
+        self.pins.clear()
+        self.i2c_devices.clear()
+        self.adc_sources.clear()
+        self.pwm_duty.clear()
+        self.log.clear()
+
+    def record(self, kind, target, value):
+        if self.logging:
+            self.log.append((self.clock.ticks_us(), kind, target, value))
+
+    def pin(self, pin_id):
+        """ return PinState for pin_id, created on first use """
+        if pin_id not in self.pins:
+            self.pins[pin_id] = PinState(pin_id)
+        return self.pins[pin_id]
+
+    def drive(self, pin_id, level):
+        """ drive pin externally; runs the pin's irq handler if triggered """
+        from machine import Pin
+        state = self.pin(pin_id)
+        state.driven = True
+        if level == state.level:
+            return
+        state.level = level
+        trigger = Pin.IRQ_RISING if level else Pin.IRQ_FALLING
+        if state.irq:
+            handler, mask, pin = state.irq
+            if mask & trigger:
+                handler(pin)
+
+    def press(self, pin_id):
+        """ press active-low (pull-up) button """
+        self.drive(pin_id, 0)
+
+    def release(self, pin_id):
+        self.drive(pin_id, 1)
+
+    def set_adc(self, pin_id, source):
+        """ set ADC input: u16 value or callable returning one """
+        self.adc_sources[pin_id] = source
+
+    def attach_i2c(self, address, device):
+        self.i2c_devices[address] = device
+
+    def stats(self):
+        """ return count of log entries and bytes by kind """
+        counts = {}
+        i2c_bytes = 0
+        for _, kind, _, value in self.log:
+            counts[kind] = counts.get(kind, 0) + 1
+            if kind == 'i2c':
+                i2c_bytes += value
+        counts['i2c_bytes'] = i2c_bytes
+        return counts
+
+
+hw = HW()
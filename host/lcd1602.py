@@ -0,0 +1,63 @@
+# lcd1602.py
+""" emulated LCD1602 I2C module (AiP31068 controller) """
+
+
+class Lcd1602:
+    """ display RAM and command decoding
+        - control byte: Co (0x80) set, one byte follows; RS (0x40) set: data
+        - DDRAM addresses: row 0 from 0x00, row 1 from 0x40
+    """
+
+    ADDRESS = 62
+
+    def __init__(self, cols=16, rows=2, echo=False):
+        self.cols = cols
+        self.rows = rows
+        self.echo = echo
+        self.ddram = [bytearray(b' ' * 40) for _ in range(rows)]
+        self.addr = 0
+        self.n_commands = 0
+        self.n_chars = 0
+
+    def write(self, data):
+        """ decode one I2C transaction """
+        i = 0
+        while i < len(data) - 1:
+            control = data[i]
+            is_data = control & 0x40
+            if control & 0x80:
+                # Co set: one byte, then another control byte
+                self._byte(is_data, data[i + 1])
+                i += 2
+            else:
+                for b in data[i + 1:]:
+                    self._byte(is_data, b)
+                break
+        if self.echo:
+            print('|'.join(self.text()))
+
+    def _byte(self, is_data, b):
+        if is_data:
+            self._data(b)
+        else:
+            self._command(b)
+
+    def _command(self, cmd):
+        self.n_commands += 1
+        if cmd == 0x01:
+            for line in self.ddram:
+                line[:] = b' ' * 40
+            self.addr = 0
+        elif cmd & 0x80:
+            self.addr = cmd & 0x7f
+
+    def _data(self, b):
+        row, col = divmod(self.addr, 0x40)
+        if row < self.rows and col < 40:
+            self.ddram[row][col] = b
+        self.n_chars += 1
+        self.addr += 1
+
+    def text(self):
+        """ return visible rows as strings """
+        return [line[:self.cols].decode('latin-1') for line in self.ddram]
@@ -0,0 +1,221 @@
+# machine.py
+""" CPython stand-in for the MicroPython machine module (RP2040 subset) """
+
+import asyncio
+from host.hw import hw
+
+
+class Pin:
+    """ GPIO backed by host.hw pin state """
+
+    IN = 0
+    OUT = 1
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, pin_id, mode=None, pull=None, value=None):
+        self.pin_id = pin_id
+        self._state = hw.pin(pin_id)
+        if mode is not None:
+            self._state.mode = mode
+        if pull == self.PULL_UP and mode == self.IN and not self._state.driven:
+            self._state.level = 1
+        if value is not None:
+            self.value(value)
+
+    def value(self, level=None):
+        if level is None:
+            return self._state.level
+        level = 1 if level else 0
+        self._state.level = level
+        hw.record('pin', self.pin_id, level)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        """ set the GPIO's handler: one per GPIO, as on MicroPython
+            - replaces a handler set through any Pin object for the GPIO
+        """
+        self._state.irq = (handler, trigger, self) if handler else None
+
+    def __repr__(self):
+        return f'Pin({self.pin_id})'
+
+
+class Signal:
+    """ pin with optional inverted logic """
+
+    def __init__(self, pin, *args, invert=False):
+        self._pin = pin if isinstance(pin, Pin) else Pin(pin, *args)
+        self._invert = invert
+
+    def value(self, level=None):
+        if level is None:
+            return self._pin.value() ^ self._invert
+        self._pin.value(bool(level) ^ self._invert)
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+
+class PWM:
+    """ PWM output; duty changes are logged """
+
+    def __init__(self, pin, freq=1_000, duty_u16=0):
+        self.pin_id = pin.pin_id
+        self._freq = freq
+        self._duty = duty_u16
+        hw.pwm_duty[self.pin_id] = duty_u16
+        hw.record('freq', self.pin_id, freq)
+        hw.record('pwm', self.pin_id, duty_u16)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+        hw.record('freq', self.pin_id, value)
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+        hw.pwm_duty[self.pin_id] = value
+        hw.record('pwm', self.pin_id, value)
+
+    def deinit(self):
+        self.duty_u16(0)
+
+
+class I2C:
+    """ I2C bus; transactions go to devices attached to host.hw """
+
+    def __init__(self, bus_id, sda=None, scl=None, freq=400_000):
+        self.bus_id = bus_id
+        self.freq = freq
+
+    def scan(self):
+        return sorted(hw.i2c_devices)
+
+    def _device(self, addr):
+        if addr not in hw.i2c_devices:
+            raise OSError(5)  # EIO: no acknowledge
+        return hw.i2c_devices[addr]
+
+    def writeto(self, addr, buf, stop=True):
+        data = bytes(buf)
+        self._device(addr).write(data)
+        hw.record('i2c', addr, len(data))
+        return len(data)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        if isinstance(buf, str):
+            buf = buf.encode('latin-1')
+        data = bytes(buf)
+        self._device(addr).write(bytes((memaddr,)) + data)
+        hw.record('i2c', addr, len(data) + 1)
+
+
+class ADC:
+    """ ADC input; value set by host.hw.set_adc() """
+
+    def __init__(self, pin):
+        self.pin_id = pin.pin_id if isinstance(pin, Pin) else pin
+
+    def read_u16(self):
+        source = hw.adc_sources.get(self.pin_id, 0)
+        value = source() if callable(source) else source
+        hw.record('adc', self.pin_id, value)
+        return max(0, min(0xffff, int(value)))
+
+
+class Timer:
+    """ software timer run by the asyncio event loop """
+
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id=-1, **kwargs):
+        self._handle = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, period=-1, freq=-1, callback=None, hard=True):
+        self.deinit()
+        if freq > 0:
+            period = 1_000 / freq
+        self._mode = mode
+        self._period_s = period / 1_000
+        self._callback = callback
+        self._loop = asyncio.get_event_loop()
+        self._next = self._loop.time() + self._period_s
+        self._handle = self._loop.call_at(self._next, self._fire)
+
+    def _fire(self):
+        if self._mode == self.PERIODIC:
+            # fixed-rate schedule: no drift from late callbacks
+            self._next += self._period_s
+            self._handle = self._loop.call_at(self._next, self._fire)
+        else:
+            self._handle = None
+        if self._callback:
+            self._callback(self)
+
+    def deinit(self):
+        if self._handle:
+            self._handle.cancel()
+            self._handle = None
+
+
+class WDT:
+    """ watchdog: machine.reset() unless fed within timeout ms
+        - expiry is checked by the event loop
+    """
+
+    def __init__(self, id=0, timeout=5_000):
+        self._timeout_s = timeout / 1_000
+        self._loop = asyncio.get_event_loop()
+        self._handle = None
+        self.feed()
+
+    def feed(self):
+        if self._handle:
+            self._handle.cancel()
+        self._handle = self._loop.call_later(self._timeout_s, self._expire)
+
+    def _expire(self):
+        hw.record('wdt', 0, 0)
+        reset()
+
+
+def disable_irq():
+    """ irq handlers run from the event loop or the caller: nothing to mask """
+    return 0
+
+
+def enable_irq(state):
+    pass
+
+
+PWRON_RESET = 1
+WDT_RESET = 3
+
+
+def reset_cause():
+    return PWRON_RESET
+
+
+def freq(hz=None):
+    return 125_000_000
+
+
+def reset():
+    raise SystemExit('machine.reset()')
@@ -0,0 +1,25 @@
+# micropython.py
+""" CPython stand-in for the micropython module """
+
+import asyncio
+
+
+def const(value):
+    return value
+
+
+def schedule(func, arg):
+    """ run func(arg) from the event loop, or at once if none is running """
+    try:
+        asyncio.get_running_loop().call_soon(func, arg)
+    except RuntimeError:
+        func(arg)
+
+
+def alloc_emergency_exception_buf(size):
+    pass
+
+
+def kbd_intr(chr_):
+    """ Ctrl-C is handled by the host terminal """
+    pass
@@ -0,0 +1,37 @@
+# motor_model.py
+""" first-order DC motor model for closed-loop simulation
+    - speed follows PWM duty above a stiction threshold, lag tau_ms
+    - load reduces the speed reached for a given duty
+    - read() returns the feedback voltage as u16: use with hw.set_adc()
+"""
+
+from host.hw import hw
+
+
+class MotorModel:
+    """ motor driven by the PWM on pwm_pin """
+
+    def __init__(self, pwm_pin, stiction_u16=12_000, gain=1.0, tau_ms=150,
+                 load=0.0):
+        self.pwm_pin = pwm_pin
+        self.stiction_u16 = stiction_u16
+        self.gain = gain
+        self.tau_ms = tau_ms
+        self.load = load
+        self.speed = 0.0
+        self._t_us = None
+
+    def _advance(self):
+        """ integrate speed up to the current time """
+        now = hw.clock.ticks_us()
+        if self._t_us is not None:
+            dt_ms = (now - self._t_us) / 1_000
+            duty = hw.pwm_duty.get(self.pwm_pin, 0)
+            drive = max(0, duty - self.stiction_u16) * self.gain * (1 - self.load)
+            alpha = min(1.0, dt_ms / self.tau_ms)
+            self.speed += (drive - self.speed) * alpha
+        self._t_us = now
+
+    def read(self):
+        self._advance()
+        return self.speed
@@ -0,0 +1,140 @@
+# run.py
+""" run a controller module's main() on the host
+    - python -m host.run incline_control --press 2000:run --press 40000:kill:1000
+    - config files are written to a temporary working directory
+    - press spec: t_ms:pin[:hold_ms]; pin may be a button name in io_p.json
+    - --every period_ms:pin[:hold_ms] presses repeatedly
+    - --virtual: run on a virtual clock; hours simulate in seconds
+    - --alloc: trace allocations so gc.mem_alloc() reports heap use
+    - --trace file.json: profile module tasks; write a Chrome trace
+"""
+
+import argparse
+import asyncio
+import csv
+import importlib
+import json
+import os
+import sys
+import tracemalloc
+import tempfile
+
+import host
+from host import defaults, vtime
+from host.cycles import cycle_report
+from host.hw import hw
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_dir(path):
+    """ change to path; write default config files that are missing """
+    os.makedirs(path, exist_ok=True)
+    os.chdir(path)
+    for filename, data in defaults.FILES.items():
+        if not os.path.exists(filename):
+            with open(filename, 'w') as f:
+                json.dump(data, f)
+
+
+def parse_press(spec, buttons):
+    """ return (t_ms, pin_id, hold_ms) from t_ms:pin[:hold_ms] """
+    fields = spec.split(':')
+    pin = fields[1]
+    pin_id = buttons[pin] if pin in buttons else int(pin)
+    hold_ms = int(fields[2]) if len(fields) > 2 else 100
+    return int(fields[0]), pin_id, hold_ms
+
+
+async def press_button(t_ms, pin_id, hold_ms):
+    """ coro: press and release an active-low button """
+    await asyncio.sleep(t_ms / 1_000)
+    hw.press(pin_id)
+    await asyncio.sleep(hold_ms / 1_000)
+    hw.release(pin_id)
+
+
+async def press_every(period_ms, pin_id, hold_ms):
+    """ coro: press button every period_ms """
+    while True:
+        await press_button(period_ms, pin_id, hold_ms)
+
+
+async def run_main(module, presses, repeats, seconds, profiler=None):
+    """ coro: run module.main() with scripted presses, for at most seconds """
+    for press in presses:
+        asyncio.create_task(press_button(*press))
+    for press in repeats:
+        asyncio.create_task(press_every(*press))
+    if profiler:
+        profiler.install()  # module tasks only
+    if asyncio.iscoroutinefunction(module.main):
+        try:
+            await asyncio.wait_for(module.main(), seconds)
+        except asyncio.TimeoutError:
+            print(f'\nSimulation stopped after {seconds} s')
+    else:
+        module.main()
+
+
+def report(log_file=None):
+    """ print hardware usage; optionally write the event log as CSV """
+    print(f'Hardware events: {hw.stats()}')
+    pwm_pins = sorted({target for _, kind, target, _ in hw.log if kind == 'pwm'})
+    cycle_report(hw.log, pwm_pins)
+    for device in hw.i2c_devices.values():
+        if hasattr(device, 'text'):
+            print('LCD: ' + ' | '.join(device.text()))
+    if log_file:
+        with open(log_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('t_us', 'kind', 'target', 'value'))
+            writer.writerows(hw.log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('module', help='module with main(), e.g. incline_control')
+    parser.add_argument('--seconds', type=float, default=60)
+    parser.add_argument('--dir', help='working directory for config files')
+    parser.add_argument('--press', action='append', default=[])
+    parser.add_argument('--every', action='append', default=[])
+    parser.add_argument('--virtual', action='store_true', help='virtual clock')
+    parser.add_argument('--echo', action='store_true', help='print each LCD write')
+    parser.add_argument('--log', help='write hardware event log to CSV file')
+    parser.add_argument('--alloc', action='store_true', help='trace allocations')
+    parser.add_argument('--trace', help='write Chrome trace of module tasks to file')
+    args = parser.parse_args(argv)
+
+    log_file = os.path.abspath(args.log) if args.log else None
+    trace_file = os.path.abspath(args.trace) if args.trace else None
+    prepare_dir(args.dir or tempfile.mkdtemp(prefix='ft_host_'))
+    host.install()
+    for device in hw.i2c_devices.values():
+        device.echo = args.echo
+    sys.path.insert(0, REPO_DIR)
+    module = importlib.import_module(args.module)
+
+    with open('io_p.json') as f:
+        buttons = json.load(f).get('buttons', {})
+    presses = [parse_press(p, buttons) for p in args.press]
+    repeats = [parse_press(p, buttons) for p in args.every]
+    run = vtime.run if args.virtual else asyncio.run
+    if args.alloc:
+        tracemalloc.start()
+    profiler = None
+    if trace_file:
+        from loop_profiler import LoopProfiler
+        profiler = LoopProfiler(size=8_192)
+    try:
+        run(run_main(module, presses, repeats, args.seconds, profiler))
+    finally:
+        report(log_file)
+        if profiler:
+            profiler.uninstall()
+            profiler.report()
+            profiler.export_trace(trace_file)
+
+
+if __name__ == '__main__':
+    main()
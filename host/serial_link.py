@@ -0,0 +1,90 @@
+# serial_link.py
+""" in-memory stand-in for the USB CDC serial link
+    - device end: pass to serial_ctrl.SerialCtrl as (reader, writer)
+    - host end: pass to SerialClient
+"""
+
+import asyncio
+import struct
+from time import ticks_us, ticks_diff
+import serial_ctrl as sc
+
+
+class PipeStream:
+    """ one direction of the link: asyncio reader and writer methods """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._ev = asyncio.Event()
+        self.n_bytes = 0
+
+    def write(self, data):
+        self._buf += data
+        self.n_bytes += len(data)
+        self._ev.set()
+
+    async def drain(self):
+        pass
+
+    async def readexactly(self, n):
+        while len(self._buf) < n:
+            self._ev.clear()
+            await self._ev.wait()
+        data = bytes(self._buf[:n])
+        del self._buf[:n]
+        return data
+
+
+class SerialLink:
+    """ both ends of a serial link """
+
+    def __init__(self):
+        self.to_device = PipeStream()
+        self.to_host = PipeStream()
+
+    def device_streams(self):
+        return self.to_device, self.to_host
+
+    def host_streams(self):
+        return self.to_host, self.to_device
+
+
+class SerialClient:
+    """ host side of the protocol
+        - command() returns (status, payload) of the reply
+        - telemetry frames are collected in self.telemetry
+        - latency_us: send-to-reply time of each command
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.telemetry = []
+        self.latency_us = []
+        self._replies = asyncio.Queue()
+        self._task = asyncio.create_task(self._receive())
+
+    async def _receive(self):
+        while True:
+            cmd, payload = await sc.read_frame(self.reader)
+            if cmd == sc.TELEMETRY:
+                self.telemetry.append(struct.unpack(sc.TELEMETRY_FORMAT, payload))
+            else:
+                await self._replies.put((cmd, payload))
+
+    async def command(self, cmd, payload=b''):
+        t0 = ticks_us()
+        self.writer.write(sc.encode_frame(cmd, payload))
+        await self.writer.drain()
+        while True:
+            reply, data = await self._replies.get()
+            if reply == cmd | sc.REPLY:
+                self.latency_us.append(ticks_diff(ticks_us(), t0))
+                return data[0], data[1:]
+
+    async def get_state(self):
+        _, data = await self.command(sc.CMD_GET_STATE)
+        return struct.unpack(sc.STATE_FORMAT, data)
+
+    def close(self):
+        self._task.cancel()
@@ -0,0 +1,68 @@
+# vtime.py
+""" virtual-time asyncio event loop for accelerated simulation
+    - the loop never waits: when idle it jumps to the next timer deadline
+    - ticks_ms(), time.sleep_ms() and machine.Timer follow the virtual clock
+"""
+
+import asyncio
+import math
+import selectors
+from host.hw import hw, Clock
+
+
+class VirtualClock(Clock):
+    """ clock advanced by the event loop, not by real time """
+
+    def __init__(self):
+        super().__init__()
+        self.t_us = 0
+
+    def ticks_us(self):
+        return self.t_us
+
+    def advance_us(self, us):
+        self.t_us += us
+
+    def sleep_ms(self, ms):
+        """ blocking sleep: time passes, nothing else runs """
+        self.t_us += int(ms * 1_000)
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    """ selector that polls without blocking and advances the clock """
+
+    def __init__(self, clock):
+        super().__init__()
+        self.clock = clock
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events:
+            return events
+        if timeout is None:
+            raise RuntimeError('virtual loop idle: no timers pending')
+        self.clock.advance_us(math.ceil(timeout * 1_000_000))
+        return []
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """ asyncio loop on the virtual clock """
+
+    def __init__(self, clock=None):
+        self.clock = clock or VirtualClock()
+        super().__init__(VirtualSelector(self.clock))
+
+    def time(self):
+        return self.clock.t_us / 1_000_000
+
+
+def loop_factory():
+    """ return a VirtualEventLoop on a new clock installed as hw.clock """
+    hw.clock = VirtualClock()
+    return VirtualEventLoop(hw.clock)
+
+
+def run(coro):
+    """ run coro to completion in virtual time """
+    with asyncio.Runner(loop_factory=loop_factory) as runner:
+        return runner.run(coro)
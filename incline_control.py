@@ -4,23 +4,48 @@
     - user button-press initiates motor movement
     - moves Forward and Reverse alternatively
     - button-press is blocked for a set period when pressed
+    - run sequences are step tables: see sequencer.py
+    - e-stop, armed from boot: a dedicated 'estop' button cuts the motors
+      from an interrupt; a run click clears the trip
+    - without an 'estop' button, the kill hold is the e-stop: the motors
+      are cut from an interrupt at the hold threshold, then the run ends
+    - wdt_ms in io_p.json: the event dispatch and sequencer loops feed
+      the watchdog; see estop.Liveness
 """
 
 import asyncio
-import time
+from time import ticks_ms
+from machine import reset_cause, WDT_RESET
 from hb_l298n import L298N
 from motor_ctrl import MotorCtrl
-from buttons import Button, HoldButton
-from lcd_1602 import LcdApi
-from config import read_cf, pc_u16
+from buttons import HoldButton, EventQueue
+from lcd_1602 import LcdApi, LcdRender
+from config import read_cached, ConfigStore
+from calibrate import calibrate
+from serial_ctrl import SerialCtrl, stdio_streams, stdio_release
+from speed_ctrl import regulators_from_cf
+from sequencer import Sequencer, read_sequences
+from estop import EStop, Liveness, T_HOLD_OWN_PIN
+from gc_monitor import GcMonitor
+from run_log import (RunLog, EV_BOOT, EV_STOP, EV_ESTOP, EV_KILL, EV_ANOMALY,
+                     AN_WDT_RESET)
+
+# file name, e.g. 'trace.json': profile tasks; write a Chrome trace on exit
+TRACE_FILE = None
 
 
 class InputButtons:
-    """ input buttons """
+    """ input buttons
+        - estop: EStop on the kill pin, if shared: a GPIO has a single
+          irq handler, so the e-stop isr forwards edges to the kill button
+    """
 
-    def __init__(self, buttons):
-        self.run_btn = Button(buttons["run"])
-        self.kill_btn = HoldButton(buttons["kill"])
+    def __init__(self, buttons, estop=None):
+        self.run_btn = HoldButton(buttons["run"], irq=True)
+        self.kill_btn = HoldButton(buttons["kill"], irq=True)
+        if estop:
+            estop.share(self.kill_btn.edge_isr)
+        self.events = EventQueue((self.run_btn, self.kill_btn))
 
     async def poll_buttons(self):
         """ start button polling """
@@ -32,106 +57,234 @@ class InputButtons:
 async def main():
     """ test of motor control """
 
-    async def monitor_kill_btn(kill_btn_):
+    async def stop_sequence(sequencer_):
+        """ coro: abort the sequence and ramp down """
+        lcd.clear()
+        lcd.write_line(0, 'Stopped')
+        await sequencer_.stop()
+        lcd.write_line(0, 'Waiting...')
+
+    async def dispatch_events(btns_, sequencer_):
         """
-            poll for kill-button hold
-            - intended as emergency or end-of-day switch-off
-            - main() should exit if this task ends
+            act on queued button events
+            - run click: start the next sequence; ignored while one runs,
+              while stopping, or while serial commands drive the motors
+            - run click after a dedicated-pin e-stop trip: clear the trip only
+            - kill click: abort the sequence and ramp down, as a task:
+              events are still handled during the ramp-down
+            - kill hold: emergency or end-of-day switch-off; cancels any
+              ramp-down; returns, and main() should then exit
+            - a shared-pin e-stop trip is queued as a kill hold
+            - beats liveness slot dispatch_slot after each wake
         """
+        events = btns_.events
+        stopping = None
         while True:
-            kill_btn_.press_ev.clear()
-            await kill_btn_.press_ev.wait()
-            if kill_btn_.state == kill_btn_.HOLD:
-                controller.halt_a_b()
-                lcd.clear()
-                lcd.write_line(0, 'End execution')
-                lcd.write_line(1, 'Track power OFF')
-                return
-            await asyncio.sleep(1)
-
-    async def run_incline(btns_, hold_ms, block_s):
-        """ run the incline motors under button control """
-
-        async def countdown(period_s):
-            """ countdown period seconds """
-            period_s = int(period_s)
-            while period_s:
-                lcd.write_line(1, f'{period_s:2d}')
-                await asyncio.sleep_ms(1000)
-                period_s -= 1
-
-        run_btn_ = btns_.run_btn
-        state_ = 'S'
+            if liveness:
+                liveness.idle(dispatch_slot)
+            await events.wait()
+            if liveness:
+                liveness.beat(dispatch_slot)
+            for _, btn, state in events.drain():
+                btn.clear_state()
+                if stopping and stopping.done():
+                    stopping = None
+                if btn is btns_.run_btn:
+                    if estop.tripped:
+                        if not estop_shared:
+                            estop.reset()
+                            lcd.clear()
+                            lcd.write_line(0, 'Waiting...')
+                    elif not (sequencer_.is_busy() or
+                              serial_ctrl and serial_ctrl.is_moving()):
+                        sequencer_.run()
+                elif state == btn.HOLD:
+                    run_log.log(EV_KILL)
+                    if stopping:
+                        stopping.cancel()
+                    await sequencer_.cancel()
+                    controller.halt_a_b()
+                    lcd.clear()
+                    lcd.write_line(0, 'End execution')
+                    lcd.write_line(1, 'Track power OFF')
+                    return
+                else:
+                    run_log.log(EV_STOP)
+                    if not stopping:
+                        stopping = asyncio.create_task(stop_sequence(sequencer_))
+
+    async def monitor_estop(estop_, btns_, sequencer_):
+        """ coro: end the sequence after each e-stop trip
+            - shared kill pin: the trip is queued as a kill hold, which
+              ends the run; the hold event on release comes too late
+        """
         while True:
+            await estop_.trip_ev.wait()
+            run_log.log(EV_ESTOP, value=estop_.latency_us)
+            run_log.flush()
+            if estop_shared:
+                kill_btn = btns_.kill_btn
+                btns_.events.put(kill_btn.q_id, kill_btn.HOLD, ticks_ms())
+                continue
+            await sequencer_.cancel()
             lcd.clear()
-            lcd.write_line(0, "Waiting...")
-            await run_btn_.press_ev.wait()
+            lcd.write_line(0, 'E-STOP')
+            lcd.write_line(1, 'Run: reset')
+
+    async def splash(sequencer_, boot_):
+        """ coro: title until the display is ready plus 1 s; boot report """
+        lcd.write_line(0, 'FT Incline V1.2')
+        lcd.write_line(1, f'I2C addr: {lcd.lcd_api.I2C_ADDR}')
+        await lcd.ready_ev.wait()
+        boot_['lcd'] = lcd.ready_ms
+        if verbose:
+            print(f'Boot phases, ms from power-up: {boot_}')
+            if not lcd.lcd_mode:
+                print('LCD Display not found')
+        await asyncio.sleep_ms(1000)
+        if not sequencer_.is_running():
             lcd.clear()
-            if state_ != 'F':
-                speed_string = (f'A:{controller.a_speeds['F']:05d} ' +
-                                f'B:{controller.b_speeds['F']:05d} ')
-                lcd.write_line(0, 'Fwd accel ')
-                lcd.write_line(1, speed_string)
-                               
-                await controller.start_a_b('F')
-                lcd.write_line(0, 'Fwd hold  ')
-                await asyncio.sleep_ms(hold_ms)
-                lcd.write_line(0, 'Fwd stop  ')
-                lcd.write_line(1, f'A:{0:05d} B:{0:05d} ')
-                controller.stop_a_b('F')
-                state_ = 'F'
-            else:
-                lcd.write_line(0, 'Rev accel ')
-                lcd.write_line(1,
-                               f'A:{controller.a_speeds['R']:05d} ' +
-                               f'B:{controller.b_speeds['R']:05d} ')
-                await controller.start_a_b('R')
-                lcd.write_line(0, 'Rev hold  ')
-                await asyncio.sleep_ms(hold_ms)
-                lcd.write_line(0, 'Rev stop  ')
-                lcd.write_line(1, f'A:{0:05d} B:{0:05d} ')
-                controller.stop_a_b('R')
-                state_ = 'R'
-
-            # block button response
-            await countdown(block_s)
-            run_btn_.press_ev.clear()  # clear all intervening presses
-
-    # read in operating parameters
-    io_p = read_cf('io_p.json')
-    l298n_p = read_cf('l298n_p.json')
-    motor_p = read_cf('motor_p.json')
-
-    lcd = LcdApi(io_p['i2c_pins'])
-    if lcd.lcd_mode:
-        lcd.write_line(0, f'FT Incline V1.2')
-        lcd.write_line(1, f'I2C addr: {lcd.I2C_ADDR}')
+            lcd.write_line(0, 'Waiting...')
+
+    if TRACE_FILE:
+        from loop_profiler import LoopProfiler
+        profiler = LoopProfiler()
+        profiler.install()
+
+    # boot: motors safe and buttons live first; the LCD starts in the background
+    boot = {}
+    # read in operating parameters: speeds already converted to u16
+    io_p, l298n_p, motor_p = read_cached()
+    boot['config'] = ticks_ms()
+    # serial: stdout carries the binary protocol; no console output
+    verbose = not io_p.get('serial')
+
+    wdt_ms = io_p.get('wdt_ms', 0)
+    if wdt_ms:
+        # fed while the control loops run: see dispatch_events() and Sequencer
+        from machine import WDT
+        liveness = Liveness(WDT(timeout=wdt_ms), wdt_ms // 4)
+        dispatch_slot = liveness.add()
+        liveness_task = asyncio.create_task(liveness.run())
     else:
-        print('LCD Display not found')
-    await asyncio.sleep_ms(1000)
-    lcd.clear()
+        liveness = None
 
     board = L298N(l298n_p['pins'], l298n_p['pulse_f'])
-    a_speeds = {'F': pc_u16(motor_p['a_speed']['F']),
-                'R': pc_u16(motor_p['a_speed']['R'])
-                }
-    b_speeds = {'F': pc_u16(motor_p['b_speed']['F']),
-                'R': pc_u16(motor_p['b_speed']['R'])
-                }
+    # e-stop armed before anything can drive the motors, calibration included
+    estop_shared = 'estop' not in io_p['buttons']
+    if estop_shared:
+        estop = EStop(io_p['buttons']['kill'], (board.channel_a, board.channel_b),
+                      HoldButton.T_HOLD)
+    else:
+        estop = EStop(io_p['buttons']['estop'], (board.channel_a, board.channel_b),
+                      T_HOLD_OWN_PIN)
+    a_speeds = motor_p['a_u16']
+    b_speeds = motor_p['b_u16']
 
-    controller = MotorCtrl(board, a_speeds, b_speeds)
-    help(controller)
+    if 'feedback' in motor_p:
+        regulators = regulators_from_cf(board, motor_p['feedback'])
+    else:
+        regulators = None
+    if 'a_start' in motor_p:
+        start_u16 = {'A': motor_p['a_start'], 'B': motor_p['b_start']}
+    else:
+        start_u16 = 16_383
+    if motor_p.get('dual_core'):
+        # ramps stepped on core 1
+        from dual_core import DualCoreCtrl
+        ctrl_class = DualCoreCtrl
+    else:
+        ctrl_class = MotorCtrl
+    controller = ctrl_class(board, a_speeds, b_speeds, start_u16,
+                            profile=motor_p.get('profile', 'linear'),
+                            timer_ramp=motor_p.get('timer_ramp', False),
+                            regulators=regulators)
+    if ctrl_class is MotorCtrl:
+        controller.monitor = GcMonitor()
+    boot['motors'] = ticks_ms()
 
-    ctrl_buttons = InputButtons(io_p['buttons'])
+    ctrl_buttons = InputButtons(io_p['buttons'], estop if estop_shared else None)
     asyncio.create_task(ctrl_buttons.poll_buttons())  # buttons self-poll
+    boot['buttons'] = ticks_ms()
+
+    # operational record: written to flash in whole blocks
+    run_log = RunLog()
+    asyncio.create_task(run_log.run())
+    cause = reset_cause()
+    run_log.log(EV_BOOT, value=cause)
+    if cause == WDT_RESET:
+        run_log.log(EV_ANOMALY, value=AN_WDT_RESET)
+    boot['log'] = ticks_ms()
+
+    lcd = LcdRender(LcdApi(io_p['i2c_pins'], start=False, verbose=verbose))
+    asyncio.create_task(lcd.render())
 
-    asyncio.create_task(run_incline(ctrl_buttons, motor_p['hold'], io_p['block']))
-    print('\nIncline control active')
-    await monitor_kill_btn(ctrl_buttons.kill_btn)
+    store = None
+    if ctrl_buttons.run_btn.is_pressed():
+        # run button held at start-up: calibrate
+        # results written behind by the store task: the loop never waits on flash
+        store = ConfigStore('motor_p.json')
+        asyncio.create_task(store.run())
+        lcd.write_line(0, 'Calibrate...')
+        while ctrl_buttons.run_btn.is_pressed():
+            await asyncio.sleep_ms(20)
+        await asyncio.sleep_ms(100)
+        ctrl_buttons.run_btn.clear_state()
+        # a trip aborts calibration; monitor_estop() then reports it
+        await calibrate(controller, ctrl_buttons, lcd, store, estop=estop)
+    ctrl_buttons.events.clear()
+
+    sequencer = Sequencer(controller, lcd,
+                          read_sequences(motor_p['hold'], io_p['block']))
+    sequencer.run_log = run_log
+    if liveness:
+        sequencer.watch(liveness)
+
+    if io_p.get('serial'):
+        # binary command protocol on the USB serial port: keep the
+        # console quiet; the host resyncs on SYNC past any other output
+        serial_ctrl = SerialCtrl(controller, *stdio_streams(), sequencer)
+        asyncio.create_task(serial_ctrl.run())
+    else:
+        serial_ctrl = None
+    asyncio.create_task(monitor_estop(estop, ctrl_buttons, sequencer))
+    boot['ready'] = ticks_ms()
+    asyncio.create_task(splash(sequencer, boot))
+    if verbose:
+        help(controller)
+        print('\nIncline control active')
+    try:
+        await dispatch_events(ctrl_buttons, sequencer)
+    finally:
+        # the partial block: also on an exception or Ctrl-C
+        run_log.flush()
+        if store:
+            store.commit()  # changes still in their debounce period
+        if liveness:
+            liveness.idle(dispatch_slot)
+        if serial_ctrl:
+            stdio_release()
+    if controller.monitor:
+        print(f'Ramp cycles: {controller.monitor.stats()}')
+    group = controller.group
+    print(f'Ramp skew us: mean {group.mean_skew_us()} max {group.skew_max_us}')
+    if ctrl_class is not MotorCtrl:
+        controller.shutdown()
+    if estop.n_trips:
+        print(f'E-stop latency us: last {estop.latency_us} max {estop.latency_max_us}')
 
     # display kill message
-    time.sleep_ms(3_000)
+    await lcd.flush()
+    await asyncio.sleep_ms(3_000)
     lcd.clear()
+    await lcd.flush()
+    if TRACE_FILE:
+        profiler.uninstall()
+        profiler.report()
+        profiler.export_trace(TRACE_FILE)
+    if liveness:
+        # the watchdog cannot be stopped: stay switched off; loops idle
+        await liveness_task
 
 
 if __name__ == '__main__':
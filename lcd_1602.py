@@ -1,11 +1,35 @@
 # lcd1_602.py
 """ Refactor of Waveshare class for LCD1602 I2C Module """
 
+import asyncio
 from machine import Pin, I2C
 from micropython import const
 import time
 
 
+def put_uint(buf, pos, value, width, fill=0x30):
+    """ write value right-aligned in buf[pos:pos + width]; no allocation
+        - fill: pad character code, 0x30 '0' or 0x20 ' '
+        - a value too wide for the field keeps its low digits
+    """
+    i = pos + width - 1
+    while i >= pos:
+        buf[i] = 0x30 + value % 10
+        value //= 10
+        i -= 1
+        if not value:
+            break
+    while i >= pos:
+        buf[i] = fill
+        i -= 1
+
+
+def put_text(buf, pos, text):
+    """ copy bytes text into buf from pos; no allocation """
+    for i in range(min(len(text), len(buf) - pos)):
+        buf[pos + i] = text[i]
+
+
 class LcdApi:
     """ drive LCD1602 display """
 
@@ -32,97 +56,328 @@ class LcdApi:
     LINES_1 = const(0x00)
     DOTS_5x8 = const(0x00)
 
-    def __init__(self, pins_, dim_=(16, 2)):
+    # unchanged cells bridged in a single write rather than a new cursor command
+    # - a new run costs 2 transactions: about 4 bytes of bus time
+    RUN_GAP = const(4)
+
+    # detected address, kept across boots; 0: no display
+    ADDR_CACHE = 'lcd_addr.bin'
+
+    def __init__(self, pins_, dim_=(16, 2), start=True, verbose=True):
         self.dim = {'cols': dim_[0], 'rows': dim_[1]}
         i = 0 if pins_['sda'] in (0, 4, 8, 12, 16, 20) else 1
         self.i2c = I2C(i, sda=Pin(pins_['sda']), scl=Pin(pins_['scl']), freq=400_000)
         self._cols = self.dim['cols']
         self._rows = self.dim['rows']
         self._show_fn = self.MODE_4BIT | self.LINES_1 | self.DOTS_5x8
+        # shadow copy of display RAM: only changed cells are sent
+        self._shadow = [bytearray(b' ' * self._cols) for _ in range(self._rows)]
+        # reused transmit buffers; _run_buf[n]: a run of n cells
+        self._row_buf = [bytearray(self._cols) for _ in range(self._rows)]
+        self._run_buf = [bytearray(n) for n in range(self._cols + 1)]
+        self._char_buf = bytearray(1)
+        self._cmd_buf = bytearray(1)
+        self._cursor_buf = bytearray(2)
+        self._cursor_buf[0] = 0x80
+        # bus usage counters: transactions and bytes after the address byte
+        self.n_writes = 0
+        self.n_bytes = 0
+        self._n_lines = None
+        self._curr_line = None
+        self._show_ctrl = None
+        self._show_mode = None
+        self.lcd_mode = False
+        self.started = False
+        self.verbose = verbose  # False: no print() mode, e.g. serial protocol
+        if start:
+            self.lcd_mode = self._probe()
+            if self.lcd_mode:
+                self._start(self._rows)
+            self.started = True
+
+    def _scan(self):
+        """ return True if the display address is found on the bus """
         try:
             # address info only; ADDRESS used in code
             address = self.i2c.scan()[0]
             if address != self.I2C_ADDR:
-                self.lcd_mode = False
-                print(f'Other I2C address found: {address}')
-            else:
-                self.lcd_mode = True
+                if self.verbose:
+                    print(f'Other I2C address found: {address}')
+                return False
+            return True
         except IndexError:
-            self.lcd_mode = False
-            print('I2C address not found: print() mode')
-        if self.lcd_mode:
-            self._start(self._rows)
-        self._n_lines = None
-        self._curr_line = None
-        self._show_ctrl = None
-        self._show_mode = None
+            if self.verbose:
+                print('I2C address not found: print() mode')
+            return False
+
+    def _probe(self):
+        """ return True if the display answers
+            - a cached address is tried with one transaction; the bus
+              is scanned only if that fails or nothing is cached
+        """
+        try:
+            with open(self.ADDR_CACHE, 'rb') as f:
+                cached = f.read(1)[0]
+        except (OSError, IndexError):
+            cached = None
+        if cached == self.I2C_ADDR:
+            try:
+                self._command(self.FN_SET | self._show_fn)
+                return True
+            except OSError:
+                pass
+        found = self._scan()
+        address = self.I2C_ADDR if found else 0
+        if address != cached:
+            try:
+                with open(self.ADDR_CACHE, 'wb') as f:
+                    f.write(bytes((address,)))
+            except OSError:
+                pass
+        return found
 
     def _command(self, cmd):
         """ invoke command """
-        self.i2c.writeto_mem(self.I2C_ADDR, 0x80, chr(cmd))
+        self._cmd_buf[0] = cmd
+        self.i2c.writeto_mem(self.I2C_ADDR, 0x80, self._cmd_buf)
+        self.n_writes += 1
+        self.n_bytes += 2
 
     def _set_cursor(self, col, row):
         """ set cursor for write """
-        col |= 0x80 if row == 0 else 0xc0
-        self.i2c.writeto(self.I2C_ADDR, bytearray([0x80, col]))
+        self._cursor_buf[1] = col | (0x80 if row == 0 else 0xc0)
+        self.i2c.writeto(self.I2C_ADDR, self._cursor_buf)
+        self.n_writes += 1
+        self.n_bytes += 2
 
     def _write(self, data):
         """ write out character at cursor position """
-        self.i2c.writeto_mem(self.I2C_ADDR, 0x40, chr(data))
+        self._cmd_buf[0] = data
+        self.i2c.writeto_mem(self.I2C_ADDR, 0x40, self._cmd_buf)
+        self.n_writes += 1
+        self.n_bytes += 2
+
+    def _write_bytes(self, data):
+        """ write out bytes at cursor position in a single transaction """
+        self.i2c.writeto_mem(self.I2C_ADDR, 0x40, data)
+        self.n_writes += 1
+        self.n_bytes += len(data) + 1
 
-    def _write_out(self, arg):
-        """ write out bytearray at cursor position """
-        for b in bytearray(str(arg), 'utf-8'):
-            self.i2c.writeto_mem(self.I2C_ADDR, 0x40, chr(b))
+    def _update_row(self, col, row, data):
+        """ write data from (col, row); send changed runs of cells only """
+        shadow = self._shadow[row]
+        end = min(col + len(data), self._cols)
+        i = col
+        while i < end:
+            if shadow[i] == data[i - col]:
+                i += 1
+                continue
+            # extend run across gaps of up to RUN_GAP unchanged cells
+            start = i
+            i += 1
+            j = i
+            while j < end and j - i <= self.RUN_GAP:
+                if shadow[j] != data[j - col]:
+                    i = j + 1
+                j += 1
+            # send from a preallocated buffer: no new object per run
+            run = self._run_buf[i - start]
+            for k in range(start, i):
+                shadow[k] = run[k - start] = data[k - col]
+            self._set_cursor(start, row)
+            self._write_bytes(run)
+
+    def _fill_shadow(self, char):
+        """ set all shadow cells to char code """
+        for line in self._shadow:
+            for i in range(self._cols):
+                line[i] = char
 
     def _display(self):
         """ set display state (on) """
         self._show_ctrl |= self.DISP_ON
         self._command(self.DISP_CONTROL | self._show_ctrl)
 
-    def _start(self, lines):
-        """ start routine as per Waveshare docs """
+    def _start_steps(self, lines):
+        """ start routine as per Waveshare docs
+            - generator: yields each required delay in ms
+        """
         self._n_lines = lines
         self._curr_line = 0
         self._show_fn |= self.LINES_2 if lines > 1 else self.LINES_1
-        time.sleep_ms(50)
+        yield 50
 
         # Send function set command 3 times (!)
         for _ in range(3):
             self._command(self.FN_SET | self._show_fn)
-            time.sleep_ms(5)  # wait more than 4.1ms
+            yield 5  # wait more than 4.1ms
         # turn the display on, cursor and blinking off
         self._show_ctrl = self.DISP_ON | self.CURS_OFF | self.BLINK_OFF
         self._display()
-        self.clear()
+        self._clear_display()
+        yield 2
         # Initialize to L > R text direction
         self._show_mode = self.ENT_LEFT | self.ENT_SHIFT_DEC
         self._command(self.ENTRY_MODE | self._show_mode)
 
+    def _start(self, lines):
+        """ blocking start """
+        for ms in self._start_steps(lines):
+            time.sleep_ms(ms)
+
+    async def start_async(self):
+        """ coro: probe and start the display without blocking the loop
+            - for LcdApi(..., start=False)
+        """
+        self.lcd_mode = self._probe()
+        if self.lcd_mode:
+            for ms in self._start_steps(self._rows):
+                await asyncio.sleep_ms(ms)
+        self.started = True
+
     # interface functions
 
+    def _clear_display(self):
+        """ send clear command; caller must then wait 2ms """
+        self._command(self.CLR_DISP)
+        self._fill_shadow(0x20)
+
     def clear(self):
         if self.lcd_mode:
-            self._command(self.CLR_DISP)
+            self._clear_display()
             time.sleep_ms(2)
 
+    def reset_counts(self):
+        """ zero the bus usage counters """
+        self.n_writes = 0
+        self.n_bytes = 0
+
+    def invalidate(self):
+        """ force full rewrite of every cell on next write """
+        self._fill_shadow(0xff)
+
     def write_line(self, row, text):
-        """ write text to left-justified display row """
+        """ write text to left-justified display row
+            - text: str, or bytes-like (no allocation)
+        """
         if self.lcd_mode:
-            self._set_cursor(0, row)
-            self._write_out(f'{text:<16}')
-        else:
+            if isinstance(text, str):
+                text = text.encode()
+            buf = self._row_buf[row]
+            n = min(len(text), self._cols)
+            for i in range(n):
+                buf[i] = text[i]
+            for i in range(n, self._cols):
+                buf[i] = 0x20
+            self._update_row(0, row, buf)
+        elif self.verbose:
+            if not isinstance(text, str):
+                text = bytes(text).decode()
             print(f'{text:<16}')
 
     def write_char(self, col, row, char):
-        """ write character to (col, row) """
+        """ write character to (col, row); char: str or character code """
         if self.lcd_mode:
-            self._set_cursor(col, row)
-            self._write_out(char)
-        else:
+            if isinstance(char, int):
+                self._char_buf[0] = char
+                self._update_row(col, row, self._char_buf)
+            else:
+                self._update_row(col, row, str(char).encode())
+        elif self.verbose:
             print(f'({col}, {row}): {char}')
 
 
+class LcdRender:
+    """ non-blocking display service for LcdApi
+        - callers post updates; render() task writes them to the display
+        - only the latest update to each row or cell is drawn; a line
+          replaces chars posted earlier to its row, so chars drawn
+          after the lines are always the newer posts
+        - writes are made no more often than REFRESH_MS
+        - a posted bytearray is drawn as it is at render time: callers
+          may reuse one buffer per row
+        - LcdApi(..., start=False): render() starts the display in the
+          background; ready_ev is set when done
+    """
+
+    REFRESH_MS = const(50)
+
+    def __init__(self, lcd_api):
+        self.lcd_api = lcd_api
+        self.lcd_mode = lcd_api.lcd_mode
+        self.ready_ev = asyncio.Event()  # display started
+        self.ready_ms = None  # ticks_ms() when started
+        self._clear = False
+        self._lines = [None] * lcd_api.dim['rows']
+        self._chars = {}
+        self._pending_ev = asyncio.Event()
+        self._idle_ev = asyncio.Event()
+        self._idle_ev.set()
+
+    def _post(self):
+        """ flag update for render task """
+        self._idle_ev.clear()
+        self._pending_ev.set()
+
+    def clear(self):
+        """ post clear; discards earlier pending writes """
+        self._clear = True
+        for row in range(len(self._lines)):
+            self._lines[row] = None
+        self._chars.clear()
+        self._post()
+
+    def write_line(self, row, text):
+        """ post text for display row; discards earlier char posts to it """
+        self._lines[row] = text
+        if self._chars:
+            for key in [k for k in self._chars if k[1] == row]:
+                del self._chars[key]
+        self._post()
+
+    def write_char(self, col, row, char):
+        """ post character for (col, row) """
+        self._chars[(col, row)] = char
+        self._post()
+
+    async def _render_pending(self):
+        """ write out pending updates """
+        # a clear may be posted while waiting: rows follow the last clear
+        while self._clear:
+            self._clear = False
+            if self.lcd_mode:
+                self.lcd_api._clear_display()
+                await asyncio.sleep_ms(2)
+        for row, text in enumerate(self._lines):
+            if text is not None:
+                self._lines[row] = None
+                self.lcd_api.write_line(row, text)
+        while self._chars:
+            (col, row), char = self._chars.popitem()
+            self.lcd_api.write_char(col, row, char)
+
+    async def render(self):
+        """ coro: render posted updates at bounded rate
+            - starts an unstarted LcdApi first: posts are held meanwhile
+        """
+        if not self.lcd_api.started:
+            await self.lcd_api.start_async()
+        self.lcd_mode = self.lcd_api.lcd_mode
+        self.ready_ms = time.ticks_ms()
+        self.ready_ev.set()
+        while True:
+            await self._pending_ev.wait()
+            self._pending_ev.clear()
+            await self._render_pending()
+            if not self._pending_ev.is_set():
+                self._idle_ev.set()
+            await asyncio.sleep_ms(self.REFRESH_MS)
+
+    async def flush(self):
+        """ coro: wait until all posted updates have been written """
+        await self._idle_ev.wait()
+
+
 def main():
     """ test of LCD """
     pins = {'sda': 0, 'scl': 1}
@@ -131,7 +386,8 @@ def main():
 
     if lcd.lcd_mode:
         lcd.write_line(0, f'LCD Test')
-        lcd.write_line(1, f'sda: {pins['sda']} scl: {pins['scl']}')
+        lcd.write_line(1, f'sda: {pins["sda"]} scl: {pins["scl"]}')
+        print(f'I2C writes: {lcd.n_writes} bytes: {lcd.n_bytes}')
     else:
         print('LCD Display not found')
 
@@ -0,0 +1,210 @@
+# loop_profiler.py
+""" opt-in profiler for asyncio tasks
+    - install() wraps every task created afterwards by asyncio.create_task
+    - per task: wakes, run time and lateness against the asyncio.sleep_ms
+      deadline; each run slice is kept in a fixed-size ring
+    - negative lateness: woken before the deadline, e.g. by cancel()
+    - only asyncio.sleep_ms() calls made through the module attribute
+      after install() set a deadline: asyncio.sleep(), and sleep_ms
+      bound earlier (from asyncio import sleep_ms), report lateness 0
+    - export_trace(): Chrome trace-event JSON, for chrome://tracing or
+      ui.perfetto.dev
+    - profiling adds two ticks_us() reads per slice
+    - slice start times are kept modulo 2**30 us (about 17.9 minutes)
+      and unwrapped on export: a soak run of any length can be profiled
+"""
+
+import asyncio
+from array import array
+from micropython import const
+from time import ticks_us, ticks_diff, ticks_add
+
+_TS_MASK = const(0x3fff_ffff)  # slice start, us: a small int on MicroPython
+
+
+def task_name(coro):
+    """ return name of coroutine function """
+    name = getattr(coro, '__qualname__', None)
+    if name:
+        return name
+    # MicroPython: <generator object 'name' at 20001234>
+    text = repr(coro)
+    start = text.find("'") + 1
+    return text[start:text.find("'", start)] if start else text
+
+
+class _Traced:
+    """ awaitable that runs coro one slice at a time, timing each """
+
+    def __init__(self, profiler, coro, tid):
+        self.profiler = profiler
+        self.coro = coro
+        self.tid = tid
+        self.deadline = None  # ticks_us() wake-up time of a sleep_ms()
+
+    def __await__(self):
+        return self._run()
+
+    __iter__ = __await__
+
+    def _run(self):
+        prof = self.profiler
+        coro = self.coro
+        tid = self.tid
+        value = None
+        exc = None
+        while True:
+            t0 = ticks_us()
+            late = prof._wake(self, t0)
+            prof._current = self
+            try:
+                if exc is None:
+                    yielded = coro.send(value)
+                else:
+                    yielded = coro.throw(exc)
+            except StopIteration as e:
+                prof._record(tid, t0, ticks_us(), late)
+                return e.value
+            except BaseException:
+                prof._record(tid, t0, ticks_us(), late)
+                raise
+            finally:
+                prof._current = None
+            prof._record(tid, t0, ticks_us(), late)
+            try:
+                value = yield yielded
+                exc = None
+            except BaseException as e:
+                value = None
+                exc = e
+
+
+class LoopProfiler:
+    """ record run slices of asyncio tasks in a fixed ring
+        - size: slices kept; older slices are overwritten
+        - totals per task are kept for the whole run, by coroutine
+          name: tasks of one coroutine function, e.g. a task started
+          per cycle, share a row
+        - up to 255 names; tasks of later names are not profiled
+    """
+
+    def __init__(self, size=1_024):
+        self.size = size
+        self._tids = bytearray(size)
+        self._start = array('I', bytes(4 * size))
+        self._dur = array('I', bytes(4 * size))
+        self._late = array('i', bytes(4 * size))
+        self._n = 0  # slices recorded
+        self._t0 = ticks_us()  # last slice start
+        self._ts = 0  # last slice start, us since install(), & _TS_MASK
+        self.names = []
+        self.wakes = []
+        self.run_us = []
+        self.run_max_us = []
+        self.late_max_us = []
+        self._current = None  # _Traced running now
+        self._create_task = None
+        self._sleep_ms = None
+
+    def install(self):
+        """ profile tasks created from now on; wrap asyncio.sleep_ms """
+        self._t0 = ticks_us()
+        self._ts = 0
+        self._create_task = asyncio.create_task
+        self._sleep_ms = asyncio.sleep_ms
+        asyncio.create_task = self.create_task
+        asyncio.sleep_ms = self.sleep_ms
+
+    def uninstall(self):
+        if self._create_task:
+            asyncio.create_task = self._create_task
+            asyncio.sleep_ms = self._sleep_ms
+            self._create_task = None
+
+    def create_task(self, coro):
+        """ asyncio.create_task() for a profiled task """
+        name = task_name(coro)
+        if name in self.names:
+            tid = self.names.index(name)
+        elif len(self.names) < 255:
+            tid = len(self.names)
+            self.names.append(name)
+            self.wakes.append(0)
+            self.run_us.append(0)
+            self.run_max_us.append(0)
+            self.late_max_us.append(0)
+        else:
+            return self._create_task(coro)
+        return self._create_task(self._wrap(coro, tid))
+
+    async def _wrap(self, coro, tid):
+        return await _Traced(self, coro, tid)
+
+    def sleep_ms(self, ms):
+        """ asyncio.sleep_ms() that notes the wake-up deadline """
+        if self._current is not None:
+            self._current.deadline = ticks_add(ticks_us(), ms * 1_000)
+        return self._sleep_ms(ms)
+
+    def _wake(self, traced, t0):
+        """ return lateness of traced task woken at t0; 0 if not sleeping """
+        deadline = traced.deadline
+        if deadline is None:
+            return 0
+        traced.deadline = None
+        late = ticks_diff(t0, deadline)
+        if late > self.late_max_us[traced.tid]:
+            self.late_max_us[traced.tid] = late
+        return late
+
+    def _record(self, tid, t0, t1, late):
+        """ add a run slice of task tid """
+        dur = ticks_diff(t1, t0)
+        self.wakes[tid] += 1
+        self.run_us[tid] += dur
+        if dur > self.run_max_us[tid]:
+            self.run_max_us[tid] = dur
+        i = self._n % self.size
+        self._tids[i] = tid
+        # offset from the last slice: ticks_diff() is valid for short gaps only
+        self._ts = (self._ts + ticks_diff(t0, self._t0)) & _TS_MASK
+        self._t0 = t0
+        self._start[i] = self._ts
+        self._dur[i] = dur
+        self._late[i] = late
+        self._n += 1
+
+    def report(self):
+        """ print totals per task, most run time first """
+        order = sorted(range(len(self.names)), key=lambda k: -self.run_us[k])
+        print('task: wakes run_us run_max_us late_max_us')
+        for k in order:
+            print(f'{self.names[k]}: {self.wakes[k]} {self.run_us[k]}',
+                  f'{self.run_max_us[k]} {self.late_max_us[k]}')
+
+    def export_trace(self, filename):
+        """ write ring contents as Chrome trace-event JSON
+            - ts: us; slices in order, from the first kept slice's start
+              modulo 2**30
+        """
+        n = min(self._n, self.size)
+        first = self._n - n
+        with open(filename, 'w') as f:
+            f.write('{"traceEvents": [\n')
+            for k, name in enumerate(self.names):
+                f.write('%s{"ph": "M", "name": "thread_name", "pid": 0, "tid": %d, '
+                        '"args": {"name": "%s"}}\n' % (',' if k else '', k, name))
+            base = 0
+            prev = 0
+            for j in range(n):
+                i = (first + j) % self.size
+                tid = self._tids[i]
+                start = self._start[i]
+                if start < prev:
+                    base += _TS_MASK + 1  # start time wrapped
+                prev = start
+                f.write(',{"ph": "X", "name": "%s", "pid": 0, "tid": %d, '
+                        '"ts": %d, "dur": %d, "args": {"late_us": %d}}\n'
+                        % (self.names[tid], tid, base + start, self._dur[i],
+                           self._late[i]))
+            f.write(']}\n')
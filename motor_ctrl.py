@@ -7,14 +7,28 @@
 
 import asyncio
 from hb_l298n import L298N
+from dc_recorder import DutyRecorder
 from lcd_1602 import LcdApi
 from config import read_cf, pc_u16
-
+from motor_group import MotorGroup
+from ramp_timer import PROFILES, ramp_table, start_move, stop_move
 
 class MotorCtrl:
-    """ control direction and speed of a 2-channel motor board """
-
-    def __init__(self, board, a_speeds, b_speeds, start_u16=16_383):
+    """ control direction and speed of a 2-channel motor board
+        - ramp tables precomputed per channel, direction and profile
+        - ramp steps: both channels in one motor_group.MotorGroup tick;
+          inter-channel skew in self.group, which steps this
+          controller's tables for the current profile
+        - timer_ramp: ramp steps paced by machine.Timer, not asyncio
+        - regulators: optional speed_ctrl.SpeedReg by channel id;
+          closed-loop control runs between start_a_b and stop_a_b
+        - start_u16: ramp start duty; int, or dict by channel id then
+          direction, e.g. {'A': {'F': 14_000, 'R': 15_500}, 'B': ...}
+        - monitor: optional gc_monitor.GcMonitor ticked per ramp step
+    """
+
+    def __init__(self, board, a_speeds, b_speeds, start_u16=16_383,
+                 profile='linear', n_steps=25, timer_ramp=False, regulators=None):
         self.board = board
         self.a_speeds = a_speeds
         self.b_speeds = b_speeds
@@ -23,8 +37,51 @@ class MotorCtrl:
         self.chan_b = board.channel_b
         self.states = board.STATES
         self.states_set = board.STATES_SET
+        self.profile = profile
+        self.n_steps = n_steps
+        self.ramps = {}
+        self.group = None
+        self.build_ramps()
+        self.group = MotorGroup((self.chan_a, self.chan_b), (a_speeds, b_speeds),
+                                profile=profile, n_steps=n_steps,
+                                timer_ramp=timer_ramp, ramps=self.group_ramps())
+        self.regulators = regulators or {}
+        self.monitor = None
         self.halt_a_b()
 
+    def get_start(self, ch_id, direction):
+        """ return ramp start duty for channel and direction """
+        if isinstance(self.start_u16, int):
+            return self.start_u16
+        return self.start_u16[ch_id][direction]
+
+    def group_ramps(self):
+        """ return the current profile's tables in MotorGroup form """
+        return [{direction: self.ramps[(ch_id, direction, self.profile)]
+                 for direction in speeds}
+                for ch_id, speeds in (('A', self.a_speeds), ('B', self.b_speeds))]
+
+    def build_ramps(self):
+        """ compute ramp tables; call again if speeds are changed """
+        for ch_id, speeds in (('A', self.a_speeds), ('B', self.b_speeds)):
+            for direction in speeds:
+                for profile in PROFILES:
+                    self.ramps[(ch_id, direction, profile)] = ramp_table(
+                        self.get_start(ch_id, direction), speeds[direction],
+                        self.n_steps, profile)
+        if self.group:
+            self.group.ramps = self.group_ramps()
+
+    def set_speed(self, ch_id, direction, dc_u16):
+        """ change target speed and rebuild ramp tables """
+        speeds = self.a_speeds if ch_id == 'A' else self.b_speeds
+        speeds[direction] = dc_u16
+        self.build_ramps()
+
+    def get_ramp(self, ch_id, direction):
+        """ return ramp table for the current profile """
+        return self.ramps[(ch_id, direction, self.profile)]
+
     def set_state(self, state, channel):
         """ set channel h-pins  """
         if channel == 'A':
@@ -32,22 +89,18 @@ class MotorCtrl:
         elif channel == 'B':
             self.board.channel_b.set_state(state)
 
-    async def change_speed(self, channel, current_u16, target_u16, t_ms, n_steps):
-        """ accelerate channel from current to target duty cycle """
-        step = (target_u16 - current_u16) // n_steps
-        step_ms = t_ms // n_steps
-        for dc_u16 in range(self.start_u16, target_u16, step):
-            channel.set_dc_u16(dc_u16)
-            await asyncio.sleep_ms(step_ms)
-        channel.set_dc_u16(target_u16)
+    async def run_moves(self, moves, period_ms):
+        """ coro: run moves together in MotorGroup ticks """
+        self.group.monitor = self.monitor
+        await self.group.run_moves(moves, period_ms)
 
-    async def start(self, channel, target_u16, period_ms, n_steps=25):
-        """ accelerate channel from 0 to target duty cycle """
-        await self.change_speed(channel, self.start_u16, target_u16, period_ms, n_steps)
+    async def start(self, channel, ramp, period_ms):
+        """ accelerate channel from current duty cycle to end of ramp """
+        await self.run_moves((start_move(channel, ramp),), period_ms)
 
-    async def stop(self, channel, current_u16, period_ms, n_steps=25):
+    async def stop(self, channel, ramp, period_ms):
         """ decelerate channel from current duty cycle to 0 """
-        await self.change_speed(channel, current_u16, 0, period_ms, n_steps)
+        await self.run_moves((stop_move(channel, ramp),), period_ms)
 
     def set_state_a_b(self, state):
         """ set both channel h-pins  """
@@ -57,21 +110,27 @@ class MotorCtrl:
 
     def halt_a_b(self):
         """ stop both motors """
+        for reg in self.regulators.values():
+            reg.stop()
         self.board.channel_a.stop()
         self.board.channel_b.stop()
 
     async def start_a_b(self, direction, period_ms=1_000):
         """ accelerate both motors """
         self.set_state_a_b(direction)
-        await asyncio.gather(self.start(self.chan_a, self.a_speeds[direction], period_ms),
-                             self.start(self.chan_b, self.b_speeds[direction], period_ms)
-                             )
+        await self.run_moves((start_move(self.chan_a, self.get_ramp('A', direction)),
+                              start_move(self.chan_b, self.get_ramp('B', direction))
+                              ), period_ms)
+        for reg in self.regulators.values():
+            reg.start(reg.targets[direction])
 
     async def stop_a_b(self, direction, period_ms=1_000):
-        """ accelerate both motors """
-        await asyncio.gather(self.stop(self.chan_a, self.a_speeds[direction], period_ms),
-                             self.stop(self.chan_b, self.b_speeds[direction], period_ms)
-                             )
+        """ decelerate both motors """
+        for reg in self.regulators.values():
+            reg.stop()
+        await self.run_moves((stop_move(self.chan_a, self.get_ramp('A', direction)),
+                              stop_move(self.chan_b, self.get_ramp('B', direction))
+                              ), period_ms)
 
 
 async def main():
@@ -98,7 +157,11 @@ async def main():
                 }
     
     long_pause = 5  # s
-    controller = MotorCtrl(board, a_speeds, b_speeds)
+    controller = MotorCtrl(board, a_speeds, b_speeds,
+                           profile=motor_p.get('profile', 'linear'),
+                           timer_ramp=motor_p.get('timer_ramp', False))
+    recorder = DutyRecorder()
+    recorder.attach(board.channel_a, board.channel_b)
     for _ in range(1):
         lcd.write_line(0, f'Forward')
         await controller.start_a_b('F')
@@ -115,6 +178,9 @@ async def main():
 
     controller.halt_a_b()
     print('Controller logic turned off')
+    step_ms = 1_000 // controller.n_steps
+    for ch_id in (0, 1):
+        print(f'Channel {ch_id} step timing: {recorder.timing_stats(ch_id, step_ms)}')
     await asyncio.sleep_ms(500)
     lcd.clear()
     await asyncio.sleep_ms(500)
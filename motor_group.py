@@ -0,0 +1,116 @@
+# motor_group.py
+""" run any number of motor channels as one synchronised group
+    - channels may be spread over several L298N boards
+    - every channel is stepped in the same tick from a single task,
+      or from a single timer callback
+    - inter-channel skew measured per tick on either path
+    - MotorCtrl steps its two channels through a MotorGroup
+"""
+
+from time import ticks_us, ticks_diff
+from ramp_timer import (TimerRamp, advance_moves, walk_moves, ramp_table,
+                        start_move, stop_move)
+
+
+class MotorGroup:
+    """ control direction and speed of a group of L298nChannel objects
+        - speeds: one {'F': u16, 'R': u16} dict per channel
+        - start_u16: int, or one {'F': u16, 'R': u16} dict per channel
+        - ramps: optional tables, one {'F': table, 'R': table} dict per
+          channel, e.g. MotorCtrl's: used as given, none built here
+        - skew: time in us from first to last channel update in a tick
+        - advance(): advance_moves() with skew recorded; for any step loop
+        - monitor: optional gc_monitor.GcMonitor, ticked each step
+    """
+
+    def __init__(self, channels, speeds, start_u16=16_383, profile='linear',
+                 n_steps=25, timer_ramp=False, ramps=None):
+        self.channels = tuple(channels)
+        self.speeds = list(speeds)
+        self.start_u16 = start_u16
+        self.profile = profile
+        self.n_steps = n_steps
+        self.ramps = ramps
+        if ramps is None:
+            self.build_ramps()
+        self.monitor = None
+        self._advance = self.advance  # bound once: no allocation per tick
+        self.ramp_engine = TimerRamp() if timer_ramp else None
+        if self.ramp_engine:
+            self.ramp_engine.advance = self._advance
+        self.n_ticks = 0
+        self.skew_sum_us = 0
+        self.skew_max_us = 0
+        self.halt()
+
+    @classmethod
+    def from_boards(cls, boards, speeds, **kwargs):
+        """ return group of channels A and B of each L298N board """
+        channels = []
+        for board in boards:
+            channels.append(board.channel_a)
+            channels.append(board.channel_b)
+        return cls(channels, speeds, **kwargs)
+
+    def build_ramps(self):
+        """ compute ramp tables for the current profile """
+        self.ramps = []
+        for k, speeds in enumerate(self.speeds):
+            ramps = {}
+            for direction in speeds:
+                if isinstance(self.start_u16, int):
+                    start = self.start_u16
+                else:
+                    start = self.start_u16[k][direction]
+                ramps[direction] = ramp_table(start, speeds[direction],
+                                              self.n_steps, self.profile)
+            self.ramps.append(ramps)
+
+    def set_state(self, state):
+        """ set h-pins of all channels """
+        for channel in self.channels:
+            channel.set_state(state)
+
+    def halt(self):
+        """ stop all motors at once """
+        for channel in self.channels:
+            channel.stop()
+
+    def clear_skew(self):
+        self.n_ticks = 0
+        self.skew_sum_us = 0
+        self.skew_max_us = 0
+
+    def mean_skew_us(self):
+        return self.skew_sum_us // self.n_ticks if self.n_ticks else 0
+
+    def advance(self, moves, index):
+        """ advance_moves() in one tick; record skew """
+        t0 = ticks_us()
+        active = advance_moves(moves, index)
+        skew = ticks_diff(ticks_us(), t0)
+        self.n_ticks += 1
+        self.skew_sum_us += skew
+        if skew > self.skew_max_us:
+            self.skew_max_us = skew
+        return active
+
+    async def run_moves(self, moves, period_ms):
+        """ coro: run moves together; by timer if ramp_engine is set """
+        step_ms = period_ms // self.n_steps
+        if self.ramp_engine:
+            self.ramp_engine.monitor = self.monitor
+            await self.ramp_engine.run(moves, step_ms)
+        else:
+            await walk_moves(moves, step_ms, self.monitor, self._advance)
+
+    async def start(self, direction, period_ms=1_000):
+        """ coro: accelerate all motors """
+        self.set_state(direction)
+        await self.run_moves([start_move(ch, self.ramps[k][direction])
+                              for k, ch in enumerate(self.channels)], period_ms)
+
+    async def stop(self, direction, period_ms=1_000):
+        """ coro: decelerate all motors """
+        await self.run_moves([stop_move(ch, self.ramps[k][direction])
+                              for k, ch in enumerate(self.channels)], period_ms)
@@ -0,0 +1,144 @@
+# ramp_timer.py
+""" step motor channels through ramp tables under hardware-timer control
+    - ramp tables and moves, shared by MotorCtrl and MotorGroup
+    - timer callback sets duty cycles at a fixed rate
+    - ramp timing does not depend on asyncio scheduling
+    - completion is awaited through a ThreadSafeFlag
+"""
+
+import asyncio
+from array import array
+from math import exp
+from machine import Timer
+from micropython import const
+
+PROFILES = ('linear', 's_curve', 'exp')
+EXP_K = const(3)  # exponential profile curvature
+
+
+def ramp_table(start_u16, target_u16, n_steps, profile='linear'):
+    """ return n_steps + 1 duty cycles from start to target inclusive
+        - floating point used here only: tables are built once
+    """
+    if profile not in PROFILES:
+        raise ValueError(f'Unknown ramp profile: {profile}')
+    start_u16 = min(start_u16, target_u16)
+    span = target_u16 - start_u16
+    table = array('H', bytearray(2 * (n_steps + 1)))
+    for i in range(n_steps + 1):
+        x = i / n_steps
+        if profile == 's_curve':
+            y = x * x * (3 - 2 * x)
+        elif profile == 'exp':
+            y = (exp(EXP_K * x) - 1) / (exp(EXP_K) - 1)
+        else:
+            y = x
+        table[i] = start_u16 + int(span * y + 0.5)
+    return table
+
+
+def ramp_index(ramp, dc_u16):
+    """ return index of first ramp entry at or above dc_u16 """
+    i = 0
+    n = len(ramp)
+    while i < n and ramp[i] < dc_u16:
+        i += 1
+    return i
+
+
+def start_move(channel, ramp):
+    """ return move to accelerate channel from current duty cycle
+        - move: (channel, ramp, index, end, step, final)
+    """
+    last = len(ramp) - 1
+    i = min(ramp_index(ramp, channel.dc_u16 + 1), last)
+    return channel, ramp, i, last, 1, ramp[last]
+
+
+def stop_move(channel, ramp):
+    """ return move to decelerate channel from current duty cycle to 0 """
+    return channel, ramp, ramp_index(ramp, channel.dc_u16) - 1, -1, -1, 0
+
+
+def advance_moves(moves, index):
+    """ set the next duty cycle of each move; return number still active
+        - a move is (channel, ramp, index, end, step, final):
+          set ramp[index] ... up to (not including) ramp[end], then final
+        - index: current index of each move; None when complete
+    """
+    active = 0
+    for k, move in enumerate(moves):
+        i = index[k]
+        if i is None:
+            continue
+        if i != move[3]:
+            move[0].set_dc_u16(move[1][i])
+            index[k] = i + move[4]
+            active += 1
+        else:
+            move[0].set_dc_u16(move[5])
+            index[k] = None
+    return active
+
+
+async def walk_moves(moves, step_ms, monitor=None, advance=advance_moves):
+    """ coro: step all moves together from a single task
+        - monitor: optional gc_monitor.GcMonitor, ticked each step
+        - advance: step function with the advance_moves() signature
+    """
+    index = [m[2] for m in moves]
+    if monitor:
+        monitor.start()
+    while advance(moves, index):
+        await asyncio.sleep_ms(step_ms)
+        if monitor:
+            monitor.tick()
+
+
+class TimerRamp:
+    """ timer-driven ramp engine
+        - all moves are advanced in the same callback
+        - monitor: optional gc_monitor.GcMonitor, ticked each step
+        - advance: step function with the advance_moves() signature
+    """
+
+    def __init__(self):
+        self.monitor = None
+        self.advance = advance_moves
+        self._timer = Timer()
+        self._done = asyncio.ThreadSafeFlag()
+        self._moves = []
+        self._index = []
+        self._active = 0
+
+    def _tick(self, _):
+        """ timer callback: advance each active move by one step """
+        self._active = self.advance(self._moves, self._index)
+        if self.monitor:
+            self.monitor.tick()
+        if not self._active:
+            self._timer.deinit()
+            self._done.set()
+
+    async def run(self, moves, step_ms):
+        """ coro: run moves to completion at step_ms intervals """
+        self._moves = list(moves)
+        self._index = [m[2] for m in self._moves]
+        if not self._moves:
+            return
+        self._done.clear()
+        if self.monitor:
+            self.monitor.start()
+        self._tick(None)  # first step immediately
+        if self._active:
+            self._timer.init(mode=Timer.PERIODIC, period=step_ms,
+                             callback=self._tick, hard=False)
+        try:
+            await self._done.wait()
+        finally:
+            self.cancel()
+
+    def cancel(self):
+        """ stop the timer; channels hold their current duty cycle """
+        self._timer.deinit()
+        self._active = 0
@@ -0,0 +1,170 @@
+# run_log.py
+""" append-only binary log of incline operation
+    - fixed-size RECORD_FORMAT records: no parsing state needed
+    - records are packed into a RAM block; log() never touches flash
+    - run() task writes each full BLOCK_SIZE block with one write
+    - flush() is for kill, e-stop, shutdown and exceptions only: it
+      writes the unwritten part of the block, which stays in RAM; the
+      rest of that block follows when it fills, so block boundaries in
+      the file do not move
+    - two files in rotation: when the active file holds MAX_BLOCKS
+      blocks, the other file is truncated and becomes active
+    - each file starts with a header block: an EV_OPEN record, value:
+      generation, so a decoder can put the files in order; zero padding
+      to BLOCK_SIZE keeps every later block on a flash block boundary
+"""
+
+import asyncio
+import struct
+from micropython import const
+from time import ticks_ms
+
+# tick_ms, event, direction, a_u16, b_u16, cycle, value
+RECORD_FORMAT = '<IBBHHHI'
+RECORD_SIZE = const(16)
+BLOCK_SIZE = const(4_096)  # flash erase block
+MAX_BLOCKS = const(16)  # per file
+FILES = ('run_0.bin', 'run_1.bin')
+
+# events; value meaning in brackets
+EV_OPEN = const(1)  # file generation
+EV_BOOT = const(2)  # machine.reset_cause()
+EV_START = const(3)  # sequence index
+EV_RAMP = const(4)  # ramp time ms
+EV_END = const(5)  # cycle time ms
+EV_ABORT = const(6)  # cycle time ms
+EV_STOP = const(7)  # kill click
+EV_ESTOP = const(8)  # trip latency us
+EV_KILL = const(9)  # kill hold: end of run
+EV_ANOMALY = const(10)  # anomaly code
+EV_DROPPED = const(11)  # records lost: both buffers full
+EV_RAMP_DOWN = const(12)  # ramp time ms
+
+EVENTS = {EV_OPEN: 'open', EV_BOOT: 'boot', EV_START: 'start', EV_RAMP: 'ramp',
+          EV_END: 'end', EV_ABORT: 'abort', EV_STOP: 'stop', EV_ESTOP: 'estop',
+          EV_KILL: 'kill', EV_ANOMALY: 'anomaly', EV_DROPPED: 'dropped',
+          EV_RAMP_DOWN: 'ramp_down'}
+
+# anomaly codes
+AN_RAMP_LATE = const(1)  # ramp or ramp-down took over 1.5 x its period
+AN_WDT_RESET = const(2)  # boot after watchdog reset
+
+
+def _first_record(filename):
+    """ return first record of filename, or None """
+    try:
+        with open(filename, 'rb') as f:
+            data = f.read(RECORD_SIZE)
+    except OSError:
+        return None
+    if len(data) < RECORD_SIZE:
+        return None
+    return struct.unpack(RECORD_FORMAT, data)
+
+
+def _size(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return f.seek(0, 2)
+    except OSError:
+        return 0
+
+
+class RunLog:
+    """ double-buffered block writer for run records
+        - log(): pack a record into the RAM block
+        - a full block is handed to run(); logging continues in the
+          other block; if both are full the record is counted as lost
+        - flush(): write a partial block, e.g. after an e-stop or at
+          shutdown; blocks the caller
+    """
+
+    def __init__(self, files=FILES, max_blocks=MAX_BLOCKS):
+        self.files = files
+        self.max_bytes = max_blocks * BLOCK_SIZE
+        self._bufs = (bytearray(BLOCK_SIZE), bytearray(BLOCK_SIZE))
+        self._fill = 0  # buffer being filled
+        self._n = 0  # bytes in the fill buffer
+        self._flushed = 0  # bytes of the fill buffer written by flush()
+        self._full = None  # buffer waiting to be written
+        self._full_from = 0  # its first unwritten byte
+        self._full_ev = asyncio.Event()
+        self.dropped = 0
+        self.n_blocks = 0  # blocks written
+        self.cycle = 0
+        # continue the newer file
+        gens = []
+        for filename in files:
+            rec = _first_record(filename)
+            gens.append(rec[6] if rec and rec[1] == EV_OPEN else -1)
+        self._active = 0 if gens[0] >= gens[1] else 1
+        self.generation = gens[self._active]
+        # bytes after the header block
+        self._size = max(0, _size(files[self._active]) - BLOCK_SIZE)
+        if self.generation < 0:
+            self._start_file(0, 0)
+
+    def _start_file(self, k, generation):
+        """ truncate file k and write its header block; make it active """
+        header = bytearray(BLOCK_SIZE)
+        struct.pack_into(RECORD_FORMAT, header, 0, ticks_ms(), EV_OPEN,
+                         0, 0, 0, self.cycle, generation)
+        with open(self.files[k], 'wb') as f:
+            f.write(header)
+        self._active = k
+        self.generation = generation
+        self._size = 0
+
+    def log(self, event, direction='', a_u16=0, b_u16=0, value=0):
+        """ add record to the RAM block; no file access """
+        if self._n == BLOCK_SIZE:
+            if self._full is not None:
+                self.dropped += 1
+                return
+            self._full = self._fill
+            self._full_from = self._flushed
+            self._fill ^= 1
+            self._n = 0
+            self._flushed = 0
+            self._full_ev.set()
+            if self.dropped:
+                dropped = self.dropped
+                self.dropped = 0
+                self.log(EV_DROPPED, value=dropped)
+        struct.pack_into(RECORD_FORMAT, self._bufs[self._fill], self._n,
+                         ticks_ms(), event, ord(direction) if direction else 0,
+                         a_u16, b_u16, self.cycle, value)
+        self._n += RECORD_SIZE
+
+    def _write(self, data):
+        """ append data to the active file; rotate when it is full """
+        if self._size + len(data) > self.max_bytes:
+            self._start_file(self._active ^ 1, self.generation + 1)
+        with open(self.files[self._active], 'ab') as f:
+            f.write(data)
+        self._size += len(data)
+        self.n_blocks += 1
+
+    async def run(self):
+        """ coro: write full blocks as they are handed over """
+        while True:
+            await self._full_ev.wait()
+            self._full_ev.clear()
+            if self._full is not None:
+                self._write_full()
+
+    def _write_full(self):
+        """ write the handed-over block, less any part already flushed """
+        buf = self._bufs[self._full]
+        if self._full_from:
+            buf = memoryview(buf)[self._full_from:]
+        self._write(buf)
+        self._full = None
+
+    def flush(self):
+        """ write pending records now; blocks the caller """
+        if self._full is not None:
+            self._write_full()
+        if self._n > self._flushed:
+            self._write(memoryview(self._bufs[self._fill])[self._flushed:self._n])
+            self._flushed = self._n
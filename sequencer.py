@@ -0,0 +1,257 @@
+# sequencer.py
+""" run motor sequences from step tables
+    - a sequence is a list of steps; a step is [op, args...]
+      ["ramp", direction, period_ms]: accelerate both motors
+      ["hold", ms]: run at speed
+      ["stop", period_ms]: decelerate both motors to 0
+      ["wait", s]: countdown on LCD row 1
+      ["display", row, text]: text may use {a_F} {a_R} {b_F} {b_R},
+      with an optional width: {a_F:05d} (default 5)
+    - each run() starts the next sequence in the table, in turn
+    - a running sequence is a task: stop() cancels it at once and
+      ramps down from the current duty cycle
+    - is_busy(): a sequence runs or stop() is ramping down; abort()
+      ends both
+    - sequences are read from seq_p.json if present
+    - display text is compiled to a byte buffer once: running a
+      sequence does not allocate
+    - optional run_log: cycle start/end, ramp and ramp-down times and
+      late ramps; records go to flash in whole blocks through the
+      RunLog.run() task: the sequence never waits on a flash write
+    - watch(): a running sequence beats an estop.Liveness slot at each
+      step and at least every BEAT_MS of a hold or wait
+"""
+
+import asyncio
+from micropython import const
+from time import ticks_ms, ticks_diff
+from config import read_cf
+from lcd_1602 import put_uint
+from run_log import (EV_START, EV_RAMP, EV_RAMP_DOWN, EV_END, EV_ABORT, EV_ANOMALY,
+                     AN_RAMP_LATE)
+
+OPS = ('ramp', 'hold', 'stop', 'wait', 'display')
+FIELDS = ('a_F', 'a_R', 'b_F', 'b_R')
+STOP_MS = 1_000  # ramp-down period after stop()
+BEAT_MS = const(1_000)  # longest sleep between liveness beats
+
+
+def compile_text(text):
+    """ return (buf, fields) for display text
+        - fields: (pos, channel, direction, width, fill) per {field}
+    """
+    buf = bytearray()
+    fields = []
+    i = 0
+    while i < len(text):
+        if text[i] != '{':
+            buf.extend(text[i].encode())
+            i += 1
+            continue
+        end = text.index('}', i)
+        parts = text[i + 1:end].split(':')
+        key = parts[0]
+        spec = parts[1] if len(parts) > 1 else ''
+        if key not in FIELDS:
+            raise ValueError(f'Unknown display field: {key}')
+        spec = spec.rstrip('d')
+        fill = 0x30 if spec.startswith('0') else 0x20
+        width = int(spec) if spec else 5
+        fields.append((len(buf), key[0], key[2], width, fill))
+        buf.extend(b' ' * width)
+        i = end + 1
+    return buf, fields
+
+
+def default_sequences(hold_ms, block_s):
+    """ return the standard table: forward run, then reverse run """
+    sequences = []
+    for direction, name in (('F', 'Fwd'), ('R', 'Rev')):
+        speeds = f'A:{{a_{direction}:05d}} B:{{b_{direction}:05d}} '
+        sequences.append([
+            ['display', 0, f'{name} accel '],
+            ['display', 1, speeds],
+            ['ramp', direction, 1_000],
+            ['display', 0, f'{name} hold  '],
+            ['hold', hold_ms],
+            ['display', 0, f'{name} stop  '],
+            ['display', 1, 'A:00000 B:00000 '],
+            ['stop', 1_000],
+            ['wait', block_s],
+            ['display', 0, 'Waiting...'],
+            ['display', 1, '']
+        ])
+    return sequences
+
+
+def read_sequences(hold_ms, block_s, filename='seq_p.json'):
+    """ return sequences from filename, or the default table """
+    data = read_cf(filename)
+    if data:
+        sequences = data['sequences']
+        for seq in sequences:
+            for step in seq:
+                if step[0] not in OPS:
+                    raise ValueError(f'Unknown sequence step: {step[0]}')
+        return sequences
+    return default_sequences(hold_ms, block_s)
+
+
+class Sequencer:
+    """ run step tables on a MotorCtrl, one sequence at a time """
+
+    def __init__(self, controller, lcd, sequences):
+        self.controller = controller
+        self.lcd = lcd
+        self.sequences = sequences
+        self.index = 0  # next sequence
+        self._task = None
+        self._stopping = None  # task running stop()
+        self._count_buf = bytearray(2)
+        self.run_log = None  # run_log.RunLog
+        self._liveness = None
+        self._slot = 0
+        # display steps with text compiled
+        self._steps = [[['display', step[1], compile_text(step[2])]
+                        if step[0] == 'display' else step for step in seq]
+                       for seq in sequences]
+
+    def is_running(self):
+        return self._task is not None
+
+    def is_busy(self):
+        """ return True while a sequence runs or stop() ramps down """
+        return self._task is not None or self._stopping is not None
+
+    def watch(self, liveness):
+        """ report progress to estop.Liveness while a sequence runs """
+        self._liveness = liveness
+        self._slot = liveness.add()
+
+    def _beat(self):
+        if self._liveness:
+            self._liveness.beat(self._slot)
+
+    def _log_ramp(self, event, direction, period_ms, t0):
+        """ log ramp time since t0; flag a late ramp """
+        log = self.run_log
+        if log:
+            ctrl = self.controller
+            dt = ticks_diff(ticks_ms(), t0)
+            log.log(event, direction, ctrl.chan_a.dc_u16, ctrl.chan_b.dc_u16, dt)
+            if dt > period_ms * 3 // 2:
+                log.log(EV_ANOMALY, direction, value=AN_RAMP_LATE)
+
+    def _display(self, row, text):
+        """ fill in current field values and post text """
+        buf, fields = text
+        ctrl = self.controller
+        for pos, ch, direction, width, fill in fields:
+            speeds = ctrl.a_speeds if ch == 'a' else ctrl.b_speeds
+            put_uint(buf, pos, speeds[direction], width, fill)
+        self.lcd.write_line(row, buf)
+
+    async def _step(self, step):
+        """ coro: run a single step """
+        ctrl = self.controller
+        op = step[0]
+        if op == 'ramp':
+            t0 = ticks_ms()
+            await ctrl.start_a_b(step[1], step[2])
+            self._log_ramp(EV_RAMP, step[1], step[2], t0)
+        elif op == 'hold':
+            period_ms = step[1]
+            while period_ms > 0:
+                ms = min(period_ms, BEAT_MS)
+                await asyncio.sleep_ms(ms)
+                self._beat()
+                period_ms -= ms
+        elif op == 'stop':
+            await self.ramp_down(step[1])
+        elif op == 'wait':
+            # motors stopped: a safe point for garbage collection
+            if ctrl.monitor:
+                ctrl.monitor.collect()
+            period_s = int(step[1])
+            while period_s:
+                put_uint(self._count_buf, 0, period_s, 2, 0x20)
+                self.lcd.write_line(1, self._count_buf)
+                await asyncio.sleep_ms(1_000)
+                self._beat()
+                period_s -= 1
+        elif op == 'display':
+            self._display(step[1], step[2])
+
+    async def _run(self, index):
+        """ coro: run steps of sequence index in order """
+        log = self.run_log
+        t0 = ticks_ms()
+        if log:
+            log.cycle += 1
+            log.log(EV_START, value=index)
+        try:
+            for step in self._steps[index]:
+                self._beat()
+                await self._step(step)
+            if log:
+                log.log(EV_END, value=ticks_diff(ticks_ms(), t0))
+        except asyncio.CancelledError:
+            if log:
+                log.log(EV_ABORT, value=ticks_diff(ticks_ms(), t0))
+            raise
+        finally:
+            self._task = None
+            if self._liveness:
+                self._liveness.idle(self._slot)
+
+    def run(self):
+        """ start the next sequence; return False if one is running """
+        if self._task:
+            return False
+        index = self.index
+        self.index = (index + 1) % len(self.sequences)
+        self.lcd.clear()
+        self._task = asyncio.create_task(self._run(index))
+        return True
+
+    async def ramp_down(self, period_ms=STOP_MS):
+        """ coro: decelerate both motors from their current duty cycle """
+        ctrl = self.controller
+        direction = ctrl.chan_a.state
+        if direction not in ('F', 'R'):
+            direction = ctrl.chan_b.state
+        if direction in ('F', 'R'):
+            t0 = ticks_ms()
+            await ctrl.stop_a_b(direction, period_ms)
+            self._log_ramp(EV_RAMP_DOWN, direction, period_ms, t0)
+        else:
+            ctrl.halt_a_b()
+
+    def abort(self):
+        """ cancel the running sequence and any ramp-down at their next
+            await; no wait
+        """
+        if self._task:
+            self._task.cancel()
+        if self._stopping:
+            self._stopping.cancel()
+
+    async def cancel(self):
+        """ coro: cancel the running sequence; motors hold their duty """
+        task = self._task
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def stop(self, period_ms=STOP_MS):
+        """ coro: abort the running sequence and ramp down cleanly """
+        self._stopping = asyncio.current_task()
+        try:
+            await self.cancel()
+            await self.ramp_down(period_ms)
+        finally:
+            self._stopping = None
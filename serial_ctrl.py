@@ -0,0 +1,203 @@
+# serial_ctrl.py
+""" binary command and telemetry protocol over USB serial (stdin/stdout)
+    - frame: SYNC, LEN, CMD, payload (LEN bytes), CHK
+    - CHK: XOR of CMD and payload bytes
+    - each command is answered with CMD | REPLY: status or data
+    - motor commands start tasks: the reader never waits for a ramp
+    - motion and speed commands are refused with ST_BUSY while a
+      sequence runs or ramps down
+    - RUN is refused with ST_BUSY unless both motors are stopped or
+      already running in its direction: the H-bridge is never reversed
+      at speed
+    - the console also carries print() output: the reader resyncs on
+      SYNC and discards frames that fail CHK, so text between frames
+      is skipped (ASCII text never contains SYNC)
+    - stdio_streams() turns off Ctrl-C: 0x03 is a valid frame byte
+"""
+
+import asyncio
+import struct
+import sys
+from micropython import const, kbd_intr
+from time import ticks_ms
+
+SYNC = const(0xa5)
+REPLY = const(0x80)
+
+CMD_RUN = const(0x01)  # payload: direction 'F' or 'R'
+CMD_STOP = const(0x02)  # payload: direction
+CMD_HALT = const(0x03)
+CMD_SET_SPEED = const(0x04)  # payload: channel 'A'/'B', direction, u16
+CMD_GET_STATE = const(0x05)
+CMD_TELEMETRY = const(0x06)  # payload: u16 period ms; 0: off
+TELEMETRY = const(0x10)  # unsolicited frame
+
+ST_OK = const(0)
+ST_BAD_CMD = const(1)
+ST_BAD_ARG = const(2)
+ST_BUSY = const(3)  # motors driven by a sequence, or running the other way
+
+# state A, state B, dc A, dc B, speeds A F, A R, B F, B R
+STATE_FORMAT = '<BB6H'
+# tick_ms, state A, state B, dc A, dc B
+TELEMETRY_FORMAT = '<IBBHH'
+
+
+def checksum(data):
+    chk = 0
+    for b in data:
+        chk ^= b
+    return chk
+
+
+def encode_frame(cmd, payload=b''):
+    """ return frame bytes for cmd and payload """
+    frame = bytearray(len(payload) + 4)
+    frame[0] = SYNC
+    frame[1] = len(payload)
+    frame[2] = cmd
+    frame[3:-1] = payload
+    frame[-1] = checksum(frame[2:-1])
+    return frame
+
+
+async def read_frame(reader):
+    """ coro: return (cmd, payload) of next valid frame """
+    while True:
+        b = await reader.readexactly(1)
+        if b[0] != SYNC:
+            continue
+        n = (await reader.readexactly(1))[0]
+        body = await reader.readexactly(n + 2)
+        if checksum(body[:-1]) == body[-1]:
+            return body[0], body[1:-1]
+
+
+def stdio_streams():
+    """ return (reader, writer) on the USB serial console
+        - Ctrl-C (0x03) is passed through as data, not KeyboardInterrupt;
+          call stdio_release() when done
+    """
+    kbd_intr(-1)
+    return asyncio.StreamReader(sys.stdin.buffer), asyncio.StreamWriter(sys.stdout.buffer, {})
+
+
+def stdio_release():
+    """ restore Ctrl-C on the console """
+    kbd_intr(3)
+
+
+class SerialCtrl:
+    """ serve protocol commands for a MotorCtrl
+        - sequencer: optional Sequencer sharing the controller; HALT
+          also aborts its sequence
+    """
+
+    def __init__(self, controller, reader, writer, sequencer=None):
+        self.controller = controller
+        self.reader = reader
+        self.writer = writer
+        self.sequencer = sequencer
+        self.telemetry_ms = 0
+        self._motion = None
+        self._telemetry_task = None
+
+    async def send(self, cmd, payload=b''):
+        self.writer.write(encode_frame(cmd, payload))
+        await self.writer.drain()
+
+    def _start_motion(self, coro):
+        """ run motor coroutine as a task; a new command replaces it """
+        if self._motion:
+            self._motion.cancel()
+        self._motion = asyncio.create_task(coro)
+
+    def is_moving(self):
+        """ return True while serial commands drive the motors
+            - a motion command in progress, or motors left running by
+              RUN with no sequence running
+        """
+        if self._motion is not None and not self._motion.done():
+            return True
+        if self.sequencer and self.sequencer.is_busy():
+            return False
+        ctrl = self.controller
+        return ctrl.chan_a.dc_u16 != 0 or ctrl.chan_b.dc_u16 != 0
+
+    def can_run(self, direction):
+        """ return True if both motors are stopped or running in direction """
+        for channel in (self.controller.chan_a, self.controller.chan_b):
+            if channel.dc_u16 and channel.state != direction:
+                return False
+        return True
+
+    def state_payload(self):
+        ctrl = self.controller
+        return struct.pack(STATE_FORMAT, ord(ctrl.chan_a.state), ord(ctrl.chan_b.state),
+                           ctrl.chan_a.dc_u16, ctrl.chan_b.dc_u16,
+                           ctrl.a_speeds['F'], ctrl.a_speeds['R'],
+                           ctrl.b_speeds['F'], ctrl.b_speeds['R'])
+
+    def dispatch(self, cmd, payload):
+        """ act on command; return (status, reply payload) """
+        ctrl = self.controller
+        if cmd in (CMD_RUN, CMD_STOP):
+            if len(payload) != 1 or chr(payload[0]) not in ('F', 'R'):
+                return ST_BAD_ARG, b''
+            direction = chr(payload[0])
+            if self.sequencer and self.sequencer.is_busy():
+                return ST_BUSY, b''
+            if cmd == CMD_RUN:
+                if not self.can_run(direction):
+                    return ST_BUSY, b''
+                self._start_motion(ctrl.start_a_b(direction))
+            else:
+                self._start_motion(ctrl.stop_a_b(direction))
+        elif cmd == CMD_HALT:
+            if self._motion:
+                self._motion.cancel()
+            if self.sequencer:
+                self.sequencer.abort()
+            ctrl.halt_a_b()
+        elif cmd == CMD_SET_SPEED:
+            if len(payload) != 4:
+                return ST_BAD_ARG, b''
+            if self.sequencer and self.sequencer.is_busy():
+                return ST_BUSY, b''
+            ch_id, direction = chr(payload[0]), chr(payload[1])
+            if ch_id not in ('A', 'B') or direction not in ('F', 'R'):
+                return ST_BAD_ARG, b''
+            ctrl.set_speed(ch_id, direction, struct.unpack_from('<H', payload, 2)[0])
+        elif cmd == CMD_GET_STATE:
+            return ST_OK, self.state_payload()
+        elif cmd == CMD_TELEMETRY:
+            if len(payload) != 2:
+                return ST_BAD_ARG, b''
+            self.set_telemetry(struct.unpack('<H', payload)[0])
+        else:
+            return ST_BAD_CMD, b''
+        return ST_OK, b''
+
+    def set_telemetry(self, period_ms):
+        self.telemetry_ms = period_ms
+        if period_ms and not self._telemetry_task:
+            self._telemetry_task = asyncio.create_task(self.stream_telemetry())
+
+    async def stream_telemetry(self):
+        """ coro: send telemetry frames every telemetry_ms """
+        ctrl = self.controller
+        buf = bytearray(struct.calcsize(TELEMETRY_FORMAT))
+        while self.telemetry_ms:
+            struct.pack_into(TELEMETRY_FORMAT, buf, 0, ticks_ms(),
+                             ord(ctrl.chan_a.state), ord(ctrl.chan_b.state),
+                             ctrl.chan_a.dc_u16, ctrl.chan_b.dc_u16)
+            await self.send(TELEMETRY, buf)
+            await asyncio.sleep_ms(self.telemetry_ms)
+        self._telemetry_task = None
+
+    async def run(self):
+        """ coro: serve commands """
+        while True:
+            cmd, payload = await read_frame(self.reader)
+            status, data = self.dispatch(cmd, payload)
+            await self.send(cmd | REPLY, bytes((status,)) + data)
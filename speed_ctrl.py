@@ -0,0 +1,107 @@
+# speed_ctrl.py
+""" closed-loop motor speed regulation
+    - feedback: back-EMF or tacho voltage read through adc.Adc
+    - fixed-point PI controller trims duty cycle every control tick
+"""
+
+import asyncio
+from micropython import const
+
+
+class PiCtrl:
+    """ fixed-point PI controller
+        - gains kp_q and ki_q are scaled by 2**Q_SHIFT
+        - integral term clamped to output range (anti-windup)
+        - integer arithmetic only
+    """
+
+    Q_SHIFT = const(8)
+
+    def __init__(self, kp_q, ki_q, out_min=0, out_max=0xffff):
+        self.kp_q = kp_q
+        self.ki_q = ki_q
+        self.out_min = out_min
+        self.out_max = out_max
+        self._i_min = out_min << self.Q_SHIFT
+        self._i_max = out_max << self.Q_SHIFT
+        self._integral = 0
+
+    def reset(self, output=0):
+        """ preload integral so control starts from output (bumpless) """
+        self._integral = output << self.Q_SHIFT
+
+    def update(self, setpoint, measured):
+        """ return new output for one control tick """
+        error = setpoint - measured
+        integral = self._integral + self.ki_q * error
+        if integral > self._i_max:
+            integral = self._i_max
+        elif integral < self._i_min:
+            integral = self._i_min
+        self._integral = integral
+        output = (self.kp_q * error + integral) >> self.Q_SHIFT
+        if output > self.out_max:
+            return self.out_max
+        if output < self.out_min:
+            return self.out_min
+        return output
+
+
+class SpeedReg:
+    """ regulate an L298nChannel to a feedback setpoint
+        - start() runs the control task; stop() ends it
+        - error statistics kept for benchmarking
+    """
+
+    TICK_MS = const(20)
+
+    def __init__(self, channel, adc, kp_q, ki_q, targets=None, out_min=0,
+                 tick_ms=TICK_MS):
+        self.channel = channel
+        self.adc = adc
+        self.targets = targets or {}  # feedback setpoint by direction
+        self.pi = PiCtrl(kp_q, ki_q, out_min)
+        self.tick_ms = tick_ms
+        self.setpoint = 0
+        self.n_ticks = 0
+        self.abs_err_sum = 0
+        self._task = None
+
+    async def regulate(self):
+        """ coro: PI control loop """
+        self.pi.reset(self.channel.dc_u16)
+        while True:
+            measured = self.adc.get_u16()
+            self.channel.set_dc_u16(self.pi.update(self.setpoint, measured))
+            self.n_ticks += 1
+            self.abs_err_sum += abs(self.setpoint - measured)
+            await asyncio.sleep_ms(self.tick_ms)
+
+    def start(self, setpoint):
+        """ regulate to setpoint, from the current duty cycle """
+        self.setpoint = setpoint
+        self.n_ticks = 0
+        self.abs_err_sum = 0
+        if self._task is None:
+            self._task = asyncio.create_task(self.regulate())
+
+    def stop(self):
+        """ end regulation; duty cycle is left unchanged """
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def mean_abs_error(self):
+        return self.abs_err_sum // self.n_ticks if self.n_ticks else 0
+
+
+def regulators_from_cf(board, fb_p):
+    """ return {'A': SpeedReg, 'B': SpeedReg} from feedback parameters
+        - fb_p keys: a_pin, b_pin, kp_q, ki_q, a_target, b_target
+    """
+    from adc import Adc
+    return {'A': SpeedReg(board.channel_a, Adc(fb_p['a_pin']),
+                          fb_p['kp_q'], fb_p['ki_q'], fb_p['a_target']),
+            'B': SpeedReg(board.channel_b, Adc(fb_p['b_pin']),
+                          fb_p['kp_q'], fb_p['ki_q'], fb_p['b_target'])
+            }
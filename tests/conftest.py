@@ -0,0 +1,14 @@
+# conftest.py
+""" host-side tests: run the controller modules under CPython
+    - python -m pytest tests
+"""
+
+import os
+import sys
+
+import host
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+host.install(lcd=False)
@@ -0,0 +1,50 @@
+""" adc.py: AdcSampler burst filter and hysteresis """
+
+import asyncio
+from itertools import cycle
+
+import pytest
+
+from adc import Adc, AdcSampler
+from host.hw import hw
+
+
+@pytest.fixture
+def inputs():
+    hw.reset()
+    yield 26, 27
+    hw.reset()
+
+
+def test_median_rejects_spike_mean_does_not(inputs):
+    burst = [30_000] * 7 + [65_535]
+    hw.set_adc(26, cycle(burst).__next__)
+    hw.set_adc(27, cycle(burst).__next__)
+    median = AdcSampler((Adc(26),), filter_='median')
+    mean = AdcSampler((Adc(27),))
+    assert median.sample() and mean.sample()  # first sample primes
+    assert median.values[0] == 30_000
+    assert mean.values[0] == sum(burst) // 8
+    assert median.pcs[0] == 30_000 // Adc.pc_factor
+
+
+def test_hysteresis_and_change_ev(inputs):
+    level = [20_000]
+    hw.set_adc(26, lambda: level[0])
+    hw.set_adc(27, 10_000)
+    sampler = AdcSampler((Adc(26), Adc(27)), hyst_u16=400, interval_ms=5)
+    assert sampler.sample()
+    level[0] += 399  # within hysteresis: held
+    assert not sampler.sample() and sampler.values[0] == 20_000
+    level[0] += 1_000
+    assert sampler.sample() and sampler.values[0] == 21_399
+    assert list(sampler.pcs) == [21_399 // Adc.pc_factor, 10_000 // Adc.pc_factor]
+
+    async def main():
+        task = asyncio.create_task(sampler.run())
+        level[0] = 40_000
+        await asyncio.wait_for(sampler.change_ev.wait(), 1)
+        task.cancel()
+
+    asyncio.run(main())
+    assert sampler.pcs[0] == 40_000 // Adc.pc_factor
@@ -0,0 +1,91 @@
+# test_buttons.py
+""" buttons.py: EventQueue ring; ButtonBank; irq mode """
+
+import asyncio
+from time import ticks_ms
+
+from buttons import Button, HoldButton, ButtonBank, EventQueue
+from host import hw
+
+
+def test_events_in_order_across_wrap():
+    a, b = Button(6, 'A'), HoldButton(7, 'B')
+    queue = EventQueue((a, b), size=4)
+    for k in range(3):
+        queue.put(a.q_id, a.CLICK, k)
+        queue.get()
+    # head has wrapped: ring indices 3, 0, 1
+    a.set_state(False, 10)
+    b.set_state(True, 11)
+    b.set_state(False, 12)
+    b.set_state(True, 13)
+    b.set_state(False, 13 + b.T_HOLD)
+    assert len(queue) == 3 and queue.ev.is_set()
+    assert list(queue.drain()) == [(10, a, a.CLICK), (12, b, b.CLICK),
+                                   (13 + b.T_HOLD, b, b.HOLD)]
+    assert len(queue) == 0 and not queue.ev.is_set()
+    assert queue.get() is None
+
+
+def test_full_queue_drops_newest():
+    btn = Button(6)
+    queue = EventQueue((btn,), size=2)
+    for t in range(5):
+        btn.set_state(False, t)
+    assert queue.dropped == 3
+    assert [e[0] for e in queue.drain()] == [0, 1]
+
+
+def test_clear():
+    btn = Button(6)
+    queue = EventQueue((btn,))
+    btn.set_state(False, 0)
+    queue.clear()
+    assert len(queue) == 0 and not queue.ev.is_set()
+
+
+
+def test_irq_dropped_release_is_seen():
+    hw.release(10)
+    btn = HoldButton(10, 'tap', irq=True)
+
+    async def main():
+        task = asyncio.create_task(btn.poll_state())
+        await asyncio.sleep_ms(btn.DEBOUNCE_MS + 5)
+        hw.press(10)
+        await asyncio.sleep_ms(btn.DEBOUNCE_MS + 5)  # press read
+        assert not btn.press_ev.is_set()
+        # release lands inside the window of a just-accepted bounce
+        btn._t_edge = ticks_ms()
+        hw.release(10)
+        await asyncio.wait_for(btn.press_ev.wait(), 1)
+        task.cancel()
+
+    asyncio.run(main())
+    assert btn.state == btn.CLICK and not btn.is_pressed()
+
+
+def test_bank_debounces_and_reports_events():
+    hw.reset()
+    a, b = Button(11, 'A'), HoldButton(12, 'B')
+    bank = ButtonBank((a, b))
+    scans = bank.SCAN_INTERVAL * bank.DEBOUNCE_N
+
+    async def main():
+        task = asyncio.create_task(bank.poll_state())
+        await asyncio.sleep_ms(scans)
+        hw.press(11)  # glitch: shorter than DEBOUNCE_N scans
+        await asyncio.sleep_ms(bank.SCAN_INTERVAL)
+        hw.release(11)
+        await asyncio.sleep_ms(2 * scans)
+        assert not bank.press_ev.is_set()
+        hw.press(12)
+        await asyncio.sleep_ms(2 * scans)
+        assert not bank.press_ev.is_set()  # HoldButton: event on release
+        hw.release(12)
+        await asyncio.wait_for(bank.press_ev.wait(), 1)
+        task.cancel()
+
+    asyncio.run(main())
+    assert list(bank.events()) == [b] and b.state == b.CLICK
+    assert a.state == a.WAIT
@@ -0,0 +1,122 @@
+""" calibrate.py: breakaway sweep, speed tuning, abort on e-stop """
+
+import asyncio
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+from buttons import HoldButton
+from calibrate import SWEEP_STEP, CalAbort, calibrate, find_breakaway
+from config import ConfigStore, pc_u16
+from hb_l298n import L298N
+from host import defaults, vtime
+from host.hw import hw
+from motor_ctrl import MotorCtrl
+
+MOVES_AT = 20_000  # u16 duty at which the model motor moves
+
+
+class Lcd:
+    """ last line posted to each row """
+
+    def __init__(self):
+        self.lines = ['', '']
+
+    def write_line(self, row, text):
+        self.lines[row] = text
+
+
+@pytest.fixture
+def rig(tmp_path, monkeypatch):
+    """ controller, buttons, store and e-stop; virtual clock restored after """
+    monkeypatch.chdir(tmp_path)
+    clock = hw.clock
+    hw.reset()
+    board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+    motor_p = defaults.MOTOR_P
+    speeds = [{d: pc_u16(pc) for d, pc in motor_p[k].items()}
+              for k in ('a_speed', 'b_speed')]
+    controller = MotorCtrl(board, *speeds, n_steps=5)
+    buttons = SimpleNamespace(run_btn=HoldButton(6, 'run'), kill_btn=HoldButton(7, 'kill'))
+    store = ConfigStore('motor_p.json', copy.deepcopy(motor_p))
+    estop = SimpleNamespace(tripped=False)
+    yield SimpleNamespace(controller=controller, buttons=buttons, store=store,
+                          estop=estop, lcd=Lcd())
+    hw.clock = clock
+
+
+def moved(channel):
+    return lambda: channel.dc_u16 >= MOVES_AT
+
+
+def press(btn, hold_ms):
+    """ inject a debounced press and release """
+    btn.set_state(True, 0)
+    btn.set_state(False, hold_ms)
+
+
+def test_find_breakaway_and_abort(rig):
+    channel = rig.controller.chan_a
+    found = vtime.run(find_breakaway(channel, 'F', moved(channel)))
+    steps = -(-MOVES_AT // SWEEP_STEP)
+    assert found == (steps - 1) * SWEEP_STEP
+    assert channel.dc_u16 == 0 and channel.state == 'S'
+
+    def trip():
+        rig.estop.tripped = channel.dc_u16 >= MOVES_AT // 2
+        return False
+
+    with pytest.raises(CalAbort):
+        vtime.run(find_breakaway(channel, 'R', trip, estop=rig.estop))
+    assert channel.dc_u16 == 0 and channel.state == 'S'
+
+
+def test_calibrate_sets_results_at_end(rig):
+    ctrl, run_btn = rig.controller, rig.buttons.run_btn
+    detectors = {'A': moved(ctrl.chan_a), 'B': moved(ctrl.chan_b)}
+
+    async def tune():
+        """ one click faster, then accept, for each channel and direction """
+        for label in ('A F', 'B F', 'A R', 'B R'):
+            while rig.lcd.lines[0] != f'Cal speed {label}':
+                await asyncio.sleep_ms(50)
+            assert rig.store._dirty == {}  # nothing set until the end
+            for hold_ms in (100, run_btn.T_HOLD):
+                press(run_btn, hold_ms)
+                while run_btn.state != run_btn.WAIT:
+                    await asyncio.sleep_ms(20)
+
+    async def main():
+        task = asyncio.create_task(tune())
+        done = await calibrate(ctrl, rig.buttons, rig.lcd, rig.store, detectors, rig.estop)
+        await task
+        return done
+
+    assert vtime.run(main())
+    found = (-(-MOVES_AT // SWEEP_STEP) - 1) * SWEEP_STEP
+    assert ctrl.start_u16 == {'A': {'F': found, 'R': found}, 'B': {'F': found, 'R': found}}
+    store = rig.store
+    assert store.get('a_start.R') == store.get('b_start.F') == found
+    motor_p = defaults.MOTOR_P
+    for key in ('a_speed', 'b_speed'):
+        for d in 'FR':
+            assert store.get(f'{key}.{d}') == motor_p[key][d] + 1
+    assert len(store._dirty) == 8 and rig.lcd.lines[0] == 'Cal saved'
+    assert ctrl.chan_a.dc_u16 == ctrl.chan_b.dc_u16 == 0
+
+
+def test_calibrate_trip_aborts_without_saving(rig):
+    ctrl = rig.controller
+    chan_b = ctrl.chan_b
+
+    def detect_b():
+        # trips part-way through the second channel's sweep
+        rig.estop.tripped = chan_b.dc_u16 >= MOVES_AT // 2
+        return False
+
+    detectors = {'A': moved(ctrl.chan_a), 'B': detect_b}
+    done = vtime.run(calibrate(ctrl, rig.buttons, rig.lcd, rig.store, detectors, rig.estop))
+    assert done is False and rig.lcd.lines[0] == 'Cal aborted'
+    assert rig.store._dirty == {} and rig.store.data == defaults.MOTOR_P
+    assert ctrl.chan_a.dc_u16 == chan_b.dc_u16 == 0
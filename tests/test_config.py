@@ -0,0 +1,168 @@
+# test_config.py
+""" config.py: binary parameter cache and ConfigStore journal """
+
+import asyncio
+import json
+import os
+
+import pytest
+
+import config
+from host import defaults
+
+
+@pytest.fixture
+def cf_dir(tmp_path, monkeypatch):
+    """ working directory holding the default JSON files """
+    monkeypatch.chdir(tmp_path)
+    for filename, data in defaults.FILES.items():
+        config.write_cf(filename, data)
+    return tmp_path
+
+
+def test_cache_round_trip(cf_dir):
+    parsed = config.read_cached()
+    assert os.path.exists(config.CACHE_FILE)
+    assert config._read_cache(config.CACHE_FILE, config._source_sig()) == parsed
+    assert config.read_cached() == parsed
+    assert parsed[2]['a_u16'] == {'F': config.pc_u16(70), 'R': config.pc_u16(60)}
+
+
+def test_cache_keeps_any_json_value(cf_dir):
+    motor_p = dict(defaults.MOTOR_P, block=2.5, extra={'x': [1, None, True, 'é']},
+                   big=1 << 40)
+    config.write_cf('motor_p.json', motor_p)
+    parsed = config.read_cached()
+    cached = config._read_cache(config.CACHE_FILE, config._source_sig())
+    assert cached == parsed
+    assert cached[2]['block'] == 2.5
+    assert cached[2]['extra'] == {'x': [1, None, True, 'é']}
+    assert cached[2]['big'] == 1 << 40
+
+
+def test_cache_write_failure_falls_back(cf_dir):
+    config.write_cf('l298n_p.json', dict(defaults.L298N_P, pulse_f=1 << 40))
+    _, l298n_p, _ = config.read_cached()
+    assert l298n_p['pulse_f'] == 1 << 40  # out of FIXED_FORMAT range
+    assert not os.path.exists(config.CACHE_FILE)
+
+
+def test_cache_stale_after_source_change(cf_dir):
+    config.read_cached()
+    motor_p = dict(defaults.MOTOR_P, hold=7_000)
+    with open('motor_p.json', 'w') as f:
+        json.dump(motor_p, f, indent=4)  # new size
+    assert config._read_cache(config.CACHE_FILE, config._source_sig()) is None
+    assert config.read_cached()[2]['hold'] == 7_000
+
+
+def test_cache_rejects_bad_crc(cf_dir):
+    config.read_cached()
+    with open(config.CACHE_FILE, 'rb') as f:
+        data = bytearray(f.read())
+    data[-1] ^= 0xff
+    with open(config.CACHE_FILE, 'wb') as f:
+        f.write(data)
+    assert config._read_cache(config.CACHE_FILE, config._source_sig()) is None
+
+
+def test_journal_skips_torn_line(cf_dir):
+    journal = 'motor_p.json' + config.ConfigStore.JOURNAL_EXT
+    with open(journal, 'w') as f:
+        f.write('["a_speed.F", 71]\n["a_speed.R", 6')  # torn append
+        f.write('["hold", 1]\n["b_speed.F", 72]\n')  # next commit
+    data = config.read_journaled('motor_p.json')
+    assert data['a_speed'] == {'F': 71, 'R': 60}
+    assert data['b_speed']['F'] == 72
+
+
+def test_store_compacts_torn_journal(cf_dir):
+    journal = 'motor_p.json' + config.ConfigStore.JOURNAL_EXT
+    with open(journal, 'w') as f:
+        f.write('["a_speed.F", 71]\n["a_speed.R", 6')
+    store = config.ConfigStore('motor_p.json')
+    assert not os.path.exists(journal)
+    assert config.read_cf('motor_p.json')['a_speed']['F'] == 71
+    store.set('b_speed.R', 55)
+    store.commit()
+    assert config.read_journaled('motor_p.json')['b_speed']['R'] == 55
+
+
+def test_store_commit_and_compact(cf_dir):
+    store = config.ConfigStore('motor_p.json')
+    journal = store.journal
+    store.set('a_speed.F', 80)
+    store.set('a_speed.F', 80)  # unchanged: no delta
+    store.commit()
+    assert os.path.exists(journal)
+    assert config.read_cf('motor_p.json')['a_speed']['F'] == 70
+    assert config.read_journaled('motor_p.json')['a_speed']['F'] == 80
+    n = config.ConfigStore.COMPACT_N - 1  # the delta above counts
+    for i in range(n):
+        store.set('hold', 1_000 + i)
+        store.commit()
+    assert not os.path.exists(journal)
+    data = config.read_cf('motor_p.json')
+    assert data['hold'] == 1_000 + n - 1
+    assert data['a_speed']['F'] == 80
+
+
+def test_commit_invalidates_cache(cf_dir):
+    config.read_cached()
+    store = config.ConfigStore('motor_p.json')
+    store.set('a_speed.F', 50)
+    store.commit()
+    assert not os.path.exists(config.CACHE_FILE)
+    assert config.read_cached()[2]['a_u16']['F'] == config.pc_u16(50)
+
+
+class PowerLoss(Exception):
+    pass
+
+
+def test_power_loss_after_journal_append(cf_dir, monkeypatch):
+    config.read_cached()
+    store = config.ConfigStore('motor_p.json')
+    store.set('a_speed.F', 50)
+
+    class Journal:
+        """ the append completes; power fails before commit() returns """
+
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self.f
+
+        def __exit__(self, *exc):
+            self.f.close()
+            raise PowerLoss()
+
+    def power_fails(filename, mode='r'):
+        f = open(filename, mode)
+        return Journal(f) if filename == store.journal else f
+
+    monkeypatch.setattr(config, 'open', power_fails, raising=False)
+    with pytest.raises(PowerLoss):
+        store.commit()
+    monkeypatch.delattr(config, 'open')
+    # next boot: the journaled value, not a stale cache
+    assert config.read_cached()[2]['a_u16']['F'] == config.pc_u16(50)
+
+
+def test_run_commits_after_changes_stop(cf_dir):
+    async def main():
+        store = config.ConfigStore('motor_p.json')
+        store.DEBOUNCE_MS = 30
+        task = asyncio.create_task(store.run())
+        for pc in (71, 72, 73):
+            store.set('a_speed.F', pc)
+            await asyncio.sleep_ms(10)
+        assert not os.path.exists(store.journal)  # still changing
+        await asyncio.sleep_ms(60)
+        task.cancel()
+        return store.journal
+
+    journal = asyncio.run(main())
+    with open(journal) as f:
+        assert f.read().splitlines() == ['["a_speed.F", 73]']
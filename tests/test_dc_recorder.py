@@ -0,0 +1,62 @@
+""" dc_recorder.py: duty-cycle ring buffer """
+
+import struct
+
+import pytest
+
+import dc_recorder
+from dc_recorder import DutyRecorder
+from hb_l298n import L298N
+from host import defaults
+from host.hw import hw
+
+
+@pytest.fixture
+def ticks(monkeypatch):
+    """ ticks_ms() from a settable list """
+    now = [0]
+    monkeypatch.setattr(dc_recorder, 'ticks_ms', lambda: now[0])
+    return now
+
+
+def test_ring_keeps_newest_in_order(ticks):
+    rec = DutyRecorder(size=4)
+    for k in range(6):
+        ticks[0] = 10 * k
+        rec.record(k % 2, 'F', 1000 * k)
+    assert rec.count == 4
+    assert list(rec.samples()) == [(20, 0, 'F', 2000), (30, 1, 'F', 3000),
+                                   (40, 0, 'F', 4000), (50, 1, 'F', 5000)]
+    rec.clear()
+    assert list(rec.samples()) == []
+
+
+def test_timing_stats_splits_ramps_at_gaps(ticks):
+    rec = DutyRecorder()
+    for t in (0, 20, 42, 60, 500, 519, 540):
+        ticks[0] = t
+        rec.record(1, 'R', 100)
+        rec.record(0, 'R', 100)  # other channel ignored
+    stats = rec.timing_stats(1, 20)
+    assert stats == {'n': 5, 'mean': 20, 'min': 18, 'max': 22, 'jitter': 1.2}
+    assert rec.timing_stats(2, 20) == {'n': 0}
+
+
+def test_attached_channel_recorded_and_dumped(ticks, tmp_path):
+    hw.reset()
+    board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+    rec = DutyRecorder()
+    rec.attach(board.channel_a)
+    board.channel_a.set_state('F')
+    board.channel_a.set_dc_u16(30_000)
+    board.channel_b.set_dc_u16(20_000)
+    rec.detach(board.channel_a)
+    board.channel_a.set_dc_u16(0)
+    samples = list(rec.samples())
+    assert samples[-1] == (0, 0, 'F', 30_000)
+    path = tmp_path / 'dc.bin'
+    rec.dump_bin(str(path))
+    data = path.read_bytes()
+    size = struct.calcsize(rec.REC_FORMAT)
+    assert len(data) == size * len(samples)
+    assert struct.unpack_from(rec.REC_FORMAT, data, len(data) - size) == (0, 0, ord('F'), 30_000)
@@ -0,0 +1,103 @@
+# test_dual_core.py
+""" dual_core.py: seqlock Mailbox; DualCoreCtrl with core 1 as a thread """
+
+import asyncio
+import threading
+
+import pytest
+
+from dual_core import Mailbox, DualCoreCtrl
+from hb_l298n import L298N
+from host import defaults
+from host.hw import hw
+
+SPEEDS = {'F': 40_000, 'R': 30_000}
+
+
+def test_take_returns_latest_post():
+    box = Mailbox(2)
+    out = [0, 0]
+    assert box.take(0, out) == 0 and out == [0, 0]
+    box.post(1, 10)
+    box.post(2, 20)
+    seq = box.take(0, out)
+    assert seq == box.seq() and out == [2, 20]
+    assert box.take(seq, out) == seq  # nothing new
+
+
+def test_no_torn_reads_across_threads():
+    box = Mailbox(2)
+    n_posts = 20_000
+
+    def writer():
+        for i in range(1, n_posts + 1):
+            box.post(i, 3 * i)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    out = [0, 0]
+    last = 0
+    n_torn = 0
+    while thread.is_alive() or box.seq() != last:
+        last = box.take(last, out)
+        if out[1] != 3 * out[0]:
+            n_torn += 1
+    thread.join()
+    assert n_torn == 0
+    assert out[0] == n_posts
+
+
+@pytest.fixture
+def ctrl():
+    hw.reset()
+    board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+    ctrl = DualCoreCtrl(board, dict(SPEEDS), dict(SPEEDS), n_steps=10)
+    yield ctrl
+    ctrl.shutdown()
+
+
+def test_ramp_runs_on_core_1(ctrl):
+    asyncio.run(ctrl.start_a_b('F', 100))
+    assert ctrl.chan_a.dc_u16 == SPEEDS['F'] and ctrl.chan_b.dc_u16 == SPEEDS['F']
+
+
+def test_halt_during_ramp(ctrl):
+    async def main():
+        ramp = asyncio.create_task(ctrl.start_a_b('F', 500))
+        await asyncio.sleep_ms(150)
+        assert 0 < ctrl.chan_a.dc_u16 < SPEEDS['F']
+        ctrl.halt_a_b()
+        # stopped by core 1 before halt_a_b() returns
+        for channel in (ctrl.chan_a, ctrl.chan_b):
+            assert channel.dc_u16 == 0 and channel.state == 'S'
+        await asyncio.wait_for(ramp, 1)  # moves replaced by the halt
+        await asyncio.sleep_ms(150)
+        assert ctrl.chan_a.dc_u16 == 0 and ctrl.chan_b.dc_u16 == 0
+
+    asyncio.run(main())
+
+
+def test_cancel_during_ramp_holds_duty(ctrl):
+    async def main():
+        ramp = asyncio.create_task(ctrl.start_a_b('F', 500))
+        await asyncio.sleep_ms(150)
+        ramp.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await ramp
+        await asyncio.sleep_ms(20)
+        held = ctrl.chan_a.dc_u16
+        await asyncio.sleep_ms(150)
+        assert 0 < held < SPEEDS['F'] and ctrl.chan_a.dc_u16 == held
+        await ctrl.stop_a_b('F', 100)
+        assert ctrl.chan_a.dc_u16 == 0
+
+    asyncio.run(main())
+
+
+def test_shutdown_returns_channels_to_core_0(ctrl):
+    assert ctrl.on_core1
+    ctrl.shutdown()
+    assert not ctrl.on_core1
+    ctrl.chan_a.set_dc_u16(1_000)
+    ctrl.halt_a_b()  # no core 1: stopped at once
+    assert ctrl.chan_a.dc_u16 == 0 and ctrl.chan_a.state == 'S'
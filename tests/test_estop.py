@@ -0,0 +1,148 @@
+""" estop.py: trip from interrupt context; hb_l298n.py: channel lock """
+
+import asyncio
+
+import pytest
+
+from buttons import HoldButton
+from estop import EStop, Liveness
+from hb_l298n import L298N
+from host import defaults
+from host.hw import hw
+from ramp_timer import advance_moves
+
+EPIN = 20
+
+
+@pytest.fixture
+def board():
+    hw.reset()
+    return L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+
+
+def hold_pin(pin_id):
+    """ pin held low, as at the e-stop timer expiry """
+    hw.pin(pin_id).level = 0
+
+
+def test_trip_inside_ramp_step_leaves_motor_off(board):
+    channel = board.channel_a
+    estop = EStop(EPIN, (board.channel_a, board.channel_b))
+    pwm = channel.enable
+    write = pwm.duty_u16
+
+    def duty_u16(value=None):
+        # e-stop fires after the locked check, before the duty write
+        if value and not estop.tripped:
+            hold_pin(EPIN)
+            estop._trip(None)
+        return write(value)
+
+    pwm.duty_u16 = duty_u16
+    ramp = (1_000, 2_000, 3_000)
+    channel.set_state('F')
+    index = [0]
+    advance_moves(((channel, ramp, 0, 2, 1, 3_000),), index)
+    assert estop.tripped
+    assert channel.dc_u16 == 0 and write() == 0
+    assert channel.state == 'S'
+    advance_moves(((channel, ramp, 0, 2, 1, 3_000),), index)
+    assert channel.dc_u16 == 0 and write() == 0
+
+
+def test_reset_unlocks(board):
+    estop = EStop(EPIN, (board.channel_a, board.channel_b))
+    hold_pin(EPIN)
+    estop._trip(None)
+    board.channel_b.set_dc_u16(5_000)
+    assert board.channel_b.dc_u16 == 0
+    estop.reset()
+    board.channel_b.set_dc_u16(5_000)
+    assert board.channel_b.dc_u16 == 5_000 and not estop.tripped
+
+
+def test_hold_trips_release_cancels(board):
+    async def main():
+        estop = EStop(EPIN, (board.channel_a, board.channel_b), hold_ms=20)
+        board.channel_a.set_dc_u16(5_000)
+        hw.press(EPIN)
+        await asyncio.sleep_ms(5)
+        hw.release(EPIN)  # a click
+        await asyncio.sleep_ms(40)
+        assert not estop.tripped and board.channel_a.dc_u16 == 5_000
+        hw.press(EPIN)
+        await asyncio.sleep_ms(30)
+        # held: cut before release
+        assert estop.tripped and estop.n_trips == 1
+        assert board.channel_a.dc_u16 == 0 and board.channel_a.state == 'S'
+        assert 0 <= estop.latency_us <= estop.latency_max_us
+        await asyncio.wait_for(estop.trip_ev.wait(), 1)
+        hw.release(EPIN)
+
+    asyncio.run(main())
+
+
+def test_shared_kill_pin_trips_and_reports_hold(board):
+    from incline_control import InputButtons
+
+    async def main():
+        estop = EStop(EPIN, (board.channel_a, board.channel_b), hold_ms=50)
+        # the kill button's irq() comes after the e-stop's on one GPIO
+        buttons = InputButtons({'run': 21, 'kill': EPIN}, estop)
+        kill = buttons.kill_btn
+        kill.T_HOLD = 50
+        task = asyncio.create_task(kill.poll_state())
+        await asyncio.sleep_ms(kill.DEBOUNCE_MS + 5)
+        board.channel_a.set_dc_u16(5_000)
+        hw.press(EPIN)
+        await asyncio.sleep_ms(80)
+        assert estop.tripped and board.channel_a.dc_u16 == 0
+        hw.release(EPIN)
+        await asyncio.wait_for(kill.press_ev.wait(), 1)
+        task.cancel()
+        return kill.state
+
+    assert asyncio.run(main()) == HoldButton.HOLD
+
+
+class Wdt:
+    def __init__(self):
+        self.n_feeds = 0
+
+    def feed(self):
+        self.n_feeds += 1
+
+
+def test_liveness_feeds_only_while_busy_loops_beat():
+    wdt = Wdt()
+    live = Liveness(wdt, 10)
+    a, b = live.add(), live.add()
+    assert live.check()  # all idle
+    live.beat(a)
+    assert live.check()
+    assert not live.check()  # a busy, no beat since the feed
+    live.beat(a)
+    live.beat(b)
+    assert live.check()
+    live.idle(a)
+    live.beat(b)
+    assert live.check()
+    assert not live.check()
+    assert live.n_missed == 2
+
+
+def test_liveness_run_stops_feeding_a_stuck_loop():
+    async def main():
+        wdt = Wdt()
+        live = Liveness(wdt, 10)
+        slot = live.add()
+        task = asyncio.create_task(live.run())
+        live.beat(slot)
+        await asyncio.sleep_ms(55)
+        n = wdt.n_feeds
+        await asyncio.sleep_ms(50)
+        task.cancel()
+        return n, wdt.n_feeds
+
+    n_stuck, n_end = asyncio.run(main())
+    assert n_stuck == 1 and n_end == 1
@@ -0,0 +1,66 @@
+""" gc_monitor.py: per-cycle statistics; lcd_1602.put_uint """
+
+import gc
+
+import pytest
+
+import gc_monitor
+from gc_monitor import GcMonitor
+from lcd_1602 import put_uint
+
+
+@pytest.fixture
+def heap(monkeypatch):
+    """ settable (ticks_us, mem_alloc) """
+    now = {'t': 0, 'alloc': 1_000}
+    monkeypatch.setattr(gc_monitor, 'ticks_us', lambda: now['t'])
+    monkeypatch.setattr(gc, 'mem_alloc', lambda: now['alloc'])
+    monkeypatch.setattr(gc, 'collect', lambda: now.update(t=now['t'] + 700, alloc=200))
+    return now
+
+
+def cycle(heap, monitor, dt, da):
+    heap['t'] += dt
+    heap['alloc'] += da
+    monitor.tick()
+
+
+def test_cycles_split_by_collection(heap):
+    monitor = GcMonitor()
+    monitor.tick()  # first tick only sets the reference
+    cycle(heap, monitor, 20_000, 0)
+    cycle(heap, monitor, 21_000, 64)
+    cycle(heap, monitor, 25_000, -800)  # collection ran
+    cycle(heap, monitor, 19_000, 32)
+    assert monitor.stats() == {'cycles': 4, 'alloc_mean': 32, 'alloc_max': 64,
+                               'cycle_max_us': 21_000, 'gc_cycles': 1,
+                               'gc_cycle_max_us': 25_000, 'collect_max_us': 0}
+
+
+def test_start_skips_gap_and_collect_is_timed(heap):
+    monitor = GcMonitor()
+    monitor.start()
+    cycle(heap, monitor, 20_000, 16)
+    heap['t'] += 5_000_000  # between ramps
+    heap['alloc'] += 4_000
+    monitor.start()
+    cycle(heap, monitor, 20_000, 0)
+    assert monitor.cycle_max_us == 20_000 and monitor.alloc_max == 16
+    assert monitor.collect() == 700
+    # collect() restarts the reference: the fall in heap is not a gc cycle
+    cycle(heap, monitor, 20_000, 0)
+    assert monitor.n_gc == 0 and monitor.n_collect == 1
+    monitor.clear()
+    assert monitor.stats()['cycles'] == 0
+
+
+def test_put_uint_fields():
+    buf = bytearray(b'A:xxxxx|')
+    put_uint(buf, 2, 42, 5)
+    assert buf == b'A:00042|'
+    put_uint(buf, 2, 7, 5, 0x20)
+    assert buf == b'A:    7|'
+    put_uint(buf, 2, 1_234_567, 5)  # too wide: low digits kept
+    assert buf == b'A:34567|'
+    put_uint(buf, 2, 0, 5, 0x20)
+    assert buf == b'A:    0|'
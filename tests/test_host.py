@@ -0,0 +1,67 @@
+""" host package: MicroPython stand-ins """
+
+import asyncio
+import threading
+
+from host import ThreadSafeFlag
+from host.hw import hw
+from machine import Pin
+
+
+def test_set_before_first_wait_is_kept():
+    flag = ThreadSafeFlag()
+    flag.set()
+
+    async def main():
+        await asyncio.wait_for(flag.wait(), 1)
+        # cleared by wait()
+        try:
+            await asyncio.wait_for(flag.wait(), 0.02)
+        except asyncio.TimeoutError:
+            return True
+        return False
+
+    assert asyncio.run(main())
+
+
+def test_set_from_thread_before_and_during_wait():
+    flag = ThreadSafeFlag()
+    thread = threading.Thread(target=flag.set)
+    thread.start()
+    thread.join()
+
+    async def main():
+        await asyncio.wait_for(flag.wait(), 1)
+        timer = threading.Timer(0.02, flag.set)
+        timer.start()
+        await asyncio.wait_for(flag.wait(), 1)
+        timer.join()
+
+    asyncio.run(main())
+
+
+def test_flag_survives_a_new_loop():
+    flag = ThreadSafeFlag()
+
+    async def set_later():
+        asyncio.get_running_loop().call_later(0.01, flag.set)
+        await flag.wait()
+
+    asyncio.run(set_later())
+    flag.set()  # loop closed: kept for the next wait
+    asyncio.run(asyncio.wait_for(flag.wait(), 1))
+
+
+def test_one_irq_handler_per_gpio():
+    hw.reset()
+    calls = []
+    first, second = Pin(9, Pin.IN, Pin.PULL_UP), Pin(9, Pin.IN, Pin.PULL_UP)
+    first.irq(handler=lambda p: calls.append('first'), trigger=Pin.IRQ_FALLING)
+    second.irq(handler=lambda p: calls.append('second'),
+               trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING)
+    hw.press(9)
+    hw.release(9)
+    assert calls == ['second', 'second']
+    first.irq(handler=None)  # any Pin object for the GPIO disables it
+    hw.press(9)
+    assert calls == ['second', 'second']
@@ -0,0 +1,137 @@
+# test_lcd_1602.py
+""" lcd_1602.py: LcdApi shadow diffing; LcdRender; boot probe; print() mode """
+
+import asyncio
+
+import pytest
+
+from host import hw
+from host.lcd1602 import Lcd1602
+from lcd_1602 import LcdApi, LcdRender
+
+PINS = {'sda': 0, 'scl': 1}
+
+
+@pytest.fixture
+def display(tmp_path, monkeypatch):
+    """ emulated display; address cache in tmp_path """
+    monkeypatch.chdir(tmp_path)
+    hw.reset()
+    device = Lcd1602()
+    hw.attach_i2c(Lcd1602.ADDRESS, device)
+    yield device
+    hw.reset()
+
+
+def test_unchanged_line_not_sent(display):
+    lcd = LcdApi(PINS)
+    lcd.write_line(0, 'Waiting...')
+    lcd.reset_counts()
+    lcd.write_line(0, 'Waiting...')
+    assert lcd.n_writes == 0
+    lcd.write_line(0, b'Waiting..!')
+    # one changed cell: cursor and data transactions
+    assert lcd.n_writes == 2 and lcd.n_bytes == 4
+    assert display.text()[0] == f'{"Waiting..!":<16}'
+
+
+def test_clear_and_invalidate(display):
+    lcd = LcdApi(PINS)
+    lcd.write_line(1, 'abc')
+    lcd.clear()
+    assert display.text()[1] == ' ' * 16
+    lcd.reset_counts()
+    lcd.write_line(1, '')  # shadow is blank after clear
+    assert lcd.n_writes == 0
+    lcd.invalidate()
+    lcd.write_line(1, '')
+    assert lcd.n_writes == 2 and lcd.n_bytes == 2 + 17
+
+
+def test_print_mode_quiet_when_not_verbose(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    hw.reset()
+    lcd = LcdApi(PINS, verbose=False)
+    lcd.write_line(0, 'Waiting...')
+    lcd.write_char(0, 1, 'x')
+    assert not lcd.lcd_mode and capsys.readouterr().out == ''
+    lcd.verbose = True
+    lcd.write_line(0, 'Waiting...')
+    assert capsys.readouterr().out == f'{"Waiting...":<16}\n'
+
+
+def test_changed_cells_batched_into_runs(display):
+    lcd = LcdApi(PINS)
+    lcd.write_line(0, 'abcdefghijklmnop')
+    assert lcd._shadow[0] == b'abcdefghijklmnop'
+    lcd.reset_counts()
+    # cells 0 and 3: gap bridged, one run of 4
+    lcd.write_line(0, 'XbcXefghijklmnop')
+    assert lcd.n_writes == 2 and lcd.n_bytes == 2 + 5
+    lcd.reset_counts()
+    # cells 0 and 15: gap too long, two runs
+    lcd.write_line(0, 'YbcXefghijklmnoY')
+    assert lcd.n_writes == 4 and lcd.n_bytes == 2 * (2 + 2)
+    assert display.text()[0] == 'YbcXefghijklmnoY'
+
+
+def test_write_char_code_and_str(display):
+    lcd = LcdApi(PINS)
+    lcd.write_char(3, 1, 0x41)
+    lcd.write_char(4, 1, 'B')
+    assert display.text()[1] == '   AB' + ' ' * 11
+
+
+def test_render_latest_wins(display):
+    lcd = LcdRender(LcdApi(PINS, start=False))
+
+    async def main():
+        task = asyncio.create_task(lcd.render())
+        for k in range(5):
+            lcd.write_line(0, f'count {k}')
+        lcd.write_char(0, 0, '#')  # drawn after its row's line
+        await asyncio.wait_for(lcd.ready_ev.wait(), 1)
+        await asyncio.wait_for(lcd.flush(), 1)
+        assert display.text()[0] == f'{"#ount 4":<16}'
+        lcd.write_char(1, 1, 'x')
+        lcd.write_line(1, 'row 1')  # discards the char post
+        lcd.clear()
+        lcd.write_line(0, 'after clear')
+        await asyncio.wait_for(lcd.flush(), 1)
+        task.cancel()
+
+    asyncio.run(main())
+    assert lcd.lcd_mode and lcd.ready_ms is not None
+    assert display.text() == [f'{"after clear":<16}', ' ' * 16]
+
+
+def test_deferred_start_and_cached_probe(display, monkeypatch):
+    from machine import I2C
+    scans = []
+    i2c_scan = I2C.scan
+
+    def scan(self):
+        scans.append(1)
+        return i2c_scan(self)
+
+    monkeypatch.setattr(I2C, 'scan', scan)
+
+    async def boot():
+        lcd_api = LcdApi(PINS, start=False)
+        assert lcd_api.n_writes == 0 and not lcd_api.started  # no bus traffic
+        await lcd_api.start_async()
+        return lcd_api
+
+    lcd_api = asyncio.run(boot())
+    assert lcd_api.lcd_mode and lcd_api.started and len(scans) == 1
+    with open(LcdApi.ADDR_CACHE, 'rb') as f:
+        assert f.read() == bytes((Lcd1602.ADDRESS,))
+    # next boot: the cached address answers, no scan
+    lcd_api = asyncio.run(boot())
+    assert lcd_api.lcd_mode and len(scans) == 1
+    # display gone: the cached probe fails, the scan finds nothing
+    hw.i2c_devices.clear()
+    lcd_api = asyncio.run(boot())
+    assert not lcd_api.lcd_mode and len(scans) == 2
+    with open(LcdApi.ADDR_CACHE, 'rb') as f:
+        assert f.read() == b'\x00'
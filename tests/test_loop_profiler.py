@@ -0,0 +1,124 @@
+""" loop_profiler.py: task slices, lateness and trace export """
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from host import vtime
+from host.hw import hw
+from loop_profiler import LoopProfiler
+
+
+@pytest.fixture
+def clock():
+    """ virtual clock for the test; restored after """
+    saved = hw.clock
+    yield
+    hw.clock = saved
+
+
+async def ticker(n, ms=10):
+    for _ in range(n):
+        await asyncio.sleep_ms(ms)
+    return n
+
+
+async def fails():
+    await asyncio.sleep_ms(5)
+    raise ValueError('fails')
+
+
+async def hog():
+    await asyncio.sleep_ms(2)
+    time.sleep_ms(30)  # blocks the loop
+
+
+async def sleeper():
+    await asyncio.sleep_ms(10_000)
+
+
+def test_tasks_profiled_and_results_passed_through(clock, tmp_path):
+    prof = LoopProfiler(size=8)
+
+    async def main():
+        prof.install()
+        try:
+            done = asyncio.create_task(ticker(4))
+            failed = asyncio.create_task(fails())
+            cancelled = asyncio.create_task(sleeper())
+            asyncio.create_task(hog())
+            await asyncio.sleep_ms(1)
+            cancelled.cancel()
+            results = await asyncio.gather(done, failed, cancelled,
+                                           return_exceptions=True)
+        finally:
+            prof.uninstall()
+        return results
+
+    sleep_ms = asyncio.sleep_ms
+    n, exc, cancel = vtime.run(main())
+    assert asyncio.sleep_ms is sleep_ms  # uninstalled
+    assert n == 4 and isinstance(exc, ValueError)
+    assert isinstance(cancel, asyncio.CancelledError)
+    assert prof.names == ['ticker', 'fails', 'sleeper', 'hog']
+    assert prof.wakes == [5, 2, 2, 2]
+    assert prof.run_max_us[3] >= 30_000
+    # ticker's first sleep ends while hog blocks
+    assert prof.late_max_us[0] >= 20_000
+    # woken by cancel() long before its deadline
+    assert prof.late_max_us[2] == 0
+    i = max(j for j in range(prof.size) if prof._tids[j] == 2)
+    assert prof._late[i] < -9_000_000
+
+    path = tmp_path / 'trace.json'
+    prof.export_trace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    meta = [e for e in events if e['ph'] == 'M']
+    slices = [e for e in events if e['ph'] == 'X']
+    assert [e['args']['name'] for e in meta] == prof.names
+    assert len(slices) == min(prof._n, prof.size) == 8
+    assert all(s['ts'] >= 0 and s['dur'] >= 0 for s in slices)
+
+
+def test_soak_past_counter_range_keeps_trace_monotonic(clock, tmp_path):
+    prof = LoopProfiler(size=16)
+    step_ms = 600_000  # 10 minutes
+
+    async def main():
+        prof.install()
+        try:
+            await asyncio.create_task(ticker(9, step_ms))  # 90 minutes: > 2**32 us
+        finally:
+            prof.uninstall()
+
+    vtime.run(main())
+    assert prof.wakes == [10]
+    path = tmp_path / 'trace.json'
+    prof.export_trace(str(path))
+    ts = [e['ts'] for e in json.loads(path.read_text())['traceEvents']
+          if e['ph'] == 'X']
+    steps = [b - a for a, b in zip(ts, ts[1:])]
+    assert len(ts) == 10 and all(abs(s - step_ms * 1_000) < 1_000 for s in steps)
+
+
+def test_repeated_task_shares_one_row(clock):
+    prof = LoopProfiler()
+
+    async def main():
+        prof.install()
+        try:
+            for _ in range(300):  # more tasks than tids
+                await asyncio.create_task(ticker(2))
+            # two live tasks of one name keep their own deadlines
+            await asyncio.gather(asyncio.create_task(ticker(3, 20)),
+                                 asyncio.create_task(ticker(3, 30)))
+        finally:
+            prof.uninstall()
+
+    vtime.run(main())
+    assert prof.names == ['ticker']
+    assert prof.wakes == [300 * 3 + 2 * 4]
+    # a shared deadline would wake one of the pair 10 ms "early"
+    assert all(abs(late) < 100 for late in prof._late[:prof._n % prof.size])
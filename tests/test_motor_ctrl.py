@@ -0,0 +1,105 @@
+# test_motor_ctrl.py
+""" motor_ctrl.py: ramp tables; moves from the current duty cycle """
+
+import pytest
+
+from dc_recorder import DutyRecorder
+from hb_l298n import L298N
+from host import defaults, vtime
+from host.hw import hw
+from motor_ctrl import MotorCtrl, ramp_table, PROFILES
+from ramp_timer import advance_moves, ramp_index, start_move, stop_move
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_ramp_table_ends_and_monotonic(profile):
+    table = ramp_table(16_383, 45_874, 25, profile)
+    assert len(table) == 26
+    assert table[0] == 16_383 and table[-1] == 45_874
+    assert all(a <= b for a, b in zip(table, table[1:]))
+
+
+def test_ramp_table_start_above_target():
+    table = ramp_table(40_000, 30_000, 10)
+    assert list(table) == [30_000] * 11
+
+
+def test_ramp_table_s_curve_midpoint():
+    table = ramp_table(0, 1_000, 10, 's_curve')
+    assert table[5] == 500
+    assert table[1] < 100  # slow start
+
+
+def test_ramp_table_unknown_profile():
+    with pytest.raises(ValueError):
+        ramp_table(0, 1_000, 10, 'cubic')
+
+
+class Channel:
+    """ duty cycle and the duties set """
+
+    def __init__(self, dc_u16=0):
+        self.dc_u16 = dc_u16
+        self.duties = []
+
+    def set_dc_u16(self, dc_u16):
+        self.dc_u16 = dc_u16
+        self.duties.append(dc_u16)
+
+
+RAMP = ramp_table(10_000, 20_000, 10)  # 10_000, 11_000 ... 20_000
+
+
+def play(move):
+    """ step move to completion; return the duties set """
+    index = [move[2]]
+    while advance_moves((move,), index):
+        pass
+    return move[0].duties
+
+
+def test_ramp_index():
+    assert ramp_index(RAMP, 0) == 0
+    assert ramp_index(RAMP, 15_000) == 5
+    assert ramp_index(RAMP, 15_001) == 6
+    assert ramp_index(RAMP, 30_000) == len(RAMP)
+
+
+def test_start_move_from_current_duty():
+    assert play(start_move(Channel(), RAMP)) == list(RAMP)
+    # mid-ramp: continues upward, no step back to the ramp start
+    assert play(start_move(Channel(15_000), RAMP)) == [16_000, 17_000, 18_000,
+                                                       19_000, 20_000]
+    # below the table start: from the start
+    assert play(start_move(Channel(5_000), RAMP))[0] == 10_000
+
+
+def test_stop_move_from_current_duty():
+    assert play(stop_move(Channel(15_500), RAMP)) == [15_000, 14_000, 13_000,
+                                                      12_000, 11_000, 10_000, 0]
+    # regulated above the table end: down from the table's top
+    assert play(stop_move(Channel(23_000), RAMP)) == list(RAMP)[::-1] + [0]
+    # already stopped: straight to 0
+    assert play(stop_move(Channel(0), RAMP)) == [0]
+    # below the table start: straight to 0
+    assert play(stop_move(Channel(8_000), RAMP)) == [0]
+
+
+def test_start_a_b_continues_from_running_duty():
+    clock = hw.clock
+    hw.reset()
+    try:
+        board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+        ctrl = MotorCtrl(board, {'F': 40_000, 'R': 30_000},
+                         {'F': 40_000, 'R': 30_000}, n_steps=10)
+        recorder = DutyRecorder()
+        board.channel_a.set_state('F')
+        board.channel_a.set_dc_u16(30_000)  # e.g. left by a ramp-down
+        recorder.attach(board.channel_a, board.channel_b)
+        vtime.run(ctrl.start_a_b('F', 100))
+    finally:
+        hw.clock = clock
+    a = [dc for _, ch, _, dc in recorder.samples() if ch == 0]
+    b = [dc for _, ch, _, dc in recorder.samples() if ch == 1]
+    assert min(a) > 30_000 and a[-1] == 40_000
+    assert b[0] == ctrl.get_start('B', 'F') and b[-1] == 40_000
@@ -0,0 +1,60 @@
+""" motor_group.py: N channels in one tick; skew on both ramp paths """
+
+import asyncio
+
+import pytest
+
+from hb_l298n import L298N
+from host import defaults
+from host.hw import hw
+from motor_ctrl import MotorCtrl
+from motor_group import MotorGroup
+
+PINS_2 = {'enA': 16, 'in1': 17, 'in2': 18, 'in3': 19, 'in4': 20, 'enB': 21}
+SPEEDS = ({'F': 40_000, 'R': 30_000}, {'F': 41_000, 'R': 31_000},
+          {'F': 42_000, 'R': 32_000}, {'F': 43_000, 'R': 33_000})
+
+
+@pytest.fixture
+def boards():
+    hw.reset()
+    f = defaults.L298N_P['pulse_f']
+    return L298N(defaults.L298N_P['pins'], f), L298N(PINS_2, f)
+
+
+@pytest.mark.parametrize('timer_ramp', (False, True))
+def test_group_ramps_all_channels_and_records_skew(boards, timer_ramp):
+    group = MotorGroup.from_boards(boards, SPEEDS, n_steps=5, timer_ramp=timer_ramp)
+    assert len(group.channels) == 4
+
+    async def main():
+        await group.start('F', 50)
+        assert [ch.dc_u16 for ch in group.channels] == [s['F'] for s in SPEEDS]
+        assert all(ch.state == 'F' for ch in group.channels)
+        n_up = group.n_ticks
+        await group.stop('F', 50)
+        assert all(ch.dc_u16 == 0 for ch in group.channels)
+        return n_up
+
+    n_up = asyncio.run(main())
+    assert n_up == 6  # 5 steps, then the final duty
+    assert group.n_ticks > n_up
+    assert 0 <= group.mean_skew_us() <= group.skew_max_us
+    group.clear_skew()
+    assert group.n_ticks == 0 and group.mean_skew_us() == 0
+
+
+@pytest.mark.parametrize('timer_ramp', (False, True))
+def test_motor_ctrl_steps_through_its_group(boards, timer_ramp):
+    board = boards[0]
+    ctrl = MotorCtrl(board, dict(SPEEDS[0]), dict(SPEEDS[1]), n_steps=5,
+                     timer_ramp=timer_ramp)
+    assert ctrl.group.channels == (board.channel_a, board.channel_b)
+    asyncio.run(ctrl.start_a_b('R', 50))
+    assert ctrl.chan_a.dc_u16 == 30_000 and ctrl.chan_b.dc_u16 == 31_000
+    assert ctrl.group.n_ticks == 6
+    ctrl.set_speed('A', 'R', 20_000)  # group ramps follow
+    assert ctrl.group.ramps[0]['R'][-1] == 20_000
+    # the group steps the controller's own tables: no second copy
+    assert ctrl.group.ramps[0]['R'] is ctrl.get_ramp('A', 'R')
+    assert ctrl.group.ramps[1]['F'] is ctrl.get_ramp('B', 'F')
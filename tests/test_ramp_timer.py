@@ -0,0 +1,71 @@
+""" ramp_timer.py: moves stepped by the timer callback """
+
+import asyncio
+
+from ramp_timer import TimerRamp, advance_moves, walk_moves
+
+
+class Channel:
+    """ records each duty cycle set """
+
+    def __init__(self):
+        self.duties = []
+
+    def set_dc_u16(self, dc_u16):
+        self.duties.append(dc_u16)
+
+
+RAMP = (0, 100, 200, 300, 400)
+
+
+def test_advance_moves_up_and_down():
+    up, down = Channel(), Channel()
+    # (channel, ramp, index, end, step, final)
+    moves = [(up, RAMP, 1, 5, 1, 450), (down, RAMP, 3, 0, -1, 0)]
+    index = [m[2] for m in moves]
+    active = []
+    while True:
+        active.append(advance_moves(moves, index))
+        if not active[-1]:
+            break
+    assert up.duties == [100, 200, 300, 400, 450]
+    assert down.duties == [300, 200, 100, 0]
+    assert active == [2, 2, 2, 1, 0]
+    assert index == [None, None]
+
+
+def test_timer_ramp_matches_walk_moves():
+    timed, walked = Channel(), Channel()
+    ramp = TimerRamp()
+    ticks = []
+
+    def advance(moves, index):
+        ticks.append(index[0])
+        return advance_moves(moves, index)
+
+    ramp.advance = advance
+
+    async def main():
+        await asyncio.wait_for(ramp.run([(timed, RAMP, 0, 5, 1, 500)], 5), 1)
+        await walk_moves([(walked, RAMP, 0, 5, 1, 500)], 5)
+        await ramp.run([], 5)  # nothing to do
+
+    asyncio.run(main())
+    assert timed.duties == walked.duties == [0, 100, 200, 300, 400, 500]
+    assert ticks == [0, 1, 2, 3, 4, 5]
+
+
+def test_cancel_holds_duty():
+    ch = Channel()
+    ramp = TimerRamp()
+
+    async def main():
+        task = asyncio.create_task(ramp.run([(ch, RAMP, 0, 5, 1, 500)], 20))
+        await asyncio.sleep_ms(30)
+        task.cancel()
+        n = len(ch.duties)
+        await asyncio.sleep_ms(60)
+        return n
+
+    n = asyncio.run(main())
+    assert 0 < n < 6 and len(ch.duties) == n
@@ -0,0 +1,141 @@
+# test_run_log.py
+""" run_log.py: block writes, rotation; host/decode_log.py """
+
+import csv
+import os
+
+import pytest
+
+import run_log
+from host import decode_log
+from run_log import RunLog, RECORD_SIZE, BLOCK_SIZE
+
+PER_BLOCK = BLOCK_SIZE // RECORD_SIZE
+
+
+@pytest.fixture
+def files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return ('run_0.bin', 'run_1.bin')
+
+
+def records(filename):
+    return decode_log.read_records(filename, run_log.RECORD_FORMAT, RECORD_SIZE)
+
+
+def test_new_file_has_open_record(files):
+    RunLog(files)
+    recs = records(files[0])
+    assert len(recs) == 1
+    assert recs[0][1] == run_log.EV_OPEN and recs[0][6] == 0
+    assert not os.path.exists(files[1])
+
+
+def test_full_block_handed_over_and_flush(files):
+    log = RunLog(files)
+    for i in range(PER_BLOCK + 3):
+        log.log(run_log.EV_RAMP, 'F', 1, 2, i)
+    assert log._full is not None  # first block waits for run()
+    assert len(records(files[0])) == 1
+    log.flush()
+    recs = records(files[0])
+    assert len(recs) == 1 + PER_BLOCK + 3
+    assert [r[6] for r in recs[1:]] == list(range(PER_BLOCK + 3))
+    assert recs[1][2] == ord('F')
+
+
+def test_flush_keeps_block_boundaries(files):
+    log = RunLog(files)
+    log.log(run_log.EV_ESTOP, value=1)
+    log.flush()
+    log.flush()  # nothing new: no write
+    assert log.n_blocks == 1
+    assert os.path.getsize(files[0]) == BLOCK_SIZE + RECORD_SIZE
+    for i in range(PER_BLOCK - 1):
+        log.log(run_log.EV_RAMP, value=i)
+    log.log(run_log.EV_END)  # next block: hands over the full one
+    assert log._full is not None
+    log._write_full()  # as run() would: only the unflushed part
+    assert os.path.getsize(files[0]) == 2 * BLOCK_SIZE
+    log.flush()
+    recs = records(files[0])
+    assert [r[1] for r in recs].count(run_log.EV_ESTOP) == 1
+    assert [r[6] for r in recs if r[1] == run_log.EV_RAMP] == list(range(PER_BLOCK - 1))
+    assert recs[-1][1] == run_log.EV_END
+
+
+def test_dropped_when_both_buffers_full(files):
+    log = RunLog(files)
+    for i in range(2 * PER_BLOCK + 5):
+        log.log(run_log.EV_RAMP, value=i)
+    assert log.dropped == 5
+    log._write(log._bufs[log._full])  # as run() would
+    log._full = None
+    log.log(run_log.EV_END)
+    log.flush()
+    recs = records(files[0])
+    events = [r[1] for r in recs]
+    assert events.count(run_log.EV_DROPPED) == 1
+    assert recs[events.index(run_log.EV_DROPPED)][6] == 5
+    assert log.dropped == 0
+
+
+def test_rotation_and_reopen(files):
+    log = RunLog(files, max_blocks=2)
+    n = 5 * PER_BLOCK
+    for i in range(n):
+        log.log(run_log.EV_RAMP, value=i)
+        if log._full is not None:
+            log.flush()
+    log.flush()
+    assert log.generation >= 2
+    for filename in files:
+        assert os.path.getsize(filename) <= 3 * BLOCK_SIZE  # header + 2
+    # a new RunLog continues the newer file
+    active = log._active
+    reopened = RunLog(files, max_blocks=2)
+    assert reopened._active == active
+    assert reopened.generation == log.generation
+
+
+def test_blocks_on_flash_block_boundaries(files):
+    log = RunLog(files)
+    offsets = []
+    write = log._write
+
+    def spy(data):
+        offsets.append(os.path.getsize(files[log._active]))
+        write(data)
+
+    log._write = spy
+    for i in range((run_log.MAX_BLOCKS + 2) * PER_BLOCK):
+        log.log(run_log.EV_RAMP, value=i)
+        if log._full is not None:
+            log._write_full()
+    assert all(offset % BLOCK_SIZE == 0 for offset in offsets)
+    # MAX_BLOCKS blocks after the header, then rotation
+    assert os.path.getsize(files[0]) == (1 + run_log.MAX_BLOCKS) * BLOCK_SIZE
+    assert log.generation == 1 and os.path.getsize(files[1]) == 2 * BLOCK_SIZE
+    assert RunLog(files)._size == BLOCK_SIZE  # reopened: header not counted
+
+
+def test_decode_orders_files_by_generation(files, tmp_path):
+    log = RunLog(files, max_blocks=2)
+    log.log(run_log.EV_BOOT, value=1)
+    n = 2 * PER_BLOCK  # rotates once: both files kept
+    for i in range(n):
+        log.log(run_log.EV_RAMP, value=i)
+        if log._full is not None:
+            log.flush()
+    log.log(run_log.EV_BOOT, value=3)
+    log.log(run_log.EV_END, value=n)
+    log.flush()
+    assert log.generation == 1 and log._active == 1
+    out = str(tmp_path / 'run.csv')
+    decode_log.main([files[1], files[0], '--out', out])
+    with open(out, newline='') as f:
+        rows = list(csv.DictReader(f))
+    values = [int(r['value']) for r in rows if r['event'] == 'ramp']
+    assert values == list(range(n))  # oldest file first
+    assert rows[-1]['event'] == 'end' and rows[-1]['boot'] == '1'
+    assert rows[-2]['event'] == 'boot'
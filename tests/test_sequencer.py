@@ -0,0 +1,129 @@
+""" sequencer.py: display compile; run, stop() and abort() """
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from config import pc_u16
+from hb_l298n import L298N
+from host import defaults, vtime
+from host.hw import hw
+from motor_ctrl import MotorCtrl
+from sequencer import Sequencer, compile_text, default_sequences
+
+HOLD_MS = 3_000
+
+
+class Lcd:
+    """ last text posted to each row """
+
+    def __init__(self):
+        self.lines = [b'', b'']
+
+    def clear(self):
+        self.lines = [b'', b'']
+
+    def write_line(self, row, text):
+        self.lines[row] = bytes(text)
+
+
+@pytest.fixture
+def seq():
+    """ sequencer on the default table; virtual clock restored after """
+    clock = hw.clock
+    hw.reset()
+    board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+    speeds = [{d: pc_u16(pc) for d, pc in defaults.MOTOR_P[k].items()}
+              for k in ('a_speed', 'b_speed')]
+    ctrl = MotorCtrl(board, *speeds, n_steps=5)
+    yield Sequencer(ctrl, Lcd(), default_sequences(HOLD_MS, 2))
+    hw.clock = clock
+
+
+def test_compile_text():
+    buf, fields = compile_text('A:{a_F:05d} B:{b_R}|')
+    assert buf == b'A:      B:     |'
+    assert fields == [(2, 'a', 'F', 5, 0x30), (10, 'b', 'R', 5, 0x20)]
+    with pytest.raises(ValueError):
+        compile_text('{c_F}')
+
+
+def test_display_fills_compiled_buffer(seq):
+    text = compile_text('A:{a_F:06d} B:{b_F}')
+    seq._display(1, text)
+    a_f, b_f = seq.controller.a_speeds['F'], seq.controller.b_speeds['F']
+    assert seq.lcd.lines[1] == f'A:{a_f:06d} B:{b_f:5d}'.encode()
+    assert seq.lcd.lines[1] == text[0]  # same buffer, filled in place
+
+
+def test_sequence_runs_to_end(seq):
+    ctrl = seq.controller
+
+    async def main():
+        assert seq.run() and not seq.run()  # one at a time
+        await asyncio.sleep_ms(HOLD_MS // 2)
+        at_speed = (ctrl.chan_a.dc_u16, ctrl.chan_b.dc_u16)
+        while seq.is_running():
+            await asyncio.sleep_ms(100)
+        return at_speed
+
+    at_speed = vtime.run(main())
+    assert at_speed == (ctrl.a_speeds['F'], ctrl.b_speeds['F'])
+    assert ctrl.chan_a.dc_u16 == ctrl.chan_b.dc_u16 == 0
+    assert seq.lcd.lines[0] == b'Waiting...' and seq.index == 1
+
+
+def test_stop_ramps_down_from_hold(seq):
+    ctrl = seq.controller
+    busy = []
+
+    async def main():
+        seq.run()
+        await asyncio.sleep_ms(HOLD_MS // 2)
+        stopping = asyncio.create_task(seq.stop(500))
+        await asyncio.sleep_ms(100)
+        busy.append((seq.is_running(), seq.is_busy(), ctrl.chan_a.dc_u16))
+        await stopping
+
+    vtime.run(main())
+    running, is_busy, dc_u16 = busy[0]
+    assert not running and is_busy and 0 < dc_u16 < ctrl.a_speeds['F']
+    assert not seq.is_busy()
+    assert ctrl.chan_a.dc_u16 == ctrl.chan_b.dc_u16 == 0
+
+
+def test_abort_ends_sequence_and_ramp_down(seq):
+    ctrl = seq.controller
+
+    async def main():
+        seq.run()
+        await asyncio.sleep_ms(HOLD_MS // 2)
+        stopping = asyncio.create_task(seq.stop(1_000))
+        await asyncio.sleep_ms(200)
+        seq.abort()
+        with pytest.raises(asyncio.CancelledError):
+            await stopping
+        ctrl.halt_a_b()  # as after an e-stop trip
+
+    vtime.run(main())
+    assert not seq.is_busy()
+    assert ctrl.chan_a.dc_u16 == ctrl.chan_b.dc_u16 == 0
+
+
+def test_liveness_beats_through_long_hold(seq):
+    beats = []
+    liveness = SimpleNamespace(add=lambda: 0,
+                               beat=lambda slot: beats.append(hw.clock.ticks_ms()),
+                               idle=lambda slot: beats.append(None))
+    seq.watch(liveness)
+
+    async def main():
+        seq.run()
+        while seq.is_running():
+            await asyncio.sleep_ms(100)
+
+    vtime.run(main())
+    assert beats[-1] is None
+    times = beats[:-1]
+    assert max(b - a for a, b in zip(times, times[1:])) <= 1_000 + 50
@@ -0,0 +1,129 @@
+""" serial_ctrl.py: framing; arbitration with the sequencer and buttons """
+
+import asyncio
+
+import pytest
+
+import serial_ctrl as sc
+from hb_l298n import L298N
+from host import defaults
+from host.hw import hw
+from host.serial_link import PipeStream
+from motor_ctrl import MotorCtrl
+from sequencer import Sequencer, default_sequences
+
+SPEEDS = {'F': 40_000, 'R': 30_000}
+
+
+class Lcd:
+    """ LcdRender stand-in """
+
+    def write_line(self, row, text):
+        pass
+
+    def clear(self):
+        pass
+
+
+@pytest.fixture
+def ctrl():
+    hw.reset()
+    board = L298N(defaults.L298N_P['pins'], defaults.L298N_P['pulse_f'])
+    return MotorCtrl(board, dict(SPEEDS), dict(SPEEDS), n_steps=5)
+
+
+def serial_for(ctrl):
+    sequencer = Sequencer(ctrl, Lcd(), default_sequences(100, 0))
+    return sc.SerialCtrl(ctrl, PipeStream(), PipeStream(), sequencer), sequencer
+
+
+def test_read_frame_resyncs_past_text_and_bad_frames():
+    async def main():
+        stream = PipeStream()
+        bad = sc.encode_frame(sc.CMD_HALT, b'x')
+        bad[-1] ^= 0xff
+        stream.write(b'Incline control active\n')
+        stream.write(bad)
+        stream.write(sc.encode_frame(sc.CMD_RUN, b'F'))
+        return await sc.read_frame(stream)
+
+    assert asyncio.run(main()) == (sc.CMD_RUN, b'F')
+
+
+def test_bad_args_and_command(ctrl):
+    async def main():
+        serial, _ = serial_for(ctrl)
+        assert serial.dispatch(sc.CMD_RUN, b'X')[0] == sc.ST_BAD_ARG
+        assert serial.dispatch(sc.CMD_SET_SPEED, b'A')[0] == sc.ST_BAD_ARG
+        assert serial.dispatch(0x7f, b'')[0] == sc.ST_BAD_CMD
+
+    asyncio.run(main())
+
+
+def test_busy_while_sequencer_ramps_down(ctrl):
+    async def main():
+        serial, sequencer = serial_for(ctrl)
+        await ctrl.start_a_b('F', 50)
+        stopping = asyncio.create_task(sequencer.stop(200))
+        await asyncio.sleep_ms(20)
+        assert sequencer.is_busy() and not sequencer.is_running()
+        assert serial.dispatch(sc.CMD_RUN, b'F')[0] == sc.ST_BUSY
+        assert serial.dispatch(sc.CMD_SET_SPEED, b'AF\x00\x10')[0] == sc.ST_BUSY
+        await stopping
+        assert not sequencer.is_busy()
+        assert serial.dispatch(sc.CMD_RUN, b'F')[0] == sc.ST_OK
+        serial.dispatch(sc.CMD_HALT, b'')
+
+    asyncio.run(main())
+
+
+def test_run_refused_against_running_motors(ctrl):
+    async def main():
+        serial, _ = serial_for(ctrl)
+        assert serial.dispatch(sc.CMD_RUN, b'F')[0] == sc.ST_OK
+        await asyncio.sleep_ms(10)
+        assert serial.dispatch(sc.CMD_RUN, b'R')[0] == sc.ST_BUSY
+        await serial._motion
+        assert ctrl.chan_a.state == 'F' and ctrl.chan_a.dc_u16 == SPEEDS['F']
+        assert serial.dispatch(sc.CMD_RUN, b'R')[0] == sc.ST_BUSY
+        assert serial.dispatch(sc.CMD_RUN, b'F')[0] == sc.ST_OK
+        await serial._motion
+        assert serial.dispatch(sc.CMD_STOP, b'F')[0] == sc.ST_OK
+        await serial._motion
+        assert ctrl.chan_a.dc_u16 == 0 and ctrl.chan_b.dc_u16 == 0
+        assert serial.dispatch(sc.CMD_RUN, b'R')[0] == sc.ST_OK
+        serial.dispatch(sc.CMD_HALT, b'')
+
+    asyncio.run(main())
+
+
+def test_is_moving_while_serial_motors_run(ctrl):
+    async def main():
+        serial, sequencer = serial_for(ctrl)
+        assert not serial.is_moving()
+        serial.dispatch(sc.CMD_RUN, b'F')
+        assert serial.is_moving()
+        await serial._motion
+        # ramp done, motors at speed: run clicks stay blocked
+        assert serial.is_moving()
+        serial.dispatch(sc.CMD_HALT, b'')
+        assert not serial.is_moving()
+        assert ctrl.chan_a.state == 'S'
+
+    asyncio.run(main())
+
+
+def test_halt_ends_sequencer_ramp_down(ctrl):
+    async def main():
+        serial, sequencer = serial_for(ctrl)
+        await ctrl.start_a_b('F', 50)
+        stopping = asyncio.create_task(sequencer.stop(500))
+        await asyncio.sleep_ms(50)
+        serial.dispatch(sc.CMD_HALT, b'')
+        with pytest.raises(asyncio.CancelledError):
+            await stopping
+        assert not sequencer.is_busy()
+        await asyncio.sleep_ms(150)
+        assert ctrl.chan_a.dc_u16 == 0 and ctrl.chan_b.dc_u16 == 0
+
+    asyncio.run(main())
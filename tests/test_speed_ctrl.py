@@ -0,0 +1,27 @@
+# test_speed_ctrl.py
+""" speed_ctrl.py: fixed-point PI controller """
+
+from speed_ctrl import PiCtrl
+
+
+def test_proportional_only():
+    pi = PiCtrl(kp_q=256, ki_q=0)  # kp 1.0
+    assert pi.update(1_000, 400) == 600
+    assert pi.update(1_000, 1_400) == 0  # clamped at out_min
+
+
+def test_integral_accumulates_and_clamps():
+    pi = PiCtrl(kp_q=0, ki_q=128, out_max=1_000)  # ki 0.5
+    assert pi.update(100, 0) == 50
+    assert pi.update(100, 0) == 100
+    for _ in range(100):
+        output = pi.update(100, 0)
+    assert output == 1_000
+    # anti-windup: integral held at out_max, so recovery is immediate
+    assert pi.update(0, 100) == 950
+
+
+def test_reset_is_bumpless():
+    pi = PiCtrl(kp_q=256, ki_q=64)
+    pi.reset(30_000)
+    assert pi.update(500, 500) == 30_000